@@ -3,15 +3,34 @@
 包括 PDF 下载功能
 """
 
-from fastapi import APIRouter, Path, Depends, HTTPException, Query
+from fastapi import APIRouter, Path, Depends, HTTPException, Query, Header
 from fastapi.responses import Response
-from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 from typing import Optional
+import os
 from app.models import Assessment
-from app.database import get_db
+from app.database import get_async_db
+from app.services.assessment_store import load_assessment_payload
 from app.services.report_builder import build_report_data
-from app.services.pdf_report import generate_pdf
+from app.services.pdf_pool import (
+    PDF_POOL_RETRY_AFTER_SECONDS,
+    PdfPoolSaturated,
+    PdfRenderTimeout,
+    render_pdf,
+)
+from app.services.report_cache import get_cached_pdf, has_cached_pdf, report_digest, store_pdf
+from app.services.render_queue import (
+    JOB_STATUS_PUBLIC,
+    get_latest_job,
+    get_rendered_report_info,
+    has_rendered_pdf,
+    load_rendered_pdf,
+    requeue_job,
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,6 +38,26 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+class ReportStatusResponse(BaseModel):
+    assessment_id: str
+    status: str  # "none" | "queued" | "running" | "ready" | "failed"
+    ready: bool
+    attempts: int = 0
+    updated_at: Optional[datetime] = None
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "assessment_id": "assessment_abc123_1700000000",
+                "status": "ready",
+                "ready": True,
+                "attempts": 1,
+                "updated_at": "2026-01-01T12:00:00",
+            }
+        }
+    }
+
+
 def _verify_access(assessment: Assessment, user_id: Optional[str] = None) -> bool:
     """
     验证用户是否有权访问该评估
@@ -39,20 +78,36 @@ def _verify_access(assessment: Assessment, user_id: Optional[str] = None) -> boo
     return True
 
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否命中（支持多个值、弱校验 W/ 前缀与 *）"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
 @router.get("/{assessment_id}/report.pdf")
 async def download_pdf_report(
     assessment_id: str = Path(..., description="评估 ID"),
     user_id: Optional[str] = Query(None, description="用户 ID（用于权限验证）"),
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     下载 PDF 报告
     
     正确的逻辑：
     1. 从数据库获取 Assessment（已经算好的）
-    2. 直接用 assessment.result_data / decision_summary_data / input_data
+    2. 直接用已保存的 result_data / decision_summary_data / input_data（assessment_store 解压还原）
     3. build_report_data() - 只组装数据，不重新计算
-    4. generate_pdf() - 生成 PDF
+    4. generate_pdf() - 在进程池中生成 PDF（按报告内容哈希缓存到磁盘，哈希同时作为 ETag）
     
     PDF = 展示层，不是计算层
     
@@ -61,9 +116,9 @@ async def download_pdf_report(
     - 用户必须有权访问该评估
     """
     # 1. 查询 Assessment（已经算好的）
-    assessment = db.query(Assessment).filter(
-        Assessment.assessment_id == assessment_id
-    ).first()
+    assessment = await db.scalar(
+        select(Assessment).where(Assessment.assessment_id == assessment_id)
+    )
     
     if not assessment:
         raise HTTPException(status_code=404, detail="评估不存在")
@@ -81,7 +136,8 @@ async def download_pdf_report(
         )
     
     # 4. 验证是否有评估结果数据
-    if not assessment.result_data or not assessment.decision_summary_data:
+    payload = await load_assessment_payload(assessment)
+    if not payload or not payload.get("result_data") or not payload.get("decision_summary_data"):
         raise HTTPException(
             status_code=400,
             detail="评估结果数据不完整，无法生成 PDF。请重新进行评估。"
@@ -89,18 +145,55 @@ async def download_pdf_report(
     
     # 5. 组装报告数据（直接从数据库读取，不重新计算）
     try:
-        report_data = build_report_data(assessment)
+        report_data = build_report_data(assessment, payload)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"组装报告数据失败：{str(e)}"
         )
     
-    # 6. 生成 PDF（展示层）
+    # 6. 内容哈希：ETag 命中直接 304，磁盘命中直接返回
+    digest = report_digest(report_data)
+    etag = f'"{digest}"'
+    filename = f"IberComply_Report_{datetime.now().strftime('%Y-%m-%d')}.pdf"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+    }
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": headers["Cache-Control"]})
+
+    pdf_bytes = await run_in_threadpool(get_cached_pdf, assessment_id, digest)
+    if pdf_bytes is not None:
+        logger.info(f"[PDF_GENERATE] assessment_id={assessment_id}, unlocked_tier={unlocked_tier}, cache=hit")
+        return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
+
+    # 本机缓存未命中：预渲染任务可能由其他实例完成，从共享表读取并回填本机缓存
+    pdf_bytes = await db.run_sync(load_rendered_pdf, assessment_id, digest)
+    if pdf_bytes is not None:
+        await run_in_threadpool(store_pdf, assessment_id, digest, pdf_bytes)
+        logger.info(f"[PDF_GENERATE] assessment_id={assessment_id}, unlocked_tier={unlocked_tier}, cache=shared")
+        return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
+
+    # 7. 生成 PDF（展示层，进程池中渲染，不阻塞事件循环）
     try:
-        pdf_bytes = generate_pdf(report_data)
+        pdf_bytes = await render_pdf(report_data)
         # ✅ 最小化日志记录（PDF 生成成功）
         logger.info(f"[PDF_GENERATE] assessment_id={assessment_id}, unlocked_tier={unlocked_tier}, success=true")
+    except PdfPoolSaturated:
+        logger.warning(f"[PDF_GENERATE] assessment_id={assessment_id}, pool saturated")
+        raise HTTPException(
+            status_code=503,
+            detail="PDF 生成繁忙，请稍后重试。",
+            headers={"Retry-After": str(PDF_POOL_RETRY_AFTER_SECONDS)},
+        )
+    except PdfRenderTimeout:
+        logger.error(f"[PDF_GENERATE] assessment_id={assessment_id}, unlocked_tier={unlocked_tier}, success=false, error=timeout")
+        raise HTTPException(
+            status_code=504,
+            detail="生成 PDF 超时，请稍后重试。",
+        )
     except Exception as e:
         # ✅ 最小化日志记录（PDF 生成失败）
         logger.error(f"[PDF_GENERATE] assessment_id={assessment_id}, unlocked_tier={unlocked_tier}, success=false, error={str(e)}")
@@ -108,15 +201,75 @@ async def download_pdf_report(
             status_code=500,
             detail=f"生成 PDF 失败：{str(e)}"
         )
+    await run_in_threadpool(store_pdf, assessment_id, digest, pdf_bytes)
     
-    # 7. 返回 PDF
-    filename = f"IberComply_Report_{datetime.now().strftime('%Y-%m-%d')}.pdf"
-    
+    # 8. 返回 PDF
     return Response(
         content=pdf_bytes,
         media_type="application/pdf",
-        headers={
-            "Content-Disposition": f'attachment; filename="{filename}"'
-        }
+        headers=headers
     )
 
+
+@router.get("/{assessment_id}/report/status", response_model=ReportStatusResponse)
+async def get_report_status(
+    assessment_id: str = Path(..., description="评估 ID"),
+    user_id: Optional[str] = Query(None, description="用户 ID（用于权限验证）"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    查询 PDF 预渲染状态（给前端轮询使用）
+    status=ready 表示报告已渲染好，下载直接返回；其他状态下下载仍可用（现场渲染）
+    """
+    assessment = await db.scalar(
+        select(Assessment).where(Assessment.assessment_id == assessment_id)
+    )
+    if not assessment:
+        raise HTTPException(status_code=404, detail="评估不存在")
+    if not _verify_access(assessment, user_id):
+        raise HTTPException(status_code=403, detail="无权访问该评估")
+
+    job = await db.run_sync(get_latest_job, assessment_id)
+    if job is None:
+        # 完成的任务记录过了保留期已被清理：PDF 仍在共享表中
+        rendered = await db.run_sync(get_rendered_report_info, assessment_id)
+        if rendered is not None:
+            return ReportStatusResponse(assessment_id=assessment_id, status="ready", ready=True, updated_at=rendered[1])
+        return ReportStatusResponse(assessment_id=assessment_id, status="none", ready=False)
+
+    status = JOB_STATUS_PUBLIC.get(job.status, job.status)
+    ready = False
+    if job.status == "done" and job.digest:
+        # 本机缓存可能已被淘汰，或任务由其他实例完成：只检查存在性，不读取 PDF
+        ready = (
+            await run_in_threadpool(has_cached_pdf, assessment_id, job.digest)
+            or await db.run_sync(has_rendered_pdf, assessment_id, job.digest)
+        )
+        if not ready:
+            status = "none"
+    return ReportStatusResponse(
+        assessment_id=assessment_id,
+        status=status,
+        ready=ready,
+        attempts=job.attempts or 0,
+        updated_at=job.updated_at,
+    )
+
+
+@router.post("/render-jobs/{job_id}/retry")
+async def retry_render_job(
+    job_id: int,
+    x_admin_token: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    手动重试 PDF 预渲染任务（死信）（需配置 RENDER_QUEUE_ADMIN_TOKEN）
+    """
+    admin_token = os.getenv("RENDER_QUEUE_ADMIN_TOKEN")
+    if not admin_token or x_admin_token != admin_token:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    job = await db.run_sync(requeue_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"status": "queued", "job_id": job.id, "assessment_id": job.assessment_id}
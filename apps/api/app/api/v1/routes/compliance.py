@@ -1,23 +1,86 @@
 from fastapi import APIRouter, Query, Depends, HTTPException, Path
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from app.models import Assessment
-from typing import Optional
-from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from sqlalchemy import insert, null, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timezone
+import os
 import uuid
 import logging
 
 logger = logging.getLogger(__name__)
-from app.schemas.assessment import RiskAssessmentRequest, RiskAssessmentResponse, Finding, DecisionSummary
+from app.schemas.assessment import (
+    RiskAssessmentRequest,
+    RiskAssessmentResponse,
+    Finding,
+    DecisionSummary,
+    BatchAssessmentRequest,
+    BatchAssessmentResponse,
+    RemediationRequest,
+    RemediationResponse,
+    PortfolioSimulationRequest,
+    PortfolioSimulationResponse,
+)
 from app.schemas.compliance import AssessmentOut
 from app.services.risk_engine import assess_risk_v2, assess_risk_v3
+from app.services.score_sensitivity import score_sensitivity
+from app.services.portfolio_sim import simulate_portfolio
+from app.services.risk_batch import assess_risk_v3_batch
 from app.services.decision_engine import compute_decision_summary
 from app.services.decision_templates import normalize_tier
 from app.services.stripe_service import verify_payment_session
-from app.database import get_db
+from app.services.assessment_store import (
+    encode_assessment_payload,
+    encode_assessment_payloads_sync,
+    load_assessment_payload,
+    load_assessment_payloads_sync,
+)
+from app.services.assess_cache import AssessResult, assess_request_key, get_assess_result, put_assess_result
+from app.services.report_cache import invalidate_report_cache
+from app.services.remediation import (
+    BAND_MAX_SCORE,
+    REMEDIATION_MAX_FLIPS,
+    plan_remediation,
+)
+from app.database import get_async_db
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter()
 
+# 批量评估单次最多条数
+BATCH_ASSESS_MAX_ITEMS = int(os.getenv("BATCH_ASSESS_MAX_ITEMS", "500"))
+# 组合风险模拟：单次最多客户数 / 每个客户最多抽样数
+PORTFOLIO_SIM_MAX_CLIENTS = int(os.getenv("PORTFOLIO_SIM_MAX_CLIENTS", "2000"))
+PORTFOLIO_SIM_MAX_DRAWS = int(os.getenv("PORTFOLIO_SIM_MAX_DRAWS", "20000"))
+# assess upsert 遇到并发修改（unlocked_tier 被 webhook 改写 / 同 id 并发创建）时的最多尝试次数
+ASSESS_UPSERT_ATTEMPTS = 3
+
+# PaymentSession.tier -> decision_engine 层级
+_SESSION_TIER_MAP = {"basic": "basic_15", "expert": "expert_39"}
+
+
+def _new_assessment_id() -> str:
+    return f"assessment_{uuid.uuid4().hex[:16]}_{int(datetime.now().timestamp())}"
+
+
+def _findings_to_dicts(findings) -> list:
+    return [f.model_dump() if hasattr(f, "model_dump") else f.__dict__ if hasattr(f, "__dict__") else f for f in findings]
+
+
+def _input_data(request: RiskAssessmentRequest) -> dict:
+    """保存原始请求数据（用于重新生成）"""
+    return {
+        "stage": request.stage,
+        "industry": request.industry,
+        "monthly_income": request.monthly_income,
+        "employee_count": request.employee_count,
+        "has_pos": request.has_pos,
+        "signals": request.signals,
+    }
+
 
 def _filter_pro_findings(findings, unlocked_tier: str):
     if unlocked_tier != "none":
@@ -33,85 +96,26 @@ def _filter_pro_findings(findings, unlocked_tier: str):
     return [f for f in findings if not _is_pro_only(f)]
 
 
-@router.post("/assess", response_model=RiskAssessmentResponse)
-async def assess_compliance(
-    request: RiskAssessmentRequest,
-    session_id: Optional[str] = Query(None, description="Stripe Checkout Session ID for payment verification"),
-    assessment_id: Optional[str] = Query(None, description="Assessment ID to get latest unlocked_tier"),
-    db: Session = Depends(get_db)
-):
-    """
-    合规风险评估接口 v3
-    整合 Risk Engine 和 Decision Engine (按 stage 分支)
-    返回: risk_score + risk_level + findings + decision_summary
-    
-    前端只渲染 decision_summary，不再写业务判断
-    
-    如果提供了 session_id，会根据支付状态自动解锁对应层级的内容
-    """
-    # 评估风险（Risk Engine v3 - 配置驱动版本，输出增强 meta）
-    risk_score, risk_level, findings, meta = assess_risk_v3(request)
-    
-    # ✅ 核心修复：获取 unlocked_tier（必须以数据库为准）
-    unlocked_tier_value = "none"
-    
-    # ✅ 优先：如果提供了 assessment_id，从数据库获取最新的 unlocked_tier（权威来源）
-    if assessment_id:
-        assessment_db = db.query(Assessment).filter(Assessment.assessment_id == assessment_id).first()
-        if assessment_db:
-            # ✅ 关键：即使 unlocked_tier 是 None 或空字符串，也要读取（可能 webhook 刚更新）
-            unlocked_tier_value = normalize_tier(assessment_db.unlocked_tier)
-            logger.info("[ASSESS] assessment found, unlocked_tier normalized=%s", unlocked_tier_value)
-    
-    # 其次：如果提供了 session_id 且还没有从 assessment_id 获取到，验证支付状态
-    if session_id and unlocked_tier_value == "none":
-        payment_session = verify_payment_session(session_id, db)
-        if payment_session and payment_session.status == "paid":
-            # 根据 tier 映射到 decision_engine 格式
-            if payment_session.tier == "basic":
-                unlocked_tier_value = "basic_15"
-            elif payment_session.tier == "expert":
-                unlocked_tier_value = "expert_39"
-    
-    # ✅ 核心修复：生成或获取 assessment_id（关键：确保贯穿整个支付流程）
-    current_assessment_id = assessment_id  # 保存传入的 assessment_id
-    
-    # 如果提供了 session_id，尝试从 PaymentSession 获取关联的 assessment_id
-    if session_id and not current_assessment_id:
-        payment_session = verify_payment_session(session_id, db)
-        if payment_session and payment_session.assessment_id:
-            current_assessment_id = payment_session.assessment_id
-    
-    # 如果还没有 assessment_id，生成一个新的
-    if not current_assessment_id:
-        current_assessment_id = f"assessment_{uuid.uuid4().hex[:16]}_{int(datetime.now().timestamp())}"
-    
-    # ✅ 关键：如果 assessment_id 已存在，再次从数据库确认最新的 unlocked_tier（可能 webhook 刚更新）
-    # ⚠️ 重要：必须在生成 decision_summary 之前，再次从数据库读取最新的 unlocked_tier
-    if current_assessment_id:
-        assessment_db_final = db.query(Assessment).filter(Assessment.assessment_id == current_assessment_id).first()
-        if assessment_db_final:
-            # ✅ 使用数据库中的最新值（webhook 可能刚更新）
-            latest_unlocked_tier = normalize_tier(assessment_db_final.unlocked_tier)
-            if latest_unlocked_tier != unlocked_tier_value:
-                logger.warning(
-                    "[ASSESS] unlocked_tier updated before decision: %s -> %s",
-                    unlocked_tier_value,
-                    latest_unlocked_tier,
-                )
-                unlocked_tier_value = latest_unlocked_tier
-            else:
-                logger.info("[ASSESS] using unlocked_tier=%s (from DB)", unlocked_tier_value)
-    
-    # ✅ 付费字段控制：未解锁时移除 pro_only findings
-    findings = _filter_pro_findings(findings, unlocked_tier_value)
+async def _load_assessment_for_update(db: AsyncSession, assessment_id: str) -> Optional[Assessment]:
+    """按 assessment_id 加载并加行锁（Postgres: SELECT ... FOR UPDATE；SQLite 无行锁，SQLAlchemy 省略该子句）"""
+    return await db.scalar(
+        select(Assessment).where(Assessment.assessment_id == assessment_id).with_for_update()
+    )
+
+
+def _tier_unchanged(unlocked_tier: Optional[str]):
+    if unlocked_tier is None:
+        return Assessment.unlocked_tier.is_(None)
+    return Assessment.unlocked_tier == unlocked_tier
 
-    # 转换 findings 为 dict 格式（用于 decision_engine）
-    findings_dict = [f.model_dump() if hasattr(f, "model_dump") else f.__dict__ if hasattr(f, "__dict__") else f for f in findings]
+
+def _build_assessment_values(request: RiskAssessmentRequest, risk_score, risk_level, findings, meta, unlocked_tier: str):
+    """按解锁层级过滤 findings 并生成 decision_summary，返回 (findings, decision_summary, 评估数据)"""
+    # ✅ 付费字段控制：未解锁时移除 pro_only findings
+    findings = _filter_pro_findings(findings, unlocked_tier)
+    findings_dict = _findings_to_dicts(findings)
 
     # ✅ 生成决策建议（Decision Engine 按 stage 产出唯一结论）
-    # 关键：使用最新的 unlocked_tier_value（从数据库读取的权威值）
-    logger.info("[ASSESS] generating decision_summary with unlocked_tier=%s", unlocked_tier_value)
     decision_summary = compute_decision_summary(
         stage=request.stage,
         industry=request.industry,
@@ -121,71 +125,361 @@ async def assess_compliance(
         employee_count=request.employee_count,
         findings=findings_dict,
         meta=meta,
-        unlocked_tier=unlocked_tier_value,  # ✅ 使用从数据库读取的最新值
+        unlocked_tier=unlocked_tier,
     )
-    
+
     # ✅ 验证付费内容是否正确生成（调试用）
-    if unlocked_tier_value != "none":
+    if unlocked_tier != "none":
         logger.info(
             "[ASSESS] decision_summary counts: reasons=%s actions=%s risks=%s",
             len(decision_summary.reasons),
             len(decision_summary.recommended_actions),
             len(decision_summary.risk_if_ignore),
         )
-    
-    # 确保 Assessment 记录存在（如果不存在则创建）
-    assessment = db.query(Assessment).filter(
-        Assessment.assessment_id == current_assessment_id
-    ).first()
-    
-    # ✅ 准备保存到数据库的数据
-    result_data = {
-        "risk_score": risk_score,
-        "risk_level": risk_level,
-        "findings": [f.model_dump() if hasattr(f, "model_dump") else f.__dict__ if hasattr(f, "__dict__") else f for f in findings],
-        "meta": meta,
-    }
-    
+
     decision_summary_dict = decision_summary.model_dump() if hasattr(decision_summary, "model_dump") else decision_summary.__dict__
-    
-    input_data = {
-        "stage": request.stage,
-        "industry": request.industry,
-        "monthly_income": request.monthly_income,
-        "employee_count": request.employee_count,
-        "has_pos": request.has_pos,
-        "signals": request.signals,
+    payload = {
+        "result_data": {
+            "risk_score": risk_score,
+            "risk_level": risk_level,
+            "findings": findings_dict,
+            "meta": meta,
+        },
+        "decision_summary_data": decision_summary_dict,
+        "input_data": _input_data(request),
     }
-    
-    if not assessment:
-        # 从 request 中获取 user_id（如果有的话，前端可以通过 header 传递）
-        user_id = None  # 可以从 request headers 或其他地方获取
-        assessment = Assessment(
-            assessment_id=current_assessment_id,
-            user_id=user_id,
-            unlocked_tier=unlocked_tier_value,
-            result_data=result_data,
-            decision_summary_data=decision_summary_dict,
-            input_data=input_data,
-        )
-        db.add(assessment)
-        db.commit()
-    else:
-        # ✅ 如果 assessment 已存在，更新 unlocked_tier 和结果数据
-        assessment.unlocked_tier = unlocked_tier_value
-        assessment.result_data = result_data
-        assessment.decision_summary_data = decision_summary_dict
-        assessment.input_data = input_data
-        db.commit()
-    
-    return RiskAssessmentResponse(
-        id=current_assessment_id,  # 返回 assessment_id（关键：前端必须使用这个）
+    return findings, decision_summary, payload
+
+
+async def _compute_assess_result(request: RiskAssessmentRequest, request_key: str, unlocked_tier: str) -> AssessResult:
+    """
+    评估的纯计算部分（评分 + 决策 + 响应序列化 + payload 编码），按 (请求哈希, 解锁层级) 缓存
+    结果与 assessment_id / 数据库状态无关
+    """
+    cached = get_assess_result(request_key, unlocked_tier)
+    if cached is not None:
+        return cached
+
+    # 评估风险（Risk Engine v3 - 配置驱动版本，输出增强 meta）
+    risk_score, risk_level, findings, meta = assess_risk_v3(request)
+    if unlocked_tier == "expert_39":
+        # ✅ €39 专家包：每个信号 / 下一收入分档的分数与等级变化
+        meta["sensitivity"] = score_sensitivity(request)
+    logger.info("[ASSESS] generating decision_summary with unlocked_tier=%s", unlocked_tier)
+    visible_findings, decision_summary, payload = _build_assessment_values(
+        request, risk_score, risk_level, findings, meta, unlocked_tier
+    )
+    response = RiskAssessmentResponse(
+        id="",
         risk_score=risk_score,
         risk_level=risk_level,
-        findings=findings,
+        findings=visible_findings,
         decision_summary=decision_summary,
         meta=meta  # ✅ 新增：返回 meta（包含 industry_key, tags, matched_triggers）
     )
+    # 缓存已校验的响应 dict（与 response_model 序列化结果一致），id 由调用方填入
+    result = AssessResult(
+        response=response.model_dump(mode="json"),
+        payload=await encode_assessment_payload(payload),
+    )
+    put_assess_result(request_key, unlocked_tier, result)
+    return result
+
+
+@router.post("/assess", response_model=RiskAssessmentResponse)
+async def assess_compliance(
+    request: RiskAssessmentRequest,
+    session_id: Optional[str] = Query(None, description="Stripe Checkout Session ID for payment verification"),
+    assessment_id: Optional[str] = Query(None, description="Assessment ID to get latest unlocked_tier"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    合规风险评估接口 v3
+    整合 Risk Engine 和 Decision Engine (按 stage 分支)
+    返回: risk_score + risk_level + findings + decision_summary
+    
+    前端只渲染 decision_summary，不再写业务判断
+    
+    如果提供了 session_id，会根据支付状态自动解锁对应层级的内容
+    """
+    # 评分 / 决策 / 序列化结果按画像缓存（assess_cache），这里只处理 assessment_id 与解锁状态
+    request_key = assess_request_key(request)
+
+    # ✅ 单一工作单元：Assessment 只按 assessment_id 加载一次（加行锁），upsert 复用同一行；
+    # 每个请求最多调用一次 verify_payment_session（Stripe 远程调用）
+    current_assessment_id = assessment_id
+    assessment = await _load_assessment_for_update(db, assessment_id) if assessment_id else None
+    if assessment:
+        logger.info("[ASSESS] assessment found, unlocked_tier normalized=%s", normalize_tier(assessment.unlocked_tier))
+
+    # 记录不存在或尚未解锁时才验证支付；没有 assessment_id 时从 PaymentSession 取关联的 assessment_id
+    session_tier = "none"
+    if session_id and (assessment is None or normalize_tier(assessment.unlocked_tier) == "none"):
+        payment_session = await verify_payment_session(session_id, db)
+        if payment_session and payment_session.status == "paid":
+            # 根据 tier 映射到 decision_engine 格式
+            session_tier = _SESSION_TIER_MAP.get(payment_session.tier, "none")
+        if not current_assessment_id and payment_session and payment_session.assessment_id:
+            current_assessment_id = payment_session.assessment_id
+            assessment = await _load_assessment_for_update(db, current_assessment_id)
+
+    # 如果还没有 assessment_id，生成一个新的（新 id 不可能已有记录，无需查询）
+    if not current_assessment_id:
+        current_assessment_id = _new_assessment_id()
+
+    for _ in range(ASSESS_UPSERT_ATTEMPTS):
+        # ✅ 数据库中的 unlocked_tier 是权威值（webhook 可能刚更新）；记录不存在时才使用支付会话的层级
+        unlocked_tier_value = normalize_tier(assessment.unlocked_tier) if assessment else session_tier
+        result = await _compute_assess_result(request, request_key, unlocked_tier_value)
+        # 评估数据压缩存入 payload；旧 JSON 列置为 SQL NULL（历史记录重新评估时顺带迁移）
+        values = {
+            "unlocked_tier": unlocked_tier_value,
+            "payload": result.payload,
+            "result_data": null(),
+            "decision_summary_data": null(),
+            "input_data": null(),
+        }
+
+        if assessment is None:
+            # 从 request 中获取 user_id（如果有的话，前端可以通过 header 传递）
+            db.add(Assessment(assessment_id=current_assessment_id, user_id=None, **values))
+            try:
+                await db.commit()
+                break
+            except IntegrityError:
+                # 并发请求抢先创建了同一 assessment_id：按已存在记录重试
+                await db.rollback()
+        else:
+            # ✅ 乐观并发：只在 unlocked_tier 仍是读取时的值时写入，
+            # 避免 webhook 在本请求计算期间改写的层级被旧值覆盖（Postgres 上行锁已阻止并发修改，这里兜底 SQLite）
+            updated = await db.execute(
+                update(Assessment)
+                .where(Assessment.id == assessment.id, _tier_unchanged(assessment.unlocked_tier))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            if updated.rowcount == 1:
+                await db.commit()
+                await run_in_threadpool(invalidate_report_cache, current_assessment_id)
+                break
+            logger.warning("[ASSESS] unlocked_tier changed concurrently, recomputing assessment_id=%s", current_assessment_id)
+            await db.rollback()
+        assessment = await _load_assessment_for_update(db, current_assessment_id)
+    else:
+        raise HTTPException(status_code=409, detail="评估记录被并发更新，请重试")
+
+    # 返回 assessment_id（关键：前端必须使用这个）；响应内容已按 response_model 校验
+    return JSONResponse(content=result.response_content(current_assessment_id))
+
+
+def _assess_batch_items(items: List[RiskAssessmentRequest]) -> Tuple[list, bytes]:
+    """
+    批量评估的计算部分（同步，在线程池中执行）：计分、决策摘要、评估数据编码、响应序列化
+    返回 (待插入的行, 响应体)，顺序与 items 一致
+    """
+    unlocked_tier_value = "none"
+    results = []
+    rows = []
+    payloads = []
+    for request, (risk_score, risk_level, findings, meta) in zip(items, assess_risk_v3_batch(items)):
+        findings = _filter_pro_findings(findings, unlocked_tier_value)
+        findings_dict = _findings_to_dicts(findings)
+        decision_summary = compute_decision_summary(
+            stage=request.stage,
+            industry=request.industry,
+            risk_score=risk_score,
+            risk_level=risk_level,
+            monthly_income=request.monthly_income,
+            employee_count=request.employee_count,
+            findings=findings_dict,
+            meta=meta,
+            unlocked_tier=unlocked_tier_value,
+        )
+        assessment_id = _new_assessment_id()
+        rows.append({
+            "assessment_id": assessment_id,
+            "user_id": None,
+            "unlocked_tier": unlocked_tier_value,
+        })
+        payloads.append({
+            "result_data": {
+                "risk_score": risk_score,
+                "risk_level": risk_level,
+                "findings": findings_dict,
+                "meta": meta,
+            },
+            "decision_summary_data": decision_summary.model_dump(),
+            "input_data": _input_data(request),
+        })
+        results.append(RiskAssessmentResponse(
+            id=assessment_id,
+            risk_score=risk_score,
+            risk_level=risk_level,
+            findings=findings,
+            decision_summary=decision_summary,
+            meta=meta,
+        ))
+
+    # 评估数据一次编码（新文案片段一次性入库）；响应按 response_model 序列化（与 JSONResponse 编码一致）
+    for row, blob in zip(rows, encode_assessment_payloads_sync(payloads)):
+        row["payload"] = blob
+    content = BatchAssessmentResponse(results=results).model_dump(mode="json")
+    return rows, JSONResponse(content=content).body
+
+
+@router.post("/assess/batch", response_model=BatchAssessmentResponse)
+async def assess_compliance_batch(
+    batch: BatchAssessmentRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    批量合规风险评估接口（gestoría 批量导入客户画像）
+    - 一次向量化计分（assess_risk_v3_batch），结果与逐条调用 /assess 一致
+    - 每条生成新的 assessment_id，未解锁（unlocked_tier = none）
+    - 所有 Assessment 记录一次性批量写入
+    返回顺序与请求 items 一致
+    """
+    if len(batch.items) > BATCH_ASSESS_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"批量评估最多 {BATCH_ASSESS_MAX_ITEMS} 条，当前 {len(batch.items)} 条",
+        )
+
+    # 计分 / 决策摘要 / 编码 / 序列化都是 CPU 计算（最多 BATCH_ASSESS_MAX_ITEMS 条），整体放到线程池，不阻塞事件循环
+    rows, body = await run_in_threadpool(_assess_batch_items, batch.items)
+
+    # 单次批量插入（executemany）
+    await db.execute(insert(Assessment), rows)
+    await db.commit()
+
+    logger.info("[ASSESS_BATCH] assessed and stored %s items", len(rows))
+
+    return Response(content=body, media_type="application/json")
+
+
+@router.post("/portfolio/simulate", response_model=PortfolioSimulationResponse)
+async def simulate_portfolio_risk(
+    body: PortfolioSimulationRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    组合风险蒙特卡洛模拟（gestoría 客户组合）
+    - 需要每个评估都已解锁（与整改方案相同）；不存在或缺少画像的评估列入 missing
+    - 画像取自各评估记录的 input_data，只有收入按对数正态抽样，其余模块不变
+    - 每个客户返回下季度各风险等级的概率（当前等级 -> 各等级的转移概率）与分数分位数
+    - 计算在线程池中执行（NumPy 分块计分，services.portfolio_sim）
+    """
+    assessment_ids = list(dict.fromkeys(body.assessment_ids))
+    if len(assessment_ids) > PORTFOLIO_SIM_MAX_CLIENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"组合模拟最多 {PORTFOLIO_SIM_MAX_CLIENTS} 个客户，当前 {len(assessment_ids)} 个",
+        )
+    if body.draws > PORTFOLIO_SIM_MAX_DRAWS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"每个客户最多 {PORTFOLIO_SIM_MAX_DRAWS} 个抽样场景，当前 {body.draws} 个",
+        )
+
+    assessments = {
+        assessment.assessment_id: assessment
+        for assessment in await db.scalars(
+            select(Assessment).where(Assessment.assessment_id.in_(assessment_ids))
+        )
+    }
+    locked = [
+        assessment_id for assessment_id in assessment_ids
+        if assessment_id in assessments and normalize_tier(assessments[assessment_id].unlocked_tier) == "none"
+    ]
+    if locked:
+        raise HTTPException(
+            status_code=403,
+            detail=f"需要解锁后才能进行组合模拟（{len(locked)} 个评估未解锁：{'、'.join(locked[:10])}）。请先完成支付。",
+        )
+
+    # 评估数据整批解码（缺少的片段合并查询），在线程池中执行
+    loaded = await run_in_threadpool(load_assessment_payloads_sync, list(assessments.values()))
+    payloads = dict(zip(assessments, loaded))
+    found_ids = []
+    requests = []
+    missing = []
+    for assessment_id in assessment_ids:
+        input_data = (payloads.get(assessment_id) or {}).get("input_data")
+        if not input_data:
+            missing.append(assessment_id)
+            continue
+        found_ids.append(assessment_id)
+        requests.append(RiskAssessmentRequest(**input_data))
+    if not requests:
+        raise HTTPException(status_code=404, detail="没有可模拟的评估（不存在或缺少原始画像数据）")
+
+    assumptions = [body.overrides.get(assessment_id, body.income) for assessment_id in found_ids]
+    result = await run_in_threadpool(
+        simulate_portfolio,
+        requests,
+        [assumption.volatility for assumption in assumptions],
+        [assumption.drift for assumption in assumptions],
+        body.draws,
+        body.seed,
+    )
+    logger.info(
+        "[PORTFOLIO_SIM] clients=%s draws=%s missing=%s", len(requests), body.draws, len(missing)
+    )
+    return PortfolioSimulationResponse(
+        clients=[
+            {"assessment_id": assessment_id, **client}
+            for assessment_id, client in zip(found_ids, result["clients"])
+        ],
+        portfolio=result["portfolio"],
+        missing=missing,
+    )
+
+
+@router.post("/assess/remediation", response_model=RemediationResponse)
+async def assess_remediation(
+    body: RemediationRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    整改方案（付费）：在已保存的画像上搜索最便宜的信号翻转组合，使风险降到目标等级 / 区间
+    - 画像取自评估记录的 input_data，按当前规则重新计分
+    - 只翻转信号，stage / 收入 / 雇员 / POS 不变；每个候选只做一次分数查表（services.remediation）
+    """
+    assessment = await db.scalar(
+        select(Assessment).where(Assessment.assessment_id == body.assessment_id)
+    )
+    if not assessment:
+        raise HTTPException(status_code=404, detail="评估不存在")
+    if normalize_tier(assessment.unlocked_tier) == "none":
+        raise HTTPException(status_code=403, detail="需要解锁后才能查看整改方案。请先完成支付。")
+    if body.target_band and body.target_band not in BAND_MAX_SCORE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"未知的风险区间：{body.target_band}（可选：{'、'.join(BAND_MAX_SCORE)}）",
+        )
+    if any(cost <= 0 for cost in body.costs.values()):
+        raise HTTPException(status_code=400, detail="整改成本必须大于 0")
+
+    payload = await load_assessment_payload(assessment)
+    input_data = (payload or {}).get("input_data")
+    if not input_data:
+        raise HTTPException(status_code=400, detail="评估缺少原始画像数据，请重新进行评估。")
+    request = RiskAssessmentRequest(**input_data)
+
+    result = plan_remediation(
+        request,
+        target_level=body.target_level,
+        target_band=body.target_band,
+        actionable_signals=body.actionable_signals,
+        costs=body.costs,
+        max_flips=min(body.max_flips or REMEDIATION_MAX_FLIPS, REMEDIATION_MAX_FLIPS),
+        max_plans=body.max_plans,
+    )
+    logger.info(
+        "[REMEDIATION] assessment_id=%s plans=%s searched=%s complete=%s",
+        body.assessment_id, len(result["plans"]), result["searched"], result["complete"],
+    )
+    return RemediationResponse(assessment_id=body.assessment_id, **result)
 
 
 @router.get("/assessments/{assessment_id}")
@@ -197,7 +491,7 @@ async def get_assessment(
     monthly_income: Optional[float] = Query(None, description="Monthly income"),
     employee_count: Optional[int] = Query(None, description="Employee count"),
     has_pos: Optional[bool] = Query(None, description="Has POS"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     根据 assessment_id 获取评估的解锁状态（权威来源）
@@ -207,9 +501,9 @@ async def get_assessment(
     
     返回：assessment_id, user_id, unlocked_tier, stripe_session_id, decision_summary (可选)
     """
-    assessment = db.query(Assessment).filter(
-        Assessment.assessment_id == assessment_id
-    ).first()
+    assessment = await db.scalar(
+        select(Assessment).where(Assessment.assessment_id == assessment_id)
+    )
     
     if not assessment:
         raise HTTPException(status_code=404, detail="Assessment not found")
@@ -5,15 +5,19 @@
 from fastapi import APIRouter, Query, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 import stripe
 import os
 import logging
-from app.database import get_db
+from app.database import get_async_db
 from app.services.stripe_service import verify_payment_session
 from app.services.decision_templates import normalize_tier
+from app.services.report_cache import invalidate_report_cache
+from app.services.render_queue import enqueue_render
 from app.models import PaymentSession, Assessment
+from starlette.concurrency import run_in_threadpool
 
 # 初始化 Stripe
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "")
@@ -67,7 +71,7 @@ class PaymentStatusResponse(BaseModel):
 @router.get("/verify", response_model=PaymentVerificationResponse)
 async def verify_payment_endpoint(
     session_id: str = Query(..., description="Stripe Checkout Session ID"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     验证支付状态
@@ -76,7 +80,7 @@ async def verify_payment_endpoint(
     if not session_id:
         raise HTTPException(status_code=400, detail="session_id is required")
     
-    payment_session = verify_payment_session(session_id, db)
+    payment_session = await verify_payment_session(session_id, db)
     
     if payment_session and payment_session.status == "paid":
         return PaymentVerificationResponse(
@@ -85,9 +89,9 @@ async def verify_payment_endpoint(
         )
     else:
         # 检查是否存在未支付的记录
-        payment_session = db.query(PaymentSession).filter(
-            PaymentSession.session_id == session_id
-        ).first()
+        payment_session = await db.scalar(
+            select(PaymentSession).where(PaymentSession.session_id == session_id)
+        )
         
         if payment_session:
             return PaymentVerificationResponse(
@@ -113,7 +117,7 @@ def normalize_paid_tier(t: Optional[str]) -> Optional[str]:
 @router.get("/status", response_model=PaymentStatusResponse)
 async def get_payment_status(
     session_id: str = Query(..., description="Stripe Checkout Session ID"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     查询支付状态（给 success 页面使用）
@@ -123,7 +127,7 @@ async def get_payment_status(
     """
     logger.info("[PAYMENT_STATUS] query payment status")
     
-    payment_session = verify_payment_session(session_id, db)
+    payment_session = await verify_payment_session(session_id, db)
 
     if not payment_session or payment_session.status != "paid":
         logger.info("[PAYMENT_STATUS] payment not found or not paid")
@@ -134,9 +138,9 @@ async def get_payment_status(
         logger.warning("[PAYMENT_STATUS] paid but missing assessment_id in PaymentSession")
         return PaymentStatusResponse(paid=True, assessment_id=None, unlocked_tier=None)
 
-    assessment = db.query(Assessment).filter(
-        Assessment.assessment_id == payment_session.assessment_id
-    ).first()
+    assessment = await db.scalar(
+        select(Assessment).where(Assessment.assessment_id == payment_session.assessment_id)
+    )
 
     # 如果 assessment 不存在，也要返回 assessment_id 方便排查
     if not assessment:
@@ -169,8 +173,10 @@ async def get_payment_status(
         assessment.unlocked_at = datetime.utcnow()
         if not assessment.stripe_session_id:
             assessment.stripe_session_id = session_id
-        db.commit()
-        db.refresh(assessment)
+        await db.commit()
+        await db.refresh(assessment)
+        await run_in_threadpool(invalidate_report_cache, assessment.assessment_id)
+        await db.run_sync(enqueue_render, assessment.assessment_id)
         logger.info("[PAYMENT_STATUS] assessment unlocked")
 
     final_tier = normalize_paid_tier(assessment.unlocked_tier)
@@ -1,15 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, Header
 from pydantic import BaseModel
 from typing import Literal, Optional
-from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import stripe
 import os
 import logging
-import sentry_sdk
+from app.services import stripe_gateway
 from app.services.stripe_service import create_checkout_session
-from app.database import get_db
-from app.models import PaymentSession, Assessment, WebhookEvent
+from app.services.webhook_inbox import ingest_event, requeue_event
+from app.database import get_async_db
+from app.models import PaymentSession, Assessment
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -48,247 +49,10 @@ class CheckoutSessionResponse(BaseModel):
     }
 
 
-def _process_checkout_completed(event: dict, db: Session, allow_duplicate: bool = False) -> dict:
-    event_id = event.get("id")
-    if not event_id:
-        raise HTTPException(status_code=400, detail="Missing event id")
-
-    session = event.get("data", {}).get("object", {})
-    session_id = session.get("id")
-    if not session_id:
-        raise HTTPException(status_code=400, detail="Missing session id")
-
-    existing_event = db.query(WebhookEvent).filter(WebhookEvent.event_id == event_id).first()
-    if existing_event:
-        if existing_event.status in ("processed", "processing"):
-            if allow_duplicate:
-                return {"status": "already_processed"}
-            return {"status": "duplicate"}
-        existing_event.status = "processing"
-    else:
-        existing_event = WebhookEvent(
-            event_id=event_id,
-            event_type=event.get("type", ""),
-            session_id=session_id,
-            status="processing"
-        )
-        db.add(existing_event)
-    db.commit()
-
-    metadata = session.get("metadata", {})
-    logger.info("[WEBHOOK] checkout.session.completed received: session_id=%s", session_id)
-
-    assessment_id = metadata.get("assessment_id")
-    tier_raw = metadata.get("tier", "basic_15")
-    from app.services.decision_templates import normalize_tier
-
-    def tier_rank(t: str) -> int:
-        normalized = normalize_tier(t)
-        return {"none": 0, "basic_15": 1, "expert_39": 2}.get(normalized, 0)
-
-    tier = normalize_tier(tier_raw)
-    user_id = metadata.get("user_id", "")
-
-    if not assessment_id or not user_id:
-        raise HTTPException(status_code=400, detail="Missing assessment_id or user_id in metadata")
-
-    if session.get("payment_status") != "paid":
-        raise HTTPException(status_code=400, detail="Payment not completed")
-
-    expected_amounts = {
-        "basic_15": 1500,
-        "expert_39": 3900,
-    }
-    amount_total = session.get("amount_total")
-    currency = (session.get("currency") or "").lower()
-    expected_amount = expected_amounts.get(tier)
-    if amount_total is None or expected_amount is None:
-        raise HTTPException(status_code=400, detail="Invalid payment amount or tier")
-    if currency != "eur":
-        raise HTTPException(status_code=400, detail=f"Invalid currency: {currency}")
-    if int(amount_total) != int(expected_amount):
-        raise HTTPException(status_code=400, detail=f"Amount mismatch: {amount_total} != {expected_amount}")
-
-    logger.info("[WEBHOOK] tier normalized: %s -> %s", tier_raw, tier)
-
-    try:
-        payment_session = db.query(PaymentSession).filter(
-            PaymentSession.session_id == session_id
-        ).first()
-
-        if payment_session:
-            payment_session.status = "paid"
-            payment_session.paid_at = datetime.utcnow()
-        else:
-            payment_session = PaymentSession(
-                session_id=session_id,
-                assessment_id=assessment_id,
-                tier=tier,
-                status="paid",
-                amount=session.get("amount_total", 0),
-                currency=session.get("currency", "eur"),
-                paid_at=datetime.utcnow()
-            )
-            db.add(payment_session)
-
-        if assessment_id:
-            logger.info("[WEBHOOK] updating assessment unlock status")
-
-            assessment = db.query(Assessment).filter(
-                Assessment.assessment_id == assessment_id
-            ).first()
-
-            if assessment:
-                old_tier = normalize_tier(assessment.unlocked_tier or "none")
-                new_tier = tier
-
-                if tier_rank(new_tier) > tier_rank(old_tier):
-                    assessment.unlocked_tier = new_tier
-                    assessment.unlocked_at = datetime.utcnow()
-                    assessment.stripe_session_id = session_id
-
-                    if user_id and not assessment.user_id:
-                        assessment.user_id = user_id
-
-                    db.commit()
-                    db.refresh(assessment)
-
-                    logger.info(
-                        "[WEBHOOK] assessment upgraded: old=%s new=%s session_id=%s",
-                        old_tier,
-                        new_tier,
-                        session_id,
-                    )
-                else:
-                    logger.warning(
-                        "[WEBHOOK] tier not upgraded: old=%s new=%s",
-                        old_tier,
-                        new_tier,
-                    )
-
-                verify_assessment = db.query(Assessment).filter(Assessment.assessment_id == assessment_id).first()
-                if verify_assessment:
-                    logger.info(
-                        "[WEBHOOK] verification confirmed: unlocked_tier=%s",
-                        verify_assessment.unlocked_tier,
-                    )
-                else:
-                    logger.warning("[WEBHOOK] verification failed: assessment not found")
-            else:
-                logger.info("[WEBHOOK] assessment not found, creating new record")
-                assessment = Assessment(
-                    assessment_id=assessment_id,
-                    user_id=user_id,
-                    unlocked_tier=tier,
-                    unlocked_at=datetime.utcnow(),
-                    stripe_session_id=session_id
-                )
-                db.add(assessment)
-                db.commit()
-                db.refresh(assessment)
-
-                logger.info(
-                    "[WEBHOOK] assessment created: unlocked_tier=%s session_id=%s",
-                    assessment.unlocked_tier,
-                    session_id,
-                )
-
-                verify_assessment = db.query(Assessment).filter(Assessment.assessment_id == assessment_id).first()
-                if verify_assessment:
-                    logger.info(
-                        "[WEBHOOK] verification confirmed: unlocked_tier=%s",
-                        verify_assessment.unlocked_tier,
-                    )
-                else:
-                    logger.warning("[WEBHOOK] verification failed: assessment not found")
-        else:
-            logger.warning("[WEBHOOK] missing assessment_id in metadata, skip update")
-
-        existing_event.status = "processed"
-        existing_event.processed_at = datetime.utcnow()
-        existing_event.error = None
-        db.commit()
-        return {"status": "success"}
-    except HTTPException as e:
-        existing_event.status = "failed"
-        existing_event.error = str(e.detail)
-        db.commit()
-        sentry_sdk.capture_message(f"Stripe webhook failed: {e.detail}", level="error")
-        raise
-    except Exception as e:
-        existing_event.status = "failed"
-        existing_event.error = str(e)
-        db.commit()
-        sentry_sdk.capture_exception(e)
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-def _process_refund(event: dict, db: Session, allow_duplicate: bool = False) -> dict:
-    event_id = event.get("id")
-    if not event_id:
-        raise HTTPException(status_code=400, detail="Missing event id")
-
-    charge = event.get("data", {}).get("object", {})
-    payment_intent = charge.get("payment_intent")
-    if not payment_intent:
-        return {"status": "ignored", "reason": "missing_payment_intent"}
-
-    existing_event = db.query(WebhookEvent).filter(WebhookEvent.event_id == event_id).first()
-    if existing_event:
-        if existing_event.status in ("processed", "processing"):
-            if allow_duplicate:
-                return {"status": "already_processed"}
-            return {"status": "duplicate"}
-        existing_event.status = "processing"
-    else:
-        existing_event = WebhookEvent(
-            event_id=event_id,
-            event_type=event.get("type", ""),
-            session_id=None,
-            status="processing"
-        )
-        db.add(existing_event)
-    db.commit()
-
-    try:
-        sessions = stripe.checkout.Session.list(payment_intent=payment_intent, limit=1)
-        session_id = sessions.data[0].id if sessions.data else None
-        if not session_id:
-            existing_event.status = "failed"
-            existing_event.error = "No checkout session found for payment_intent"
-            db.commit()
-            return {"status": "failed", "reason": "session_not_found"}
-
-        payment_session = db.query(PaymentSession).filter(
-            PaymentSession.session_id == session_id
-        ).first()
-        if payment_session:
-            payment_session.status = "refunded"
-
-        assessment = db.query(Assessment).filter(
-            Assessment.stripe_session_id == session_id
-        ).first()
-        if assessment:
-            assessment.unlocked_tier = "none"
-            assessment.unlocked_at = None
-
-        existing_event.status = "processed"
-        existing_event.processed_at = datetime.utcnow()
-        existing_event.error = None
-        db.commit()
-        return {"status": "success"}
-    except Exception as e:
-        existing_event.status = "failed"
-        existing_event.error = str(e)
-        db.commit()
-        sentry_sdk.capture_exception(e)
-        raise HTTPException(status_code=500, detail=str(e))
-
-
 @router.post("/create-checkout-session", response_model=CheckoutSessionResponse)
 async def create_checkout_session_endpoint(
     request: CheckoutSessionRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     创建 Stripe Checkout Session
@@ -299,9 +63,7 @@ async def create_checkout_session_endpoint(
     
     try:
         # 确保 assessment 记录存在（如果不存在则创建）
-        assessment = db.query(Assessment).filter(
-            Assessment.assessment_id == request.assessment_id
-        ).first()
+        assessment = await db.scalar(select(Assessment).where(Assessment.assessment_id == request.assessment_id))
         
         if not assessment:
             assessment = Assessment(
@@ -310,7 +72,7 @@ async def create_checkout_session_endpoint(
                 unlocked_tier="none"
             )
             db.add(assessment)
-            db.commit()
+            await db.commit()
         
         # ✅ 尝试获取 decision_code（如果 assessment 有相关数据）
         # 注意：Assessment 模型可能不直接存储 decision_code，这里先留空
@@ -318,13 +80,21 @@ async def create_checkout_session_endpoint(
         decision_code = ""  # 暂时留空，未来可以扩展
         
         # A. tier 统一：直接传递 tier（已经是 "basic_15" 或 "expert_39"）
-        result = create_checkout_session(
+        result = await create_checkout_session(
             tier=request.tier,
             assessment_id=request.assessment_id,
             user_id=request.user_id,
-            db=db,
             decision_code=decision_code  # ✅ 传递 decision_code
         )
+        db.add(PaymentSession(
+            session_id=result["session_id"],
+            assessment_id=request.assessment_id,
+            tier=result["tier"],
+            status="pending",
+            amount=result["amount"],
+            currency="eur"
+        ))
+        await db.commit()
         return CheckoutSessionResponse(
             checkout_url=result["checkout_url"],
             session_id=result["session_id"]
@@ -334,11 +104,10 @@ async def create_checkout_session_endpoint(
 
 
 @router.post("/webhook")
-async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
+async def stripe_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Stripe Webhook 端点
-    处理支付成功事件
-    注意：在生产环境中需要验证 webhook 签名
+    验签后写入收件箱（webhook_events）立即返回，业务处理由后台 worker 完成（见 services/webhook_inbox.py）
     """
     payload = await request.body()
     sig_header = request.headers.get("stripe-signature")
@@ -357,62 +126,38 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
     except stripe.error.SignatureVerificationError as e:
         raise HTTPException(status_code=400, detail=f"Invalid signature: {e}")
 
-    event_type = event.get("type")
-    if event_type == "checkout.session.completed":
-        return _process_checkout_completed(event, db, allow_duplicate=False)
-    if event_type in ("charge.refunded", "charge.refund.updated"):
-        return _process_refund(event, db, allow_duplicate=False)
+    if not event.get("id"):
+        raise HTTPException(status_code=400, detail="Missing event id")
 
-    return {"status": "ignored", "event_type": event_type}
+    status = await ingest_event(db, event)
+    return {"status": status, "event_type": event.get("type")}
 
 
 @router.post("/webhook/retry/{event_id}")
 async def retry_webhook_event(
     event_id: str,
     x_admin_token: Optional[str] = Header(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     手动重试 Stripe Webhook（需配置 WEBHOOK_RETRY_TOKEN）
+    收件箱里已有的事件重新入队；没有的从 Stripe 拉取后入库
     """
     admin_token = os.getenv("WEBHOOK_RETRY_TOKEN")
     if not admin_token or x_admin_token != admin_token:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    try:
-        event = stripe.Event.retrieve(event_id)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to retrieve event: {e}")
+    if not stripe_gateway.is_event_id(event_id):
+        raise HTTPException(status_code=400, detail="Invalid event id")
 
-    event_type = event.get("type")
-    if event_type == "checkout.session.completed":
-        return _process_checkout_completed(event, db, allow_duplicate=True)
-    if event_type in ("charge.refunded", "charge.refund.updated"):
-        return _process_refund(event, db, allow_duplicate=True)
-
-    return {"status": "ignored", "event_type": event_type}
-
-
-@router.post("/webhook/retry/{event_id}")
-async def retry_webhook_event(
-    event_id: str,
-    x_admin_token: Optional[str] = Header(None),
-    db: Session = Depends(get_db),
-):
-    """
-    手动重试 Stripe Webhook（需配置 WEBHOOK_RETRY_TOKEN）
-    """
-    admin_token = os.getenv("WEBHOOK_RETRY_TOKEN")
-    if not admin_token or x_admin_token != admin_token:
-        raise HTTPException(status_code=403, detail="Forbidden")
+    status = await requeue_event(db, event_id)
+    if status is not None:
+        return {"status": status, "event_id": event_id}
 
     try:
-        event = stripe.Event.retrieve(event_id)
+        event = await stripe_gateway.retrieve_event(event_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to retrieve event: {e}")
 
-    if event.get("type") != "checkout.session.completed":
-        return {"status": "ignored", "event_type": event.get("type")}
-
-    return _process_checkout_completed(event, db, allow_duplicate=True)
-
+    status = await ingest_event(db, event)
+    return {"status": status, "event_id": event_id, "event_type": event.get("type")}
@@ -1,27 +1,40 @@
 """
 数据库配置和连接
-使用 SQLite（简单，无需额外配置）
+使用 SQLite（简单，无需额外配置）；连接池 / SQLite PRAGMA 见 db_config
 """
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+from .db_config import async_database_url, async_engine_kwargs, configure_engine, engine_kwargs
 
 # SQLite 数据库路径
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./payments.db")
 
-# 创建引擎（仅 SQLite 需要 check_same_thread）
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-engine = create_engine(
+# 创建引擎（SQLite：WAL 等 PRAGMA；Postgres：连接池参数）
+engine = configure_engine(
+    "sync",
+    create_engine(
+        DATABASE_URL,
+        echo=False,  # 设置为 True 可以看到 SQL 日志
+        **engine_kwargs(DATABASE_URL),
+    ),
     DATABASE_URL,
-    connect_args=connect_args,
-    echo=False  # 设置为 True 可以看到 SQL 日志
 )
 
-# 创建 SessionLocal 类
+# 创建 SessionLocal 类（后台线程 / 线程池中使用）
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎（API 路由使用：aiosqlite / asyncpg，查询等待期间不阻塞事件循环）
+ASYNC_DATABASE_URL = async_database_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, **async_engine_kwargs(DATABASE_URL))
+configure_engine("async", async_engine.sync_engine, DATABASE_URL)
+
+# expire_on_commit=False：提交后仍可读取已加载的属性（异步会话不能隐式懒加载）
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # 创建 Base 类
 Base = declarative_base()
 
@@ -37,6 +50,14 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """
+    获取异步数据库会话（依赖注入）
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
     """
     初始化数据库（创建表）
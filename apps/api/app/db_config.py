@@ -0,0 +1,188 @@
+"""
+数据库引擎配置
+- SQLite：每个新连接执行 PRAGMA（WAL、synchronous、busy_timeout、cache_size、mmap_size），
+  并发写（webhook + 评估写入）时排队等待而不是立即 "database is locked"
+- Postgres：连接池大小 / 溢出 / 回收 / 超时 / pre_ping
+- 连接池指标：连接 / 借出 / 归还 / 失效次数与借出峰值（/metrics 使用）
+- 异步引擎：同一个 DATABASE_URL 换成异步驱动（SQLite -> aiosqlite，Postgres -> asyncpg），配置与同步引擎一致
+"""
+
+import os
+import threading
+from typing import Any, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# SQLite
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-20000"))  # 负数单位为 KiB（约 20 MB）
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# 连接池（Postgres / SQLite 文件库）
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+_SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:" or "mode=memory" in url
+
+
+def sqlite_pragmas() -> List[str]:
+    """每个 SQLite 连接要执行的 PRAGMA（取值做白名单校验，避免拼接任意 SQL）"""
+    journal_mode = SQLITE_JOURNAL_MODE.upper()
+    synchronous = SQLITE_SYNCHRONOUS.upper()
+    if journal_mode not in _JOURNAL_MODES:
+        raise ValueError(f"SQLITE_JOURNAL_MODE 不支持：{SQLITE_JOURNAL_MODE}")
+    if synchronous not in _SYNCHRONOUS_LEVELS:
+        raise ValueError(f"SQLITE_SYNCHRONOUS 不支持：{SQLITE_SYNCHRONOUS}")
+    return [
+        f"PRAGMA journal_mode={journal_mode}",
+        f"PRAGMA synchronous={synchronous}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA cache_size={SQLITE_CACHE_SIZE}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+    ]
+
+
+def engine_kwargs(url: str) -> Dict[str, Any]:
+    """create_engine 参数（SQLite 内存库使用默认的单连接池，不设置池参数）"""
+    if is_sqlite(url):
+        # check_same_thread：连接会在线程池线程间传递；timeout：pysqlite 层的锁等待（秒）
+        kwargs: Dict[str, Any] = {
+            "connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        }
+        if _is_sqlite_memory(url):
+            return kwargs
+    else:
+        kwargs = {"pool_pre_ping": DB_POOL_PRE_PING}
+    kwargs.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE_SECONDS,
+        pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+    )
+    return kwargs
+
+
+_ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def async_database_url(url: str) -> str:
+    """同步 URL -> 异步驱动 URL（sqlite:///x.db -> sqlite+aiosqlite:///x.db，postgresql[+psycopg2]:// -> postgresql+asyncpg://）"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = _ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise ValueError(f"不支持的异步数据库：{backend}")
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+
+def async_engine_kwargs(url: str) -> Dict[str, Any]:
+    """create_async_engine 参数（文件库 / Postgres 显式使用 AsyncAdaptedQueuePool，池参数与同步引擎一致）"""
+    kwargs = engine_kwargs(url)
+    if "pool_size" in kwargs:
+        kwargs["poolclass"] = AsyncAdaptedQueuePool
+    return kwargs
+
+
+def install_sqlite_pragmas(engine: Engine) -> None:
+    """新连接建立时执行 PRAGMA（engine 为同步 Engine；异步引擎传 async_engine.sync_engine）"""
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+class PoolMetrics:
+    """通过连接池事件统计借出情况"""
+
+    def __init__(self, name: str, engine: Engine):
+        self.name = name
+        self._engine = engine
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            if self.checked_out > self.peak_checked_out:
+                self.peak_checked_out = self.checked_out
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        pool = self._engine.pool
+        with self._lock:
+            data = {
+                "pool": type(pool).__name__,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "checked_out": self.checked_out,
+                "peak_checked_out": self.peak_checked_out,
+            }
+        # QueuePool 才有容量相关信息
+        for attr in ("size", "overflow", "checkedin"):
+            fn = getattr(pool, attr, None)
+            if callable(fn):
+                data[attr] = fn()
+        return data
+
+
+_POOL_METRICS: List[PoolMetrics] = []
+
+
+def configure_engine(name: str, engine: Engine, url: str) -> Engine:
+    """为引擎安装 SQLite PRAGMA 与连接池指标（异步引擎传 async_engine.sync_engine）"""
+    if is_sqlite(url):
+        install_sqlite_pragmas(engine)
+    _POOL_METRICS.append(PoolMetrics(name, engine))
+    return engine
+
+
+def db_pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {metrics.name: metrics.stats() for metrics in _POOL_METRICS}
@@ -1,15 +1,28 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Header, HTTPException, Request
+from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.responses import JSONResponse
 import os
-import time
 import sentry_sdk
 from sentry_sdk.integrations.fastapi import FastApiIntegration
 from sentry_sdk.integrations.starlette import StarletteIntegration
 from app.api.v1.routes import risk, stripe, compliance, payment, assessments
-from app.database import init_db, Base, engine
+from app.database import init_db, Base, engine, async_engine
+from app.db_config import db_pool_stats
+from app.services.assessment_store import assessment_store_stats
+from app.services.decision.action_index import validate_decision_templates
+from app.services.decision.summary_cache import get_decision_cache_stats
+from app.services.pdf_pool import pdf_pool_stats, shutdown_pdf_pool
+from app.services.rate_limit import create_rate_limiter
+from app.services.risk_engine import SCORE_TABLE
+from app.services.render_queue import render_queue_stats, start_render_workers, stop_render_workers
+from app.services.stripe_gateway import close_stripe_gateway, stripe_gateway_stats
+from app.services.stripe_service import stripe_session_cache_stats
+from app.services.webhook_inbox import start_webhook_workers, stop_webhook_workers, webhook_inbox_stats
+from app.migrations import add_missing_columns
+from starlette.concurrency import run_in_threadpool
 # 确保所有模型都被导入，以便 SQLAlchemy 创建表
-from app.models import PaymentSession, Assessment
+from app.models import PaymentSession, Assessment, PayloadFragment, RenderJob, RenderedReport, RateLimitBucket
 
 # Sentry 初始化（无 DSN 时不启用）
 _sentry_dsn = os.getenv("SENTRY_DSN")
@@ -29,18 +42,33 @@ app = FastAPI(
     version="2.0.0"
 )
 
-# 简易限流（内存级，单实例使用）
-_rate_bucket = {}
-_rate_window_seconds = int(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "60"))
-_rate_max_requests = int(os.getenv("RATE_LIMIT_MAX_REQUESTS", "120"))
+# 限流（令牌桶；RATE_LIMIT_BACKEND=memory / shm / sql，多 worker / 多节点时选 shm / sql）
+_rate_limiter = create_rate_limiter()
 
 # 初始化数据库
 @app.on_event("startup")
 async def startup_event():
+    # 模板完整性检查（不满足时拒绝启动，请求路径不再做长度断言）
+    validate_decision_templates()
     # 创建所有表
     Base.metadata.create_all(bind=engine)
-
-# 限流中间件（生产建议替换为 Redis/网关）
+    # 已有表补齐新增的列 / 索引
+    add_missing_columns(engine, Base.metadata)
+    # PDF 预渲染 worker（解锁后入队的任务）
+    start_render_workers()
+    # Stripe webhook 收件箱 worker
+    start_webhook_workers()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_webhook_workers()
+    await stop_render_workers()
+    shutdown_pdf_pool()
+    await close_stripe_gateway()
+    await async_engine.dispose()
+
+# 限流中间件（多节点时可用 sql 后端，或替换为 Redis/网关）
 @app.middleware("http")
 async def rate_limit_middleware(request: Request, call_next):
     path = request.url.path
@@ -52,19 +80,15 @@ async def rate_limit_middleware(request: Request, call_next):
 
     client_ip = request.headers.get("x-forwarded-for", request.client.host if request.client else "unknown")
     key = f"{client_ip}:{path}"
-    now = time.time()
-    window = _rate_window_seconds
-    max_requests = _rate_max_requests
-
-    timestamps = _rate_bucket.get(key, [])
-    timestamps = [t for t in timestamps if now - t < window]
-    if len(timestamps) >= max_requests:
+    if _rate_limiter.blocking:
+        allowed = await run_in_threadpool(_rate_limiter.allow, key)
+    else:
+        allowed = _rate_limiter.allow(key)
+    if not allowed:
         return JSONResponse(
             status_code=429,
             content={"detail": "请求过于频繁，请稍后再试。"},
         )
-    timestamps.append(now)
-    _rate_bucket[key] = timestamps
 
     return await call_next(request)
 
@@ -110,3 +134,25 @@ async def root():
 async def health():
     return {"status": "ok"}
 
+
+@app.get("/metrics")
+async def metrics(x_admin_token: Optional[str] = Header(None)):
+    """
+    进程内缓存统计（命中/未命中/失效次数）+ 队列 / 收件箱各状态计数（需配置 METRICS_ADMIN_TOKEN）
+    不在 /api/ 下、不经过限流中间件，且会查询数据库，因此要求管理令牌
+    """
+    admin_token = os.getenv("METRICS_ADMIN_TOKEN")
+    if not admin_token or x_admin_token != admin_token:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {
+        "decision_cache": get_decision_cache_stats(),
+        "pdf_pool": pdf_pool_stats(),
+        "render_queue": await run_in_threadpool(render_queue_stats),
+        "webhook_inbox": await webhook_inbox_stats(),
+        "rate_limit": _rate_limiter.stats(),
+        "stripe_gateway": stripe_gateway_stats(),
+        "stripe_session_cache": stripe_session_cache_stats(),
+        "db_pool": db_pool_stats(),
+        "assessment_store": assessment_store_stats(),
+        "risk_score_table": SCORE_TABLE.stats(),
+    }
@@ -0,0 +1,46 @@
+"""
+轻量 schema 同步（没有 alembic）
+create_all 只建缺失的表，不会给已有表加列；这里为已有表补上模型里新增的列。
+只处理可以安全 ADD COLUMN 的列：可空，或带 server_default。
+不删列、不改类型、不建唯一约束；复杂变更仍需手工迁移。
+"""
+
+import logging
+from typing import List
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex, MetaData
+
+logger = logging.getLogger(__name__)
+
+
+def add_missing_columns(engine: Engine, metadata: MetaData) -> List[str]:
+    """为已有表补齐缺失列与缺失索引，返回新增的 "表.列" 列表"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added: List[str] = []
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    logger.error("[MIGRATE] cannot add NOT NULL column without server_default: %s.%s", table.name, column.name)
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+                conn.exec_driver_sql(ddl)
+                added.append(f"{table.name}.{column.name}")
+            # 模型新增的索引（包括给已有列加的 index=True）
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+    for name in added:
+        logger.info("[MIGRATE] added column %s", name)
+    return added
@@ -2,7 +2,7 @@
 数据库模型
 """
 
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, JSON, Text
+from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, JSON, LargeBinary, Text
 from sqlalchemy.sql import func
 from .database import Base
 import uuid
@@ -23,7 +23,9 @@ class Assessment(Base):
     unlocked_at = Column(DateTime, nullable=True)  # 解锁时间
     stripe_session_id = Column(String, nullable=True, index=True)  # 最后一次支付的 session_id（防重复）
     
-    # ✅ 新增：保存评估结果（JSON 格式）
+    # 评估结果（result_data / decision_summary_data / input_data）压缩存储，读写见 services/assessment_store.py
+    payload = Column(LargeBinary, nullable=True)
+    # 旧版 JSON 列：仅未迁移的历史记录有值（scripts/migrate_assessment_payloads.py 迁移后置空）
     result_data = Column(JSON, nullable=True)  # 保存 risk_score, risk_level, findings, meta
     decision_summary_data = Column(JSON, nullable=True)  # 保存 decision_summary（完整对象）
     input_data = Column(JSON, nullable=True)  # 保存原始请求数据（用于重新生成）
@@ -35,6 +37,24 @@ class Assessment(Base):
         return f"<Assessment(assessment_id={self.assessment_id}, unlocked_tier={self.unlocked_tier})>"
 
 
+class PayloadFragment(Base):
+    """
+    评估数据片段表（内容寻址，只增不改）
+    kind="str"：评估 JSON 中重复出现的字符串（模板文案、行动项、风险描述等），payload 中只存 id
+    kind="zdict"：zlib 预置字典（由迁移脚本从已有数据训练），payload 头部记录所用字典 id
+    """
+    __tablename__ = "payload_fragments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    digest = Column(String, unique=True, index=True, nullable=False)  # sha256(kind + data)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    def __repr__(self):
+        return f"<PayloadFragment(id={self.id}, kind={self.kind})>"
+
+
 class PaymentSession(Base):
     """
     支付会话表
@@ -50,6 +70,10 @@ class PaymentSession(Base):
     amount = Column(Integer, nullable=True)  # 金额（分）
     currency = Column(String, default="eur")
     paid_at = Column(DateTime, nullable=True)  # 支付完成时间
+    # Stripe 关联 id（支付完成时记录；退款事件只带 payment_intent / charge，据此本地查到 session）
+    payment_intent_id = Column(String, nullable=True, index=True)
+    charge_id = Column(String, nullable=True, index=True)
+    customer_id = Column(String, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
@@ -59,19 +83,81 @@ class PaymentSession(Base):
 
 class WebhookEvent(Base):
     """
-    Stripe Webhook 事件表（用于去重）
+    Stripe Webhook 事件表（去重 + 收件箱）
+    webhook 验签后写入 payload 并立即返回 200，由后台 worker 按 session_id 顺序处理。
+    status: queued / processing / processed / failed（重试次数用尽或数据无效，等待人工重试）
     """
     __tablename__ = "webhook_events"
 
     id = Column(Integer, primary_key=True, index=True)
     event_id = Column(String, unique=True, index=True, nullable=False)
     event_type = Column(String, nullable=False)
-    session_id = Column(String, nullable=True, index=True)
-    status = Column(String, nullable=False, default="processing")  # processing/processed/failed
+    session_id = Column(String, nullable=True, index=True)  # 顺序键（退款事件在处理时解析后回填）
+    status = Column(String, nullable=False, default="processing", index=True)
     error = Column(Text, nullable=True)
+    payload = Column(JSON, nullable=True)  # 验签后的事件原文
+    attempts = Column(Integer, nullable=False, server_default="0")
+    next_run_at = Column(DateTime, nullable=True)  # 重试退避：早于此时间不领取
+    locked_at = Column(DateTime, nullable=True)  # 领取时间（超过租约视为 worker 崩溃，重新入队）
     created_at = Column(DateTime, server_default=func.now())
     processed_at = Column(DateTime, nullable=True)
 
     def __repr__(self):
         return f"<WebhookEvent(event_id={self.event_id}, status={self.status})>"
 
+
+
+class RenderJob(Base):
+    """
+    PDF 预渲染任务表（数据库即队列，无外部 broker）
+    解锁 / 升级后入队，后台 worker 渲染后写入 rendered_reports（各实例共享）与本机 PDF 磁盘缓存。
+    status: queued / running / done / dead（重试次数用尽，进入死信，等待人工重试）
+    """
+    __tablename__ = "render_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    assessment_id = Column(String, index=True, nullable=False)
+    status = Column(String, nullable=False, default="queued", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    next_run_at = Column(DateTime, nullable=False, server_default=func.now())  # 重试退避：早于此时间不领取
+    locked_at = Column(DateTime, nullable=True)  # 领取时间（超过租约视为 worker 崩溃，重新入队）
+    digest = Column(String, nullable=True)  # 渲染完成的报告内容哈希（即 ETag）
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<RenderJob(assessment_id={self.assessment_id}, status={self.status}, attempts={self.attempts})>"
+
+
+class RenderedReport(Base):
+    """
+    预渲染完成的 PDF（每个评估只保留最新一份）
+    任务可能被任意实例领取，PDF 存在数据库里，下载请求落到哪个实例都能取到；
+    本机磁盘缓存（report_cache）未命中时从这里读取并回填。
+    """
+    __tablename__ = "rendered_reports"
+
+    assessment_id = Column(String, primary_key=True)
+    digest = Column(String, nullable=False)  # 报告内容哈希（即 ETag）
+    pdf = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<RenderedReport(assessment_id={self.assessment_id}, digest={self.digest})>"
+
+
+class RateLimitBucket(Base):
+    """
+    限流令牌桶表（RATE_LIMIT_BACKEND=sql 时使用，多节点共享）
+    updated_at 为 epoch 秒（浮点），便于在 SQL 中直接计算补充的令牌
+    """
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)  # ip:path
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<RateLimitBucket(key={self.key}, tokens={self.tokens})>"
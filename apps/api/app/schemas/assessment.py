@@ -212,3 +212,98 @@ class RiskAssessmentResponse(BaseModel):
             }
         }
     }
+
+
+class BatchAssessmentRequest(BaseModel):
+    """批量评估请求（gestoría 一次上传多个客户画像）"""
+    items: List[RiskAssessmentRequest] = Field(..., min_length=1, description="待评估的客户画像列表")
+
+
+class BatchAssessmentResponse(BaseModel):
+    """批量评估结果（顺序与请求 items 一致）"""
+    results: List[RiskAssessmentResponse]
+
+
+class RemediationRequest(BaseModel):
+    """整改方案请求（已解锁的评估：改哪些信号能降到目标等级 / 风险区间）"""
+    assessment_id: str
+    target_level: Optional[Literal["green", "yellow", "orange"]] = Field(None, description="目标风险等级（含更低）")
+    target_band: Optional[str] = Field(None, description="目标风险区间 label（RISK_BANDS，含更低）；都不填时为比当前低一级")
+    actionable_signals: Optional[List[str]] = Field(None, description="可翻转的信号；不填时为未勾选的减分项 + 已勾选的 no_* 缺失项")
+    costs: Dict[str, float] = Field(default_factory=dict, description="每个信号的整改成本（默认 1，必须 > 0）")
+    max_flips: Optional[int] = Field(None, ge=1, le=8, description="单个方案最多翻转的信号数")
+    max_plans: int = Field(5, ge=1, le=20)
+
+
+class RemediationFlip(BaseModel):
+    signal: str
+    title: str
+    from_value: bool
+    to_value: bool
+    score_delta: int  # 单独翻转该信号时的分数变化
+
+
+class RemediationPlan(BaseModel):
+    flips: List[RemediationFlip]
+    cost: float
+    risk_score: int
+    risk_level: Literal["green", "yellow", "orange", "red"]
+    risk_band: str
+    score_delta: int
+    resolved_combos: List[str]  # 不再触发的组合规则 code
+
+
+class RemediationResponse(BaseModel):
+    """整改方案（plans 按成本、翻转个数、新分数排序）"""
+    assessment_id: str
+    risk_score: int
+    risk_level: Literal["green", "yellow", "orange", "red"]
+    risk_band: str
+    target_max_score: int
+    target_met: bool  # 当前已达到目标
+    plans: List[RemediationPlan]
+    searched: int  # 枚举的组合数
+    complete: bool  # False：超出时间预算，plans 为已找到的部分
+    elapsed_ms: float
+
+
+class IncomeAssumption(BaseModel):
+    """下季度收入假设（对数正态）"""
+    volatility: float = Field(0.25, ge=0, le=3, description="季度对数收入波动率")
+    drift: float = Field(0.0, ge=-3, le=3, description="季度对数收入漂移（0 表示期望收入不变）")
+
+
+class PortfolioSimulationRequest(BaseModel):
+    """组合风险模拟请求（gestoría：已保存评估的客户组合）"""
+    assessment_ids: List[str] = Field(..., min_length=1)
+    income: IncomeAssumption = Field(default_factory=IncomeAssumption, description="默认收入假设")
+    overrides: Dict[str, IncomeAssumption] = Field(default_factory=dict, description="按 assessment_id 覆盖收入假设")
+    draws: int = Field(10000, ge=100, description="每个客户的抽样场景数")
+    seed: Optional[int] = Field(None, description="随机种子（相同种子结果可复现）")
+
+
+class PortfolioClientResult(BaseModel):
+    assessment_id: str
+    risk_score: int  # 当前分数（按当前规则重新计分）
+    risk_level: Literal["green", "yellow", "orange", "red"]
+    expected_score: float
+    score_p05: int
+    score_p50: int
+    score_p95: int
+    level_probabilities: Dict[str, float]  # 下季度各等级概率（当前等级 -> 各等级的转移概率）
+    p_level_up: float
+    p_level_down: float
+
+
+class PortfolioSummary(BaseModel):
+    clients: int
+    draws: int
+    current_level_counts: Dict[str, int]
+    expected_level_counts: Dict[str, float]
+    transition: Dict[str, Dict[str, float]]  # 当前等级 -> 下季度各等级的平均概率
+
+
+class PortfolioSimulationResponse(BaseModel):
+    clients: List[PortfolioClientResult]
+    portfolio: PortfolioSummary
+    missing: List[str]  # 不存在或缺少原始画像数据的 assessment_id
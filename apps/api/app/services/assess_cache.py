@@ -0,0 +1,85 @@
+"""
+/assess 计算结果缓存
+画像完全相同（stage / industry / 收入 / 员工数 / POS / signals）且解锁层级相同时，
+assess_risk_v3 + compute_decision_summary + 响应序列化 + payload 编码的结果是确定的，
+重复提交（连点、刷新、同画像用户）直接复用，不再重新计算。
+
+- 键：请求规范化 JSON 的 sha256 + 解锁层级；风险目录 / 决策模板只在重启时变化，
+  指纹（CATALOG_VERSION）导入时计算一次，不在请求路径上重新计算
+- 值只保存计算结果：已按 response_model 校验、序列化的响应 dict（id 为空）+ 编码后的评估数据 payload；
+  assessment_id、解锁状态等数据库状态不进入缓存，由调用方每次读取（响应 dict 只读，不要原地修改）
+- signals 保留提交顺序（findings 顺序依赖它）；收入不分桶（文案中包含具体金额）
+统计见 /metrics -> decision_cache.assess_result
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from ..schemas.assessment import RiskAssessmentRequest
+from .decision.summary_cache import register_cache, template_fingerprint
+from .decision_engine import DECISION_TEMPLATE_VERSION
+from .risk.industry_catalog import INDUSTRY_BASE, INDUSTRY_TAGS
+from .risk.risk_bands import RISK_BANDS
+from .risk.signals_catalog import INDUSTRY_COMBOS, INDUSTRY_SIGNALS, SIGNAL_DEFS
+from .risk_engine import INCOME_FINDING_THRESHOLDS, INCOME_SCORE_BY_STAGE, STAGE_FINDINGS
+
+ASSESS_RESULT_CACHE_MAXSIZE = int(os.getenv("ASSESS_RESULT_CACHE_MAXSIZE", "4096"))
+
+
+def catalog_version() -> str:
+    """风险目录 + 决策模板的内容指纹"""
+    return template_fingerprint(
+        INDUSTRY_BASE,
+        INDUSTRY_TAGS,
+        SIGNAL_DEFS,
+        INDUSTRY_SIGNALS,
+        INDUSTRY_COMBOS,
+        INCOME_SCORE_BY_STAGE,
+        INCOME_FINDING_THRESHOLDS,
+        STAGE_FINDINGS,
+        RISK_BANDS,
+        DECISION_TEMPLATE_VERSION,
+    )
+
+
+CATALOG_VERSION = catalog_version()
+
+_ASSESS_RESULT_CACHE = register_cache("assess_result", CATALOG_VERSION, maxsize=ASSESS_RESULT_CACHE_MAXSIZE)
+
+
+@dataclass(frozen=True)
+class AssessResult:
+    """一次评估的计算结果（与 assessment_id 无关）"""
+    response: Dict[str, Any]  # RiskAssessmentResponse.model_dump(mode="json")，id 为空
+    payload: bytes  # assessment_store 编码后的 result_data / decision_summary_data / input_data
+
+    def response_content(self, assessment_id: str) -> Dict[str, Any]:
+        """填入 assessment_id 后的响应内容（浅拷贝，缓存中的 dict 不变）"""
+        return {**self.response, "id": assessment_id}
+
+
+def assess_request_key(request: RiskAssessmentRequest) -> str:
+    canonical = json.dumps(
+        [
+            request.stage,
+            request.industry,
+            request.monthly_income,
+            request.employee_count,
+            request.has_pos,
+            list(request.signals.items()),
+        ],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def get_assess_result(request_key: str, unlocked_tier: str) -> Optional[AssessResult]:
+    return _ASSESS_RESULT_CACHE.get((request_key, unlocked_tier))
+
+
+def put_assess_result(request_key: str, unlocked_tier: str, result: AssessResult) -> None:
+    _ASSESS_RESULT_CACHE.put((request_key, unlocked_tier), result)
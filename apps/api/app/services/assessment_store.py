@@ -0,0 +1,507 @@
+"""
+评估数据紧凑存储（Assessment.payload）
+
+result_data / decision_summary_data / input_data 原来是三个 JSON 列，每条约 9 KB，
+其中绝大部分是模板渲染出来的重复文案（结论、行动项、风险描述、dont_do……）。现在：
+- 模板文案去重：只有模板目录中的字符串（_TEMPLATE_MODULES 里的字符串字面量与模块级数据：风险目录、
+  决策模板、行动项……）且长度 >= ASSESSMENT_PAYLOAD_INTERN_MIN_BYTES 时才写入 payload_fragments
+  （内容寻址，只增不改），payload 中只存引用 "\\x01<id>"；片段按 id 在进程内缓存，命中时读写都不访问数据库
+- 带入用户数据格式化出的字符串（“月收入约 €5183…”、员工人数、自由填写的行业……）不入片段表，
+  和其余结构 + 用户字段（分数、收入、标记……）一起用 zlib 压缩，可带预置字典（zdict，同样存为片段）
+  因此片段表与进程内缓存只随文案种类增长，不随用户数增长，也不会比评估记录活得更久
+- 以 "\\x01" 开头的原始字符串转义为 "\\x01\\x01..."，同样留在压缩数据里
+- 格式：1 字节格式版本 + 4 字节 zdict id（0 = 无字典）+ zlib 数据；片段只增不改，旧 payload 永远可以解码
+
+读取：load_assessment_payload（异步）/ load_assessment_payload_sync（线程中）还原为原来的三个 dict；
+多条记录用 load_assessment_payloads_sync，缺少的片段整批合并查询；
+未迁移的历史记录直接读旧 JSON 列（迁移见 scripts/migrate_assessment_payloads.py）。
+"""
+
+import dataclasses
+import hashlib
+import importlib
+import json
+import logging
+import os
+import struct
+import types
+import zlib
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set
+
+from pydantic import BaseModel
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+
+from ..database import async_engine, engine
+from ..models import Assessment, PayloadFragment
+
+logger = logging.getLogger(__name__)
+
+ASSESSMENT_PAYLOAD_INTERN_MIN_BYTES = int(os.getenv("ASSESSMENT_PAYLOAD_INTERN_MIN_BYTES", "8"))
+
+# 模板目录：这些模块中的字符串字面量与模块级数据构成可去重的文案集合
+_TEMPLATE_MODULES = (
+    "app.services.decision_engine",
+    "app.services.decision_templates",
+    "app.services.decision.action_templates",
+    "app.services.decision.action_index",
+    "app.services.risk_engine",
+    "app.services.risk.industry_catalog",
+    "app.services.risk.signals_catalog",
+    "app.services.risk.risk_bands",
+    "app.services.risk.rule_plan",
+    "app.services.risk.score_table",
+)
+
+PAYLOAD_FORMAT_VERSION = 1
+PAYLOAD_KEYS = ("result_data", "decision_summary_data", "input_data")
+
+_HEADER = struct.Struct(">BI")
+_REF = "\x01"  # 引用前缀；以它开头的原始字符串转义为 _REF + 原字符串，解码时不会混淆
+_ZLIB_LEVEL = 9
+_ZDICT_MAX_BYTES = 32 * 1024  # zlib 窗口大小，超出部分无效
+_INTERN_ATTEMPTS = 3
+_FETCH_ROUNDS = 3  # zdict -> 字符串，最多两轮即可
+
+_stats = {
+    "encoded": 0,
+    "decoded": 0,
+    "legacy_reads": 0,
+    "interned": 0,
+    "fragment_loads": 0,
+    "raw_bytes": 0,
+    "stored_bytes": 0,
+}
+
+
+class _FragmentCache:
+    """进程内片段缓存（片段不可变，只增不删；只含模板文案，大小随文案种类增长，不随用户数增长）"""
+
+    def __init__(self) -> None:
+        self.ids: Dict[str, int] = {}
+        self.strings: Dict[int, str] = {}
+        self.zdicts: Dict[int, bytes] = {}
+        self.current_zdict_id: Optional[int] = None  # None = 尚未从数据库读取；0 = 没有字典
+
+    def add(self, fragment_id: int, kind: str, data: bytes) -> None:
+        if kind == "zdict":
+            self.zdicts[fragment_id] = data
+        else:
+            value = data.decode("utf-8")
+            self.strings[fragment_id] = value
+            self.ids[value] = fragment_id
+
+
+_cache = _FragmentCache()
+
+
+class _MissingFragments(Exception):
+    def __init__(self, fragment_ids: Set[int]):
+        super().__init__(f"missing payload fragments: {sorted(fragment_ids)[:10]}")
+        self.fragment_ids = fragment_ids
+
+
+def _digest(kind: str, data: bytes) -> str:
+    return hashlib.sha256(kind.encode() + b"\x00" + data).hexdigest()
+
+
+_template_strings: Optional[FrozenSet[str]] = None
+
+
+def _collect_template_strings(value: Any, module_names: FrozenSet[str], out: Set[str], seen: Dict[int, Any]) -> None:
+    if isinstance(value, str):
+        out.add(value)
+        return
+    if id(value) in seen:
+        return
+    seen[id(value)] = value  # 同时持有引用：临时构造的 dict 被回收后 id 会被复用
+    if isinstance(value, types.CodeType):
+        for const in value.co_consts:
+            _collect_template_strings(const, module_names, out, seen)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _collect_template_strings(key, module_names, out, seen)
+            _collect_template_strings(item, module_names, out, seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            _collect_template_strings(item, module_names, out, seen)
+    elif isinstance(value, (staticmethod, classmethod)):
+        _collect_template_strings(value.__func__, module_names, out, seen)
+    elif isinstance(value, types.FunctionType):
+        if value.__module__ in module_names:
+            _collect_template_strings(value.__code__, module_names, out, seen)
+    elif isinstance(value, type):
+        if value.__module__ in module_names:
+            _collect_template_strings(dict(vars(value)), module_names, out, seen)
+    elif (
+        dataclasses.is_dataclass(value)
+        or isinstance(value, BaseModel)
+        or getattr(type(value), "__module__", None) in module_names
+    ):
+        # 目录对象（IndustryPlan、RiskBand、Finding……）：取实例属性
+        fields = getattr(value, "__dict__", None)
+        if fields is None and dataclasses.is_dataclass(value):
+            fields = {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+        if fields:
+            _collect_template_strings(fields, module_names, out, seen)
+
+
+def template_strings() -> FrozenSet[str]:
+    """模板目录中的全部字符串（首次调用时收集一次）"""
+    global _template_strings
+    if _template_strings is None:
+        module_names = frozenset(_TEMPLATE_MODULES)
+        out: Set[str] = set()
+        seen: Dict[int, Any] = {}
+        for module_name in _TEMPLATE_MODULES:
+            module = importlib.import_module(module_name)
+            for name, value in vars(module).items():
+                if not name.startswith("__") and not isinstance(value, types.ModuleType):
+                    _collect_template_strings(value, module_names, out, seen)
+        _template_strings = frozenset(
+            value for value in out
+            if len(value.encode("utf-8")) >= ASSESSMENT_PAYLOAD_INTERN_MIN_BYTES and not value.startswith(_REF)
+        )
+    return _template_strings
+
+
+def _should_intern(value: str) -> bool:
+    return value in template_strings()
+
+
+def _collect_strings(value: Any, out: Set[str]) -> None:
+    if isinstance(value, str):
+        if _should_intern(value):
+            out.add(value)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _collect_strings(item, out)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _collect_strings(item, out)
+
+
+def _compact(value: Any) -> Any:
+    if isinstance(value, str):
+        if _should_intern(value):
+            return f"{_REF}{_cache.ids[value]}"
+        return _REF + value if value.startswith(_REF) else value
+    if isinstance(value, dict):
+        return {key: _compact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_compact(item) for item in value]
+    return value
+
+
+def _is_ref(value: str) -> bool:
+    return value.startswith(_REF) and not value.startswith(_REF, 1)
+
+
+def _collect_refs(value: Any, out: Set[int]) -> None:
+    if isinstance(value, str):
+        if _is_ref(value):
+            out.add(int(value[1:]))
+    elif isinstance(value, dict):
+        for item in value.values():
+            _collect_refs(item, out)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_refs(item, out)
+
+
+def _expand(value: Any) -> Any:
+    if isinstance(value, str):
+        if not value.startswith(_REF):
+            return value
+        return _cache.strings[int(value[1:])] if _is_ref(value) else value[1:]
+    if isinstance(value, dict):
+        return {key: _expand(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_expand(item) for item in value]
+    return value
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _compress(data: bytes, zdict_id: int) -> bytes:
+    if zdict_id:
+        compressor = zlib.compressobj(_ZLIB_LEVEL, zlib.DEFLATED, 15, 9, zlib.Z_DEFAULT_STRATEGY, _cache.zdicts[zdict_id])
+    else:
+        compressor = zlib.compressobj(_ZLIB_LEVEL)
+    return _HEADER.pack(PAYLOAD_FORMAT_VERSION, zdict_id) + compressor.compress(data) + compressor.flush()
+
+
+def _compact_json(blob: bytes) -> bytes:
+    """解压出引用形式的 JSON（不还原字符串）；缺字典时抛 _MissingFragments"""
+    version, zdict_id = _HEADER.unpack_from(blob)
+    if version != PAYLOAD_FORMAT_VERSION:
+        raise ValueError(f"unsupported assessment payload version: {version}")
+    if zdict_id and zdict_id not in _cache.zdicts:
+        raise _MissingFragments({zdict_id})
+    decompressor = zlib.decompressobj(zdict=_cache.zdicts[zdict_id]) if zdict_id else zlib.decompressobj()
+    return decompressor.decompress(blob[_HEADER.size:]) + decompressor.flush()
+
+
+def _decode(blob: bytes) -> Dict[str, Any]:
+    document = json.loads(_compact_json(blob))
+    refs: Set[int] = set()
+    _collect_refs(document, refs)
+    missing = {ref for ref in refs if ref not in _cache.strings}
+    if missing:
+        raise _MissingFragments(missing)
+    _stats["decoded"] += 1
+    return _expand(document)
+
+
+def _pack_documents(documents: List[Dict[str, Any]]) -> List[bytes]:
+    blobs = []
+    for document in documents:
+        data = _dumps(_compact(document))
+        blob = _compress(data, _cache.current_zdict_id or 0)
+        _stats["encoded"] += 1
+        _stats["raw_bytes"] += len(_dumps(document))
+        _stats["stored_bytes"] += len(blob)
+        blobs.append(blob)
+    return blobs
+
+
+def _unknown_strings(documents: Iterable[Dict[str, Any]]) -> Set[str]:
+    strings: Set[str] = set()
+    for document in documents:
+        _collect_strings(document, strings)
+    return {value for value in strings if value not in _cache.ids}
+
+
+# ---------- 数据库访问（同步 Connection；异步调用方通过 run_sync 复用） ----------
+
+def _load_fragments(conn: Connection, fragment_ids: Set[int]) -> None:
+    ids = list(fragment_ids)
+    for start in range(0, len(ids), 500):
+        rows = conn.execute(
+            select(PayloadFragment.id, PayloadFragment.kind, PayloadFragment.data)
+            .where(PayloadFragment.id.in_(ids[start:start + 500]))
+        )
+        for fragment_id, kind, data in rows:
+            _cache.add(fragment_id, kind, data)
+    _stats["fragment_loads"] += 1
+    missing = [fragment_id for fragment_id in ids if fragment_id not in _cache.strings and fragment_id not in _cache.zdicts]
+    if missing:
+        raise ValueError(f"payload fragments not found: {missing[:10]}")
+
+
+def _load_current_zdict(conn: Connection) -> None:
+    zdict_id = conn.scalar(select(func.max(PayloadFragment.id)).where(PayloadFragment.kind == "zdict")) or 0
+    if zdict_id and zdict_id not in _cache.zdicts:
+        _load_fragments(conn, {zdict_id})
+    _cache.current_zdict_id = zdict_id
+
+
+def _intern_strings(conn: Connection, strings: Set[str]) -> Dict[int, str]:
+    """查出 / 写入字符串片段，返回 {id: 字符串}（调用方在事务提交后再放入缓存）"""
+    by_digest = {_digest("str", value.encode("utf-8")): value for value in strings}
+    found: Dict[int, str] = {}
+
+    def _select(digests: List[str]) -> None:
+        for start in range(0, len(digests), 500):
+            rows = conn.execute(
+                select(PayloadFragment.id, PayloadFragment.digest)
+                .where(PayloadFragment.digest.in_(digests[start:start + 500]))
+            )
+            for fragment_id, digest in rows:
+                found[fragment_id] = by_digest[digest]
+
+    _select(list(by_digest))
+    known = set(found.values())
+    new = [digest for digest, value in by_digest.items() if value not in known]
+    if new:
+        conn.execute(
+            insert(PayloadFragment),
+            [{"kind": "str", "digest": digest, "data": by_digest[digest].encode("utf-8")} for digest in new],
+        )
+        _select(new)
+        _stats["interned"] += len(new)
+    return found
+
+
+def _prepare_encode(conn: Connection, strings: Set[str]) -> Dict[int, str]:
+    if _cache.current_zdict_id is None:
+        _load_current_zdict(conn)
+    return _intern_strings(conn, strings) if strings else {}
+
+
+def _publish(found: Dict[int, str]) -> None:
+    for fragment_id, value in found.items():
+        _cache.strings[fragment_id] = value
+        _cache.ids[value] = fragment_id
+
+
+def _payload_document(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: payload.get(key) for key in PAYLOAD_KEYS}
+
+
+def _legacy_payload(assessment: Assessment) -> Optional[Dict[str, Any]]:
+    if not (assessment.result_data or assessment.decision_summary_data or assessment.input_data):
+        return None
+    _stats["legacy_reads"] += 1
+    return {
+        "result_data": assessment.result_data,
+        "decision_summary_data": assessment.decision_summary_data,
+        "input_data": assessment.input_data,
+    }
+
+
+# ---------- 对外接口 ----------
+
+async def encode_assessment_payloads(payloads: List[Dict[str, Any]]) -> List[bytes]:
+    """批量编码（新字符串一次性入片段表）；payload 为 {result_data, decision_summary_data, input_data}"""
+    documents = [_payload_document(payload) for payload in payloads]
+    strings = _unknown_strings(documents)
+    if strings or _cache.current_zdict_id is None:
+        for attempt in range(_INTERN_ATTEMPTS):
+            try:
+                async with async_engine.begin() as conn:
+                    found = await conn.run_sync(_prepare_encode, strings)
+                break
+            except IntegrityError:
+                # 其他进程同时写入了相同片段：重新查询即可
+                if attempt == _INTERN_ATTEMPTS - 1:
+                    raise
+        _publish(found)
+    return _pack_documents(documents)
+
+
+async def encode_assessment_payload(payload: Dict[str, Any]) -> bytes:
+    return (await encode_assessment_payloads([payload]))[0]
+
+
+def encode_assessment_payloads_sync(payloads: List[Dict[str, Any]]) -> List[bytes]:
+    """同步版本（脚本 / 线程中使用）"""
+    documents = [_payload_document(payload) for payload in payloads]
+    strings = _unknown_strings(documents)
+    if strings or _cache.current_zdict_id is None:
+        for attempt in range(_INTERN_ATTEMPTS):
+            try:
+                with engine.begin() as conn:
+                    found = _prepare_encode(conn, strings)
+                break
+            except IntegrityError:
+                if attempt == _INTERN_ATTEMPTS - 1:
+                    raise
+        _publish(found)
+    return _pack_documents(documents)
+
+
+async def decode_assessment_payload(blob: bytes) -> Dict[str, Any]:
+    for _ in range(_FETCH_ROUNDS):
+        try:
+            return _decode(blob)
+        except _MissingFragments as e:
+            async with async_engine.connect() as conn:
+                await conn.run_sync(_load_fragments, e.fragment_ids)
+    return _decode(blob)
+
+
+def decode_assessment_payload_sync(blob: bytes) -> Dict[str, Any]:
+    for _ in range(_FETCH_ROUNDS):
+        try:
+            return _decode(blob)
+        except _MissingFragments as e:
+            with engine.connect() as conn:
+                _load_fragments(conn, e.fragment_ids)
+    return _decode(blob)
+
+
+def decode_assessment_payloads_sync(blobs: List[bytes]) -> List[Dict[str, Any]]:
+    """
+    批量解码：整批缺少的 zdict、整批缺少的字符串片段各合并为一次查询（逐条解码时每条都可能查询一次）
+    片段都已缓存的记录当场还原，只有缺片段的记录等查询后再还原
+    """
+    zdict_ids = {_HEADER.unpack_from(blob)[1] for blob in blobs} - {0} - _cache.zdicts.keys()
+    if zdict_ids:
+        with engine.connect() as conn:
+            _load_fragments(conn, zdict_ids)
+    decoded: List[Any] = []
+    pending: Dict[int, Any] = {}
+    missing: Set[int] = set()
+    for index, blob in enumerate(blobs):
+        document = json.loads(_compact_json(blob))
+        refs: Set[int] = set()
+        _collect_refs(document, refs)
+        absent = {ref for ref in refs if ref not in _cache.strings}
+        if absent:
+            missing |= absent
+            pending[index] = document
+            decoded.append(None)
+        else:
+            decoded.append(_expand(document))
+    if missing:
+        with engine.connect() as conn:
+            _load_fragments(conn, missing)
+        for index, document in pending.items():
+            decoded[index] = _expand(document)
+    _stats["decoded"] += len(decoded)
+    return decoded
+
+
+async def load_assessment_payload(assessment: Assessment) -> Optional[Dict[str, Any]]:
+    """还原评估数据 {result_data, decision_summary_data, input_data}；没有数据时返回 None"""
+    if assessment.payload:
+        return await decode_assessment_payload(assessment.payload)
+    return _legacy_payload(assessment)
+
+
+def load_assessment_payload_sync(assessment: Assessment) -> Optional[Dict[str, Any]]:
+    if assessment.payload:
+        return decode_assessment_payload_sync(assessment.payload)
+    return _legacy_payload(assessment)
+
+
+def load_assessment_payloads_sync(assessments: List[Assessment]) -> List[Optional[Dict[str, Any]]]:
+    """批量版 load_assessment_payload_sync（顺序与 assessments 一致）"""
+    blobs = [assessment.payload for assessment in assessments if assessment.payload]
+    decoded = iter(decode_assessment_payloads_sync(blobs))
+    return [next(decoded) if assessment.payload else _legacy_payload(assessment) for assessment in assessments]
+
+
+def train_payload_dictionary(conn: Connection, blobs: List[bytes]) -> Optional[int]:
+    """
+    用已有 payload（引用形式的 JSON）训练 zlib 预置字典并写入片段表，返回字典 id
+    靠后的样本离待压缩数据更近、引用更便宜，因此按时间顺序拼接并保留末尾 32 KB。
+    新字典对本进程之后的写入立即生效，其他进程重启后生效；旧 payload 仍按各自头部的字典 id 解码。
+    """
+    samples = []
+    for blob in blobs:
+        try:
+            samples.append(_compact_json(blob))
+        except _MissingFragments as e:
+            _load_fragments(conn, e.fragment_ids)
+            samples.append(_compact_json(blob))
+    zdict = b"".join(samples)[-_ZDICT_MAX_BYTES:]
+    if not zdict:
+        return None
+    digest = _digest("zdict", zdict)
+    zdict_id = conn.scalar(select(PayloadFragment.id).where(PayloadFragment.digest == digest))
+    if zdict_id is None:
+        zdict_id = conn.execute(
+            insert(PayloadFragment).values(kind="zdict", digest=digest, data=zdict).returning(PayloadFragment.id)
+        ).scalar_one()
+    _cache.zdicts[zdict_id] = zdict
+    _cache.current_zdict_id = zdict_id
+    logger.info("[ASSESSMENT_STORE] trained zdict id=%s size=%s from %s payloads", zdict_id, len(zdict), len(samples))
+    return zdict_id
+
+
+def recompress_payload(blob: bytes) -> bytes:
+    """按当前字典重新压缩（引用不变，不需要访问字符串片段）"""
+    return _compress(_compact_json(blob), _cache.current_zdict_id or 0)
+
+
+def assessment_store_stats() -> Dict[str, Any]:
+    stats = dict(_stats)
+    stats["cached_strings"] = len(_cache.strings)
+    stats["zdict_id"] = _cache.current_zdict_id
+    stats["compression_ratio"] = round(stats["raw_bytes"] / stats["stored_bytes"], 2) if stats["stored_bytes"] else None
+    return stats
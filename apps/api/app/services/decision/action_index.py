@@ -0,0 +1,72 @@
+"""
+行动清单索引
+DEFAULT_ACTIONS_BY_INDUSTRY + INDUSTRY_ACTION_TEMPLATES["common"] 都是静态常量，
+导入时为每个行业合并、去重、截断一次，请求路径只做查表。
+"""
+
+from types import MappingProxyType
+from typing import Iterable, List, Mapping, Tuple
+
+from ..decision_templates import INDUSTRY_ACTION_TEMPLATES, merge_actions
+from ..risk.industry_catalog import INDUSTRY_BASE
+from .action_templates import (
+    DEFAULT_ACTIONS_BY_INDUSTRY,
+    DEFAULT_REASONS_BY_DECISION,
+    DEFAULT_IGNORE_BY_DECISION,
+)
+
+MIN_ACTIONS = 5
+MAX_ACTIONS = 12
+MIN_REASONS = 2
+MIN_IGNORE = 2
+
+
+def _merged_actions(industry_key: str) -> Tuple[str, ...]:
+    """与原先请求路径中的合并逻辑一致：行业默认清单 + 旧模板 common，去重、补足、截断"""
+    industry_actions = DEFAULT_ACTIONS_BY_INDUSTRY.get(industry_key, DEFAULT_ACTIONS_BY_INDUSTRY["other"])
+    industry_extra = INDUSTRY_ACTION_TEMPLATES.get(industry_key, {}).get("common", [])
+    return tuple(merge_actions(industry_actions, industry_extra, min_len=MIN_ACTIONS)[:MAX_ACTIONS])
+
+
+def build_action_index(industry_keys: Iterable[str]) -> Mapping[str, Tuple[str, ...]]:
+    return MappingProxyType({key: _merged_actions(key) for key in sorted(set(industry_keys))})
+
+
+# 模块导入时构建一次
+ACTION_INDEX: Mapping[str, Tuple[str, ...]] = build_action_index(
+    set(DEFAULT_ACTIONS_BY_INDUSTRY) | set(INDUSTRY_ACTION_TEMPLATES) | set(INDUSTRY_BASE)
+)
+# 未知行业：只用 other 默认清单（没有旧模板补充）
+_FALLBACK_ACTIONS: Tuple[str, ...] = _merged_actions("other")
+
+
+def get_industry_actions(industry_key: str) -> Tuple[str, ...]:
+    """行业 key（已小写）-> 合并后的行动清单（最多 12 条）"""
+    return ACTION_INDEX.get(industry_key, _FALLBACK_ACTIONS)
+
+
+def validate_decision_templates() -> None:
+    """
+    启动检查：替代请求路径中的长度断言
+    - INDUSTRY_BASE 中每个行业的行动清单 >= 5 条
+    - 每个 decision_code 的原因 / 忽视后果 >= 2 条
+    """
+    errors: List[str] = []
+    for industry_key in sorted(INDUSTRY_BASE):
+        actions = get_industry_actions(industry_key)
+        if len(actions) < MIN_ACTIONS:
+            errors.append(f"recommended_actions length {len(actions)} < {MIN_ACTIONS} for industry {industry_key}")
+
+    if len(_FALLBACK_ACTIONS) < MIN_ACTIONS:
+        errors.append(f"recommended_actions length {len(_FALLBACK_ACTIONS)} < {MIN_ACTIONS} for unknown industries")
+
+    # 未配置的 decision_code 在请求路径中使用 2 条兜底文案
+    for decision_code, reasons in DEFAULT_REASONS_BY_DECISION.items():
+        if len(reasons) < MIN_REASONS:
+            errors.append(f"reasons length {len(reasons)} < {MIN_REASONS} for {decision_code}")
+    for decision_code, ignore in DEFAULT_IGNORE_BY_DECISION.items():
+        if len(ignore) < MIN_IGNORE:
+            errors.append(f"risk_if_ignore length {len(ignore)} < {MIN_IGNORE} for {decision_code}")
+
+    if errors:
+        raise RuntimeError("决策模板不完整：\n" + "\n".join(errors))
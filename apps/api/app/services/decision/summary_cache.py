@@ -0,0 +1,116 @@
+"""
+决策摘要缓存
+compute_decision_summary 中由模板派生的部分（行动清单/原因/忽视后果、风险解释、dont_do、专家包骨架）
+只取决于一个很小的有限键空间，这里提供带 TTL 的 LRU 缓存 + 命中统计。
+
+模板版本：模板常量只在重启时变化，指纹（模板常量内容的哈希）在导入时计算一次，记录在缓存上（见 stats）；
+运行时替换模板需调用 invalidate_decision_caches()。
+缓存值在多个请求之间共享，调用方不得原地修改。
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+DECISION_CACHE_MAXSIZE = int(os.getenv("DECISION_CACHE_MAXSIZE", "4096"))
+DECISION_CACHE_TTL_SECONDS = float(os.getenv("DECISION_CACHE_TTL_SECONDS", "3600"))
+
+_MISSING = object()
+
+
+def template_fingerprint(*sources: Any) -> str:
+    """模板常量内容指纹（dict 按插入顺序 repr，内容或顺序变化都会改变指纹）"""
+    return hashlib.sha1(repr(sources).encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """线程安全的 LRU + TTL 缓存"""
+
+    def __init__(
+        self,
+        name: str,
+        version: str,
+        maxsize: int = DECISION_CACHE_MAXSIZE,
+        ttl_seconds: float = DECISION_CACHE_TTL_SECONDS,
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.version = version
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_build(self, key: Hashable, builder: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            # 构建放在锁外；并发 miss 时重复构建一次无副作用
+            value = builder()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "version": self.version,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+                "invalidations": self.invalidations,
+            }
+
+
+_CACHES: List[SummaryCache] = []
+
+
+def register_cache(
+    name: str,
+    version: str,
+    maxsize: Optional[int] = None,
+) -> SummaryCache:
+    """创建并登记一个缓存（用于统计与统一失效）；version 为导入时计算的模板指纹"""
+    cache = SummaryCache(name, version, maxsize=maxsize or DECISION_CACHE_MAXSIZE)
+    _CACHES.append(cache)
+    return cache
+
+
+def get_decision_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """各缓存的命中统计"""
+    return {cache.name: cache.stats() for cache in _CACHES}
+
+
+def invalidate_decision_caches() -> None:
+    """手动清空全部决策缓存（例如运行时替换了模板）"""
+    for cache in _CACHES:
+        cache.clear()
@@ -6,23 +6,23 @@ Decision Engine - Stage 隔离的决策引擎
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Literal, Optional
+from dataclasses import dataclass
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
 from ..schemas.assessment import DecisionSummary as DecisionSummarySchema, ExpertPack, ProBrief, RiskExplain
 from .decision_templates import (
     DECISION_DEFAULT_TEMPLATES,
-    INDUSTRY_ACTION_TEMPLATES,
-    merge_actions,
     apply_paywall,
     PaywallTier as PaywallTierType,
     normalize_tier,
 )
 from .risk.signals_catalog import SIGNAL_DEFS
 from .decision.action_templates import (
-    DEFAULT_ACTIONS_BY_INDUSTRY,
     DEFAULT_REASONS_BY_DECISION,
     DEFAULT_IGNORE_BY_DECISION,
 )
+from .decision.action_index import get_industry_actions
+from .decision.summary_cache import register_cache, template_fingerprint
 
 # 按 stage 的"解释口径"补丁（与风险阶段阈值对齐）
 RISK_EXPLAIN_BY_STAGE: Dict[str, Dict[int, str]] = {
@@ -130,20 +130,26 @@ def _build_risk_explain(
     统一生成 RiskExplain：阶段解释（A/B/C/D）+ stage 补丁 + 主要驱动
     """
     risk_stage = _get_risk_stage(risk_score)
-    p = _risk_stage_profile(risk_stage)
-    stage_patch = _get_risk_explain_stage_note(stage, risk_score)
-    if stage_patch:
-        stage_note = f"{p['note']}\n\n阶段补充：{stage_patch}"
-    else:
-        stage_note = p["note"]
-
-    return RiskExplain(
-        label=p["label"],
-        one_liner=p["one_liner"],
-        stage_note=stage_note,
-        main_drivers=_get_main_drivers(modules, tags, matched_triggers),
-        risk_stage=risk_stage,
-    )
+    main_drivers = tuple(_get_main_drivers(modules, tags, matched_triggers))
+
+    def build() -> RiskExplain:
+        p = _risk_stage_profile(risk_stage)
+        stage_patch = _get_risk_explain_stage_note(stage, risk_score)
+        if stage_patch:
+            stage_note = f"{p['note']}\n\n阶段补充：{stage_patch}"
+        else:
+            stage_note = p["note"]
+
+        return RiskExplain(
+            label=p["label"],
+            one_liner=p["one_liner"],
+            stage_note=stage_note,
+            main_drivers=list(main_drivers),
+            risk_stage=risk_stage,
+        )
+
+    # stage 补丁与 A/B/C/D 使用同一组阈值，(stage, risk_stage, drivers) 即可唯一确定
+    return _RISK_EXPLAIN_CACHE.get_or_build((stage, risk_stage, main_drivers), build)
 
 
 def _get_main_drivers(modules: Dict[str, Any], tags: List[str], matched_triggers: List[str]) -> List[str]:
@@ -245,6 +251,69 @@ CONFIDENCE_REASON_MAP = {
 }
 
 
+def decision_template_version() -> str:
+    """决策相关模板常量的内容指纹（模板只在重启时变化，导入时计算一次：DECISION_TEMPLATE_VERSION）"""
+    return template_fingerprint(
+        DECISION_DEFAULT_TEMPLATES,
+        DEFAULT_REASONS_BY_DECISION,
+        DEFAULT_IGNORE_BY_DECISION,
+        CONFIDENCE_REASON_MAP,
+        RISK_EXPLAIN_BY_STAGE,
+    )
+
+
+DECISION_TEMPLATE_VERSION = decision_template_version()
+
+# 模板派生部分的缓存（键空间有限：行业 × 决策等级 / 风险阶段 × 驱动因素 …）
+_TEMPLATE_CACHE = register_cache("decision_templates", DECISION_TEMPLATE_VERSION)
+_RISK_EXPLAIN_CACHE = register_cache("risk_explain", DECISION_TEMPLATE_VERSION)
+_DONT_DO_CACHE = register_cache("dont_do", DECISION_TEMPLATE_VERSION)
+_TRIGGER_SOURCES_CACHE = register_cache("trigger_sources", DECISION_TEMPLATE_VERSION)
+_EXPERT_PACK_CACHE = register_cache("expert_pack", DECISION_TEMPLATE_VERSION)
+
+
+@dataclass(frozen=True)
+class _DecisionTemplateParts:
+    """某行业 + 决策等级下，由模板决定的 decision 字段（解锁前）"""
+    title: str
+    conclusion: str
+    confidence_reason: str
+    reasons: Tuple[str, ...]
+    recommended_actions: Tuple[str, ...]
+    risk_if_ignore: Tuple[str, ...]
+
+
+def _build_template_parts(industry_key: str, decision_level: str, fallback_level: str) -> _DecisionTemplateParts:
+    base_template = DECISION_DEFAULT_TEMPLATES.get(decision_level) or DECISION_DEFAULT_TEMPLATES[fallback_level]
+
+    # ✅ 从模板系统获取原因和忽视后果
+    reasons = DEFAULT_REASONS_BY_DECISION.get(decision_level, [
+        "基于你当前填写信息的综合判断",
+        "建议用同一口径持续复查"
+    ])
+    ignore = DEFAULT_IGNORE_BY_DECISION.get(decision_level, [
+        "可能出现补税与罚款风险",
+        "一旦触发检查沟通成本会显著上升"
+    ])
+
+    return _DecisionTemplateParts(
+        title=base_template["title"],
+        conclusion=base_template["conclusion"],
+        confidence_reason=CONFIDENCE_REASON_MAP.get(decision_level, "基于当前输入信号组合与常见合规阈值生成该判断，建议结合实际材料与专业意见确认。"),
+        reasons=tuple(reasons[:3]),  # 限制最多3条，但保证至少2条
+        recommended_actions=get_industry_actions(industry_key),  # 启动时已校验至少5条
+        risk_if_ignore=tuple(ignore[:3]),  # 限制最多3条，但保证至少2条
+    )
+
+
+def _decision_template_parts(industry_key: str, decision_level: str, fallback_level: str) -> _DecisionTemplateParts:
+    """按 (行业, 决策等级) 缓存模板合并结果"""
+    return _TEMPLATE_CACHE.get_or_build(
+        (industry_key, decision_level, fallback_level),
+        lambda: _build_template_parts(industry_key, decision_level, fallback_level),
+    )
+
+
 def _confidence(critical_count: int, signals_points: int, has_signals: bool) -> Confidence:
     """计算置信度"""
     # 越多触发点/关键点，越"像稳定经营信号"
@@ -269,6 +338,41 @@ def _top_risks(findings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return sorted_findings[:3]
 
 
+def _sources_from_signal_keys(keys: Tuple[str, ...], is_consumer: bool, is_municipal: bool) -> Tuple[str, ...]:
+    sources = []
+    for key in keys:
+        if key in ("pos_used_daily", "uses_delivery_platforms", "platform_sales", "platform_payments", "works_for_platforms"):
+            sources.append("POS/平台数据比对")
+        if "cash" in key:
+            sources.append("银行合规问询")
+        if "employee" in key or "contract" in key or "labor" in key:
+            sources.append("劳动/社保材料核对")
+        if "data" in key or "id" in key or "rgpd" in key:
+            sources.append("数据合规抽查")
+        if "license" in key or "permit" in key or "terrace" in key:
+            sources.append("市政/许可核对")
+        if "invoice" in key or "income" in key:
+            sources.append("申报一致性复核")
+    if is_consumer:
+        sources.append("消费者投诉/抽查")
+    if is_municipal:
+        sources.append("市政检查")
+    # 去重并保序
+    out = []
+    for s in sources:
+        if s not in out:
+            out.append(s)
+    return tuple(out[:3])
+
+
+def _trigger_sources(keys: Tuple[str, ...], is_consumer: bool, is_municipal: bool) -> List[str]:
+    """信号 key -> 触发来源（按信号组合缓存）"""
+    return list(_TRIGGER_SOURCES_CACHE.get_or_build(
+        (keys, is_consumer, is_municipal),
+        lambda: _sources_from_signal_keys(keys, is_consumer, is_municipal),
+    ))
+
+
 def _enrich_top_findings(
     top_findings: List[Dict[str, Any]],
     meta: Dict[str, Any],
@@ -278,32 +382,8 @@ def _enrich_top_findings(
     sev2diff = {"info": "low", "low": "low", "medium": "medium", "high": "high"}
     default_sources = ["申报一致性复核", "行业对比抽查"]
     finding_sources = (meta or {}).get("finding_sources", {})
-
-    def _sources_from_signal_keys(keys: List[str]) -> List[str]:
-        sources = []
-        for key in keys:
-            if key in ("pos_used_daily", "uses_delivery_platforms", "platform_sales", "platform_payments", "works_for_platforms"):
-                sources.append("POS/平台数据比对")
-            if "cash" in key:
-                sources.append("银行合规问询")
-            if "employee" in key or "contract" in key or "labor" in key:
-                sources.append("劳动/社保材料核对")
-            if "data" in key or "id" in key or "rgpd" in key:
-                sources.append("数据合规抽查")
-            if "license" in key or "permit" in key or "terrace" in key:
-                sources.append("市政/许可核对")
-            if "invoice" in key or "income" in key:
-                sources.append("申报一致性复核")
-        if "consumer" in tags:
-            sources.append("消费者投诉/抽查")
-        if "municipal" in tags:
-            sources.append("市政检查")
-        # 去重并保序
-        out = []
-        for s in sources:
-            if s not in out:
-                out.append(s)
-        return out[:3]
+    is_consumer = "consumer" in tags
+    is_municipal = "municipal" in tags
 
     enriched: List[Dict[str, Any]] = []
     for f in top_findings or []:
@@ -314,7 +394,7 @@ def _enrich_top_findings(
         src = finding_sources.get(code, {})
         signal_keys = src.get("signal_keys", []) if isinstance(src, dict) else []
         combo_keys = src.get("combo_signals", []) if isinstance(src, dict) else []
-        trigger_sources = _sources_from_signal_keys(signal_keys + combo_keys)
+        trigger_sources = _trigger_sources(tuple(signal_keys + combo_keys), is_consumer, is_municipal)
         item["trigger_sources"] = item.get("trigger_sources") or (trigger_sources or default_sources)
         enriched.append(item)
     return enriched
@@ -327,6 +407,14 @@ def _build_dont_do(
     matched_triggers: List[str],
 ) -> List[str]:
     stage_code = _get_risk_stage(risk_score)
+    has_triggers = bool(matched_triggers)
+    return list(_DONT_DO_CACHE.get_or_build(
+        (stage_code, has_triggers),
+        lambda: tuple(_dont_do_items(stage_code, has_triggers)),
+    ))
+
+
+def _dont_do_items(stage_code: Literal["A", "B", "C", "D"], has_triggers: bool) -> List[str]:
     items: List[str] = []
 
     items.append("不要尝试伪造、补造交易或凭证（这会把原本可控的合规问题升级为更严重的风险）。")
@@ -337,7 +425,7 @@ def _build_dont_do(
     else:
         items.append("不要让记录长期缺失（持续缺少对账与材料会使后续解释成本越来越高）。")
 
-    if matched_triggers:
+    if has_triggers:
         items.append("不要忽视已出现的触发信号；应优先补齐与该信号相关的材料链条（以降低“解释失败”的概率）。")
 
     return items[:4]
@@ -346,42 +434,16 @@ def _build_dont_do(
 def _expert_pack(stage: Stage, industry: str, decision_code: str, meta: Dict[str, Any]) -> Optional[ExpertPack]:
     """
     €39 专家包：不需要非常复杂，关键是"看起来像专业系统"
+    除 score_breakdown 外只取决于风险阶段与少量布尔特征，骨架按这些特征缓存
     """
     tags = (meta or {}).get("tags", [])
-    triggers = (meta or {}).get("matched_triggers", [])
-    modules = (meta or {}).get("modules", {})
     score_breakdown = (meta or {}).get("score_breakdown", {})  # ✅ 从 meta 获取分数构成
     risk_score = (meta or {}).get("risk_score", 0)
     top3_findings = (meta or {}).get("top3_findings", [])
 
     try:
-        # 构建风险分组（按 tag 分组）
-        risk_groups: Dict[str, List[Dict[str, Any]]] = {}
-        for tag in tags[:5]:
-            risk_groups[tag] = []  # 可以后续扩展添加具体风险项
-        
-        # ✅ 构建执法路径（结构化）
-        enforcement_path = [
-            {
-                "step": 1,
-                "title": "信号异常识别",
-                "description": "税务局通过 POS / 平台数据比对、银行流水交叉验证，识别出收入与申报不一致或存在持续经营特征。"
-            },
-            {
-                "step": 2,
-                "title": "补申报与滞纳金",
-                "description": "要求补缴过往税款（VAT/IRPF），并计算滞纳金。通常会给出材料补充期限（以通知为准）。"
-            },
-            {
-                "step": 3,
-                "title": "行政处罚或强制注册",
-                "description": "如果解释不闭环或拒绝配合，可能产生补缴、利息与行政处罚；幅度取决于情形与主管机关认定。"
-            }
-        ]
-        
         risk_stage = _get_risk_stage(risk_score)
-        triggers = (meta or {}).get("matched_triggers", [])
-        has_trigger = bool(triggers)
+        has_trigger = bool((meta or {}).get("matched_triggers", []))
         has_high = any(
             f.get("severity") == "high" or f.get("explain_difficulty") == "high"
             for f in (top3_findings or [])
@@ -394,80 +456,125 @@ def _expert_pack(stage: Stage, industry: str, decision_code: str, meta: Dict[str
         has_data = "数据合规抽查" in sources
         has_municipal = "市政/许可核对" in sources
 
-        need_professional = "no"
-        roles: List[str] = []
-        reason = "当前风险阶段较低，可先按清单自查并在后续变化时复评。"
-
-        if risk_stage in ["C", "D"]:
-            need_professional = "yes"
-            roles = ["gestor/税务顾问", "律师"]
-            reason = "当前风险阶段较高，建议由专业人士判断整改优先级与责任边界。"
-        elif risk_stage == "B":
-            if has_bank:
-                need_professional = "yes"
-                roles = ["gestor/税务顾问", "律师"]
-                reason = "已出现外部触发信号（如银行合规问询/资料要求），建议尽快由专业人士协助梳理材料缺口与优先级。"
-            elif has_trigger or has_high or has_labor:
-                need_professional = "strongly_consider"
-                roles = ["gestor/税务顾问"]
-                reason = "已出现较高“解释失败”风险，建议至少与 gestor 做一次材料链梳理，以降低后续沟通成本。"
-            else:
-                need_professional = "consider"
-                roles = ["gestor/税务顾问"]
-                reason = "处于“高可见性”区间，建议先把对账与材料链系统化；若出现银行问询或正式通知，再升级为专业介入。"
-
-        if stage == "SL" and need_professional in ["strongly_consider", "yes"] and (has_data or has_municipal):
-            roles.append("数据保护顾问")
-
-        # 去重并保序
-        uniq_roles = []
-        for r in roles:
-            if r not in uniq_roles:
-                uniq_roles.append(r)
-
-        decision_guidance = {
-            "need_professional": need_professional,
-            "suggested_roles": uniq_roles,
-            "reason": reason,
-        }
-
-        cadence_90d = [
-            "0–30 天：补齐最薄弱的材料链条（票据/对账/合同/用工）",
-            "31–60 天：固定月度对账与归档节奏，避免解释断层",
-            "61–90 天：复评一次并调整清单，确认风险是否下降",
-        ]
-
-        return ExpertPack(
-            risk_groups=risk_groups,
-            roadmap_30d=[
-                {"week": "第1周", "tasks": ["建立资料归档与对账体系（收入/成本/合同/用工）"]},
-                {"week": "第2周", "tasks": ["按行业高频检查点做一次自检并补齐缺口"]},
-                {"week": "第3周", "tasks": ["把流程固化（谁负责、文件在哪、如何对账）"]},
-                {"week": "第4周", "tasks": ["复评一次，确认风险是否下降"]},
-            ],
-            documents_pack=[
-                "收款流水（POS/转账/平台）与对账表",
-                "主要合同/订单记录（只保留必要信息）",
-                "成本票据（进货/租金/水电/平台费用等）",
-                "用工材料（如有）：合同/社保/工时/PRL/保险",
-            ],
-            self_audit_checklist=[
-                f"□ 收入与成本对账表完整（{industry} 行业）",
-                "□ 主要合同/订单记录可追溯",
-                "□ 成本票据归档（至少3个月）",
-                "□ 用工材料（如有）齐全",
-                "□ 数据保护流程（如涉及）",
-            ],
-            score_breakdown=score_breakdown,  # ✅ 新增：分数构成
-            enforcement_path=enforcement_path,  # ✅ 新增：执法路径
-            decision_guidance=decision_guidance,  # ✅ 决策提示
-            cadence_90d=cadence_90d,  # ✅ 30/90 天节奏
+        key = (
+            stage, industry, risk_stage, tuple(tags[:5]),
+            has_trigger, has_high, has_bank, has_labor, has_data, has_municipal,
         )
+        pack = _EXPERT_PACK_CACHE.get_or_build(key, lambda: _build_expert_pack(*key))
+        return pack.model_copy(update={"score_breakdown": score_breakdown})
     except Exception:
         # 如果构建失败，返回 None
         return None
 
 
+def _build_expert_pack(
+    stage: Stage,
+    industry: str,
+    risk_stage: Literal["A", "B", "C", "D"],
+    tags: Tuple[str, ...],
+    has_trigger: bool,
+    has_high: bool,
+    has_bank: bool,
+    has_labor: bool,
+    has_data: bool,
+    has_municipal: bool,
+) -> ExpertPack:
+    """构建专家包骨架（score_breakdown 由调用方按请求填入）"""
+    # 构建风险分组（按 tag 分组）
+    risk_groups: Dict[str, List[Dict[str, Any]]] = {}
+    for tag in tags:
+        risk_groups[tag] = []  # 可以后续扩展添加具体风险项
+    
+    # ✅ 构建执法路径（结构化）
+    enforcement_path = [
+        {
+            "step": 1,
+            "title": "信号异常识别",
+            "description": "税务局通过 POS / 平台数据比对、银行流水交叉验证，识别出收入与申报不一致或存在持续经营特征。"
+        },
+        {
+            "step": 2,
+            "title": "补申报与滞纳金",
+            "description": "要求补缴过往税款（VAT/IRPF），并计算滞纳金。通常会给出材料补充期限（以通知为准）。"
+        },
+        {
+            "step": 3,
+            "title": "行政处罚或强制注册",
+            "description": "如果解释不闭环或拒绝配合，可能产生补缴、利息与行政处罚；幅度取决于情形与主管机关认定。"
+        }
+    ]
+    
+    need_professional = "no"
+    roles: List[str] = []
+    reason = "当前风险阶段较低，可先按清单自查并在后续变化时复评。"
+
+    if risk_stage in ["C", "D"]:
+        need_professional = "yes"
+        roles = ["gestor/税务顾问", "律师"]
+        reason = "当前风险阶段较高，建议由专业人士判断整改优先级与责任边界。"
+    elif risk_stage == "B":
+        if has_bank:
+            need_professional = "yes"
+            roles = ["gestor/税务顾问", "律师"]
+            reason = "已出现外部触发信号（如银行合规问询/资料要求），建议尽快由专业人士协助梳理材料缺口与优先级。"
+        elif has_trigger or has_high or has_labor:
+            need_professional = "strongly_consider"
+            roles = ["gestor/税务顾问"]
+            reason = "已出现较高“解释失败”风险，建议至少与 gestor 做一次材料链梳理，以降低后续沟通成本。"
+        else:
+            need_professional = "consider"
+            roles = ["gestor/税务顾问"]
+            reason = "处于“高可见性”区间，建议先把对账与材料链系统化；若出现银行问询或正式通知，再升级为专业介入。"
+
+    if stage == "SL" and need_professional in ["strongly_consider", "yes"] and (has_data or has_municipal):
+        roles.append("数据保护顾问")
+
+    # 去重并保序
+    uniq_roles = []
+    for r in roles:
+        if r not in uniq_roles:
+            uniq_roles.append(r)
+
+    decision_guidance = {
+        "need_professional": need_professional,
+        "suggested_roles": uniq_roles,
+        "reason": reason,
+    }
+
+    cadence_90d = [
+        "0–30 天：补齐最薄弱的材料链条（票据/对账/合同/用工）",
+        "31–60 天：固定月度对账与归档节奏，避免解释断层",
+        "61–90 天：复评一次并调整清单，确认风险是否下降",
+    ]
+
+    return ExpertPack(
+        risk_groups=risk_groups,
+        roadmap_30d=[
+            {"week": "第1周", "tasks": ["建立资料归档与对账体系（收入/成本/合同/用工）"]},
+            {"week": "第2周", "tasks": ["按行业高频检查点做一次自检并补齐缺口"]},
+            {"week": "第3周", "tasks": ["把流程固化（谁负责、文件在哪、如何对账）"]},
+            {"week": "第4周", "tasks": ["复评一次，确认风险是否下降"]},
+        ],
+        documents_pack=[
+            "收款流水（POS/转账/平台）与对账表",
+            "主要合同/订单记录（只保留必要信息）",
+            "成本票据（进货/租金/水电/平台费用等）",
+            "用工材料（如有）：合同/社保/工时/PRL/保险",
+        ],
+        self_audit_checklist=[
+            f"□ 收入与成本对账表完整（{industry} 行业）",
+            "□ 主要合同/订单记录可追溯",
+            "□ 成本票据归档（至少3个月）",
+            "□ 用工材料（如有）齐全",
+            "□ 数据保护流程（如涉及）",
+        ],
+        score_breakdown=None,  # ✅ 新增：分数构成（按请求填入）
+        enforcement_path=enforcement_path,  # ✅ 新增：执法路径
+        decision_guidance=decision_guidance,  # ✅ 决策提示
+        cadence_90d=cadence_90d,  # ✅ 30/90 天节奏
+    )
+
+
 def compute_decision_summary(
     stage: Stage,
     industry: str,
@@ -524,30 +631,9 @@ def compute_decision_summary(
             required_tier = "none"
             pay_reason = None
 
-        # ✅ 使用新的模板系统：从 action_templates 获取
+        # ✅ 使用新的模板系统：从 action_templates 获取（按行业 + 决策等级缓存）
         industry_key = (industry or "other").lower()
-        base_template = DECISION_DEFAULT_TEMPLATES.get(decision_level) or DECISION_DEFAULT_TEMPLATES["RISK_AUTONOMO"]
-        
-        # 获取行业默认行动清单（至少6条）
-        industry_actions = DEFAULT_ACTIONS_BY_INDUSTRY.get(industry_key, DEFAULT_ACTIONS_BY_INDUSTRY["other"])
-        
-        # 获取行业特定的额外行动清单（从旧的模板系统）
-        industry_map = INDUSTRY_ACTION_TEMPLATES.get(industry_key, {})
-        industry_extra = industry_map.get("common", [])
-        
-        # 合并行动清单并去重，确保最小长度 >= 5
-        merged_actions = merge_actions(industry_actions, industry_extra, min_len=5)
-        merged_actions = merged_actions[:12]  # 限制最多12条
-        
-        # ✅ 从模板系统获取原因和忽视后果
-        reasons = DEFAULT_REASONS_BY_DECISION.get(decision_level, [
-            "基于你当前填写信息的综合判断",
-            "建议用同一口径持续复查"
-        ])
-        ignore = DEFAULT_IGNORE_BY_DECISION.get(decision_level, [
-            "可能出现补税与罚款风险",
-            "一旦触发检查沟通成本会显著上升"
-        ])
+        template_parts = _decision_template_parts(industry_key, decision_level, "RISK_AUTONOMO")
         
         # ✅ 生成风险阶段解释（A/B/C/D）
         risk_explain = _build_risk_explain(stage, risk_score, modules, tags, matched_triggers)
@@ -556,17 +642,17 @@ def compute_decision_summary(
         decision_dict = {
             "level": decision_level,
             "decision_intent": decision_intent,
-            "title": base_template["title"],
-            "conclusion": base_template["conclusion"],
+            "title": template_parts.title,
+            "conclusion": template_parts.conclusion,
             "confidence_level": conf,
-            "confidence_reason": CONFIDENCE_REASON_MAP.get(decision_level, "基于当前输入信号组合与常见合规阈值生成该判断，建议结合实际材料与专业意见确认。"),  # ✅ 新增：置信度原因
+            "confidence_reason": template_parts.confidence_reason,  # ✅ 新增：置信度原因
             "next_review_window": next_review,
             "paywall": required_tier,
             "pay_reason": pay_reason,
             "top_risks": top3_findings,
-            "reasons": reasons[:3],  # 限制最多3条，但保证至少2条
-            "recommended_actions": merged_actions,  # 保证至少5条
-            "risk_if_ignore": ignore[:3],  # 限制最多3条，但保证至少2条
+            "reasons": list(template_parts.reasons),  # 限制最多3条，但保证至少2条
+            "recommended_actions": list(template_parts.recommended_actions),  # 保证至少5条
+            "risk_if_ignore": list(template_parts.risk_if_ignore),  # 限制最多3条，但保证至少2条
             "expert_pack": None,
             "pro_brief": ProBrief(status="coming_soon", summary=None, top_issues=None, recommended_documents=None, export=None),
             "risk_explain": risk_explain,  # ✅ 新增：风险分数解释
@@ -582,15 +668,6 @@ def compute_decision_summary(
         # 按 unlocked_tier 裁剪付费字段
         decision_dict = apply_paywall(decision_dict, required_tier, unlocked_tier)
         
-        # 开发环境：验证字段长度（断言）
-        if unlocked_tier != "none" and required_tier != "none":
-            tier_rank = {"none": 0, "basic_15": 1, "expert_39": 2}.get(unlocked_tier, 0)
-            required_rank = {"none": 0, "basic_15": 1, "expert_39": 2}.get(required_tier, 0)
-            if tier_rank >= required_rank:
-                assert len(decision_dict["reasons"]) >= 2, f"reasons length {len(decision_dict['reasons'])} < 2 for {decision_level}"
-                assert len(decision_dict["recommended_actions"]) >= 5, f"recommended_actions length {len(decision_dict['recommended_actions'])} < 5 for {decision_level}"
-                assert len(decision_dict["risk_if_ignore"]) >= 2, f"risk_if_ignore length {len(decision_dict['risk_if_ignore'])} < 2 for {decision_level}"
-        
         return DecisionSummarySchema(**decision_dict)
 
     # ---------- 决策：AUTONOMO ----------
@@ -618,32 +695,9 @@ def compute_decision_summary(
             required_tier = "none"
             pay_reason = None
 
-        # 从模板系统获取完整内容（保证永远不为空）
-        base_template = DECISION_DEFAULT_TEMPLATES.get(decision_level) or DECISION_DEFAULT_TEMPLATES["RISK_AUTONOMO"]
-        
-        # ✅ 使用新的模板系统：从 action_templates 获取
+        # ✅ 使用新的模板系统：从 action_templates 获取（按行业 + 决策等级缓存）
         industry_key = (industry or "other").lower()
-        
-        # 获取行业默认行动清单（至少6条）
-        industry_actions = DEFAULT_ACTIONS_BY_INDUSTRY.get(industry_key, DEFAULT_ACTIONS_BY_INDUSTRY["other"])
-        
-        # 获取行业特定的额外行动清单（从旧的模板系统）
-        industry_map = INDUSTRY_ACTION_TEMPLATES.get(industry_key, {})
-        industry_extra = industry_map.get("common", [])
-        
-        # 合并行动清单并去重，确保最小长度 >= 5
-        merged_actions = merge_actions(industry_actions, industry_extra, min_len=5)
-        merged_actions = merged_actions[:12]  # 限制最多12条
-        
-        # ✅ 从模板系统获取原因和忽视后果
-        reasons = DEFAULT_REASONS_BY_DECISION.get(decision_level, [
-            "基于你当前填写信息的综合判断",
-            "建议用同一口径持续复查"
-        ])
-        ignore = DEFAULT_IGNORE_BY_DECISION.get(decision_level, [
-            "可能出现补税与罚款风险",
-            "一旦触发检查沟通成本会显著上升"
-        ])
+        template_parts = _decision_template_parts(industry_key, decision_level, "RISK_AUTONOMO")
         
         # ✅ 生成风险阶段解释（A/B/C/D）
         risk_explain = _build_risk_explain(stage, risk_score, modules, tags, matched_triggers)
@@ -652,17 +706,17 @@ def compute_decision_summary(
         decision_dict = {
             "level": decision_level,
             "decision_intent": decision_intent,
-            "title": base_template["title"],
-            "conclusion": base_template["conclusion"],
+            "title": template_parts.title,
+            "conclusion": template_parts.conclusion,
             "confidence_level": conf,
-            "confidence_reason": CONFIDENCE_REASON_MAP.get(decision_level, "基于当前输入信号组合与常见合规阈值生成该判断，建议结合实际材料与专业意见确认。"),  # ✅ 新增：置信度原因
+            "confidence_reason": template_parts.confidence_reason,  # ✅ 新增：置信度原因
             "next_review_window": next_review,
             "paywall": required_tier,
             "pay_reason": pay_reason,
             "top_risks": top3_findings,
-            "reasons": reasons[:3],  # 限制最多3条，但保证至少2条
-            "recommended_actions": merged_actions,  # 保证至少5条
-            "risk_if_ignore": ignore[:3],  # 限制最多3条，但保证至少2条
+            "reasons": list(template_parts.reasons),  # 限制最多3条，但保证至少2条
+            "recommended_actions": list(template_parts.recommended_actions),  # 保证至少5条
+            "risk_if_ignore": list(template_parts.risk_if_ignore),  # 限制最多3条，但保证至少2条
             "expert_pack": None,
             "pro_brief": ProBrief(status="coming_soon", summary=None, top_issues=None, recommended_documents=None, export=None),
             "risk_explain": risk_explain,
@@ -678,15 +732,6 @@ def compute_decision_summary(
         # 按 unlocked_tier 裁剪付费字段
         decision_dict = apply_paywall(decision_dict, required_tier, unlocked_tier)
         
-        # 开发环境：验证字段长度（断言）
-        if unlocked_tier != "none" and required_tier != "none":
-            tier_rank = {"none": 0, "basic_15": 1, "expert_39": 2}.get(unlocked_tier, 0)
-            required_rank = {"none": 0, "basic_15": 1, "expert_39": 2}.get(required_tier, 0)
-            if tier_rank >= required_rank:
-                assert len(decision_dict["reasons"]) >= 2, f"reasons length {len(decision_dict['reasons'])} < 2 for {decision_level}"
-                assert len(decision_dict["recommended_actions"]) >= 5, f"recommended_actions length {len(decision_dict['recommended_actions'])} < 5 for {decision_level}"
-                assert len(decision_dict["risk_if_ignore"]) >= 2, f"risk_if_ignore length {len(decision_dict['risk_if_ignore'])} < 2 for {decision_level}"
-        
         return DecisionSummarySchema(**decision_dict)
 
     # ---------- 决策：SL ----------
@@ -712,30 +757,9 @@ def compute_decision_summary(
             required_tier = "none"
             pay_reason = None
 
-        # ✅ 使用新的模板系统：从 action_templates 获取
+        # ✅ 使用新的模板系统：从 action_templates 获取（按行业 + 决策等级缓存）
         industry_key = (industry or "other").lower()
-        base_template = DECISION_DEFAULT_TEMPLATES.get(decision_level) or DECISION_DEFAULT_TEMPLATES["RISK_SL_LOW"]
-        
-        # 获取行业默认行动清单（至少6条）
-        industry_actions = DEFAULT_ACTIONS_BY_INDUSTRY.get(industry_key, DEFAULT_ACTIONS_BY_INDUSTRY["other"])
-        
-        # 获取行业特定的额外行动清单（从旧的模板系统）
-        industry_map = INDUSTRY_ACTION_TEMPLATES.get(industry_key, {})
-        industry_extra = industry_map.get("common", [])
-        
-        # 合并行动清单并去重，确保最小长度 >= 5
-        merged_actions = merge_actions(industry_actions, industry_extra, min_len=5)
-        merged_actions = merged_actions[:12]  # 限制最多12条
-        
-        # ✅ 从模板系统获取原因和忽视后果
-        reasons = DEFAULT_REASONS_BY_DECISION.get(decision_level, [
-            "基于你当前填写信息的综合判断",
-            "建议用同一口径持续复查"
-        ])
-        ignore = DEFAULT_IGNORE_BY_DECISION.get(decision_level, [
-            "可能出现补税与罚款风险",
-            "一旦触发检查沟通成本会显著上升"
-        ])
+        template_parts = _decision_template_parts(industry_key, decision_level, "RISK_SL_LOW")
         
         # ✅ 生成风险阶段解释（A/B/C/D）
         risk_explain = _build_risk_explain(stage, risk_score, modules, tags, matched_triggers)
@@ -744,17 +768,17 @@ def compute_decision_summary(
         decision_dict = {
             "level": decision_level,
             "decision_intent": decision_intent,
-            "title": base_template["title"],
-            "conclusion": base_template["conclusion"],
+            "title": template_parts.title,
+            "conclusion": template_parts.conclusion,
             "confidence_level": conf,
-            "confidence_reason": CONFIDENCE_REASON_MAP.get(decision_level, "基于当前输入信号组合与常见合规阈值生成该判断，建议结合实际材料与专业意见确认。"),  # ✅ 新增：置信度原因
+            "confidence_reason": template_parts.confidence_reason,  # ✅ 新增：置信度原因
             "next_review_window": next_review,
             "paywall": required_tier,
             "pay_reason": pay_reason,
             "top_risks": top3_findings,
-            "reasons": reasons[:3],  # 限制最多3条，但保证至少2条
-            "recommended_actions": merged_actions,  # 保证至少5条
-            "risk_if_ignore": ignore[:3],  # 限制最多3条，但保证至少2条
+            "reasons": list(template_parts.reasons),  # 限制最多3条，但保证至少2条
+            "recommended_actions": list(template_parts.recommended_actions),  # 保证至少5条
+            "risk_if_ignore": list(template_parts.risk_if_ignore),  # 限制最多3条，但保证至少2条
             "expert_pack": None,
             "pro_brief": ProBrief(status="coming_soon", summary=None, top_issues=None, recommended_documents=None, export=None),
             "risk_explain": risk_explain,  # ✅ 新增：风险分数解释
@@ -770,15 +794,6 @@ def compute_decision_summary(
         # 按 unlocked_tier 裁剪付费字段
         decision_dict = apply_paywall(decision_dict, required_tier, unlocked_tier)
         
-        # 开发环境：验证字段长度（断言）
-        if unlocked_tier != "none" and required_tier != "none":
-            tier_rank = {"none": 0, "basic_15": 1, "expert_39": 2}.get(unlocked_tier, 0)
-            required_rank = {"none": 0, "basic_15": 1, "expert_39": 2}.get(required_tier, 0)
-            if tier_rank >= required_rank:
-                assert len(decision_dict["reasons"]) >= 2, f"reasons length {len(decision_dict['reasons'])} < 2 for {decision_level}"
-                assert len(decision_dict["recommended_actions"]) >= 5, f"recommended_actions length {len(decision_dict['recommended_actions'])} < 5 for {decision_level}"
-                assert len(decision_dict["risk_if_ignore"]) >= 2, f"risk_if_ignore length {len(decision_dict['risk_if_ignore'])} < 2 for {decision_level}"
-        
         return DecisionSummarySchema(**decision_dict)
 
     # 理论上不会到这里，返回默认值（使用模板系统）
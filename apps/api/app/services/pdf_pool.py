@@ -0,0 +1,142 @@
+"""
+PDF 渲染进程池
+generate_pdf 是纯 CPU 计算（ReportLab），直接在 async 路由里调用会卡住整个 uvicorn worker
+（包括 Stripe webhook）。这里把渲染放进有界的 ProcessPoolExecutor：
+
+- PDF_POOL_WORKERS：进程数（0 = 不用进程池，改用线程池，便于本地调试）
+- PDF_POOL_MAX_PENDING：排队 + 渲染中的上限，超过时抛 PdfPoolSaturated（路由返回 503 + Retry-After）
+- PDF_RENDER_TIMEOUT_SECONDS：单次渲染等待上限，超时抛 PdfRenderTimeout
+  （超时的任务仍在子进程中跑完，名额在真正结束后才释放，因此排队上限始终有效）
+
+子进程用 spawn 启动（避免 fork 继承父进程的线程 / 连接），启动时预先注册字体、构建样式。
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+PDF_POOL_WORKERS = int(os.getenv("PDF_POOL_WORKERS", str(min(2, os.cpu_count() or 1))))
+PDF_POOL_MAX_PENDING = int(os.getenv("PDF_POOL_MAX_PENDING", str(max(1, PDF_POOL_WORKERS) * 4)))
+PDF_RENDER_TIMEOUT_SECONDS = float(os.getenv("PDF_RENDER_TIMEOUT_SECONDS", "30"))
+PDF_POOL_RETRY_AFTER_SECONDS = int(os.getenv("PDF_POOL_RETRY_AFTER_SECONDS", "5"))
+
+
+class PdfPoolSaturated(Exception):
+    """渲染队列已满"""
+
+
+class PdfRenderTimeout(Exception):
+    """渲染超时"""
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def _init_worker() -> None:
+    """子进程初始化：导入 pdf_report 即注册字体，再构建一次样式表"""
+    from . import pdf_report
+
+    pdf_report._get_styles()
+
+
+def _render(report_data: Dict[str, Any]) -> bytes:
+    from .pdf_report import generate_pdf
+
+    return generate_pdf(report_data)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor) -> None:
+    """子进程异常退出后丢弃进程池，下次调用重新创建"""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _release(_: Any = None) -> None:
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+def _acquire() -> None:
+    global _pending
+    with _pending_lock:
+        if _pending >= PDF_POOL_MAX_PENDING:
+            raise PdfPoolSaturated()
+        _pending += 1
+
+
+async def render_pdf(report_data: Dict[str, Any]) -> bytes:
+    """在进程池中渲染 PDF 并等待结果（不阻塞事件循环）"""
+    _acquire()
+
+    if PDF_POOL_WORKERS <= 0:
+        try:
+            return await asyncio.wait_for(run_in_threadpool(_render, report_data), PDF_RENDER_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise PdfRenderTimeout()
+        finally:
+            _release()
+
+    pool = _get_pool()
+    try:
+        future: Future = pool.submit(_render, report_data)
+    except BrokenProcessPool:
+        _release()
+        _reset_pool(pool)
+        raise
+    except Exception:
+        _release()
+        raise
+    # 名额在子进程真正结束时释放（包括超时后仍在运行的任务）
+    future.add_done_callback(_release)
+
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), PDF_RENDER_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise PdfRenderTimeout()
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise
+
+
+def pdf_pool_stats() -> Dict[str, Any]:
+    return {
+        "workers": PDF_POOL_WORKERS,
+        "pending": _pending,
+        "max_pending": PDF_POOL_MAX_PENDING,
+    }
+
+
+def shutdown_pdf_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
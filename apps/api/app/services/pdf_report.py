@@ -6,11 +6,11 @@ PDF 报告生成器
 
 from io import BytesIO
 from datetime import datetime, timezone
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 import logging
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle, StyleSheet1
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle
 from reportlab.lib import colors
@@ -148,17 +148,55 @@ def generate_pdf(report_data: Dict[str, Any]) -> bytes:
     return buffer.getvalue()
 
 
-def _get_styles():
-    """获取支持中文的样式表"""
+# 自定义段落样式：名称 -> (父样式, 参数)；字体与 CJK 换行由 _build_stylesheet 统一注入
+_CUSTOM_STYLE_SPECS: Dict[str, Tuple[str, Dict[str, Any]]] = {
+    "Brand": ("Normal", dict(fontSize=10, textColor=colors.grey, alignment=TA_CENTER, spaceAfter=0.5*cm)),
+    "CustomTitle": ("Heading1", dict(fontSize=26, textColor=colors.HexColor('#1a1a1a'), spaceAfter=0.4*cm, alignment=TA_CENTER)),
+    "Subtitle": ("Normal", dict(fontSize=11, textColor=colors.HexColor('#666666'), alignment=TA_CENTER, spaceAfter=1.5*cm)),
+    "OverviewLabel": ("Normal", dict(fontSize=11, textColor=colors.HexColor('#333333'), alignment=TA_CENTER, spaceAfter=0.4*cm)),
+    "Overview": ("Normal", dict(fontSize=10, textColor=colors.HexColor('#333333'), alignment=TA_CENTER, spaceAfter=0.18*cm)),
+    "ApplicabilityNote": ("Normal", dict(fontSize=9, textColor=colors.HexColor('#9CA3AF'), alignment=TA_CENTER, spaceAfter=0.2*cm)),
+    "Footer": ("Normal", dict(fontSize=8, textColor=colors.HexColor('#999999'), alignment=TA_CENTER)),
+    "ScoreNote": ("Normal", dict(fontSize=9, textColor=colors.HexColor('#666666'), alignment=TA_LEFT, leftIndent=0.5*cm)),
+    "EnhancedNote": ("Normal", dict(fontSize=8, textColor=colors.grey, fontStyle='italic')),
+    "WarningNote": ("Normal", dict(fontSize=8, textColor=colors.grey, leftIndent=0.5*cm, fontStyle='italic')),
+    "DontDoNote": ("Normal", dict(fontSize=9, textColor=colors.HexColor('#666666'), fontStyle='italic')),
+    "Purpose": ("Normal", dict(fontSize=10, textColor=colors.HexColor('#666666'), spaceAfter=0.4*cm)),
+    "TierTitle": ("Heading2", dict(fontSize=12, textColor=colors.HexColor('#333333'), spaceAfter=0.2*cm)),
+    "TierSubtitle": ("Normal", dict(fontSize=9, textColor=colors.HexColor('#666666'), spaceAfter=0.15*cm, fontStyle='italic')),
+    "ActionItem": ("Normal", dict(fontSize=10, textColor=colors.HexColor('#333333'), leftIndent=0.3*cm, spaceAfter=0.12*cm)),
+    "ClosingNote": ("Normal", dict(fontSize=10, textColor=colors.HexColor('#333333'))),
+    "WeakTitle": ("Heading3", dict(fontSize=11, textColor=colors.HexColor('#666666'), spaceAfter=0.2*cm)),
+    "WeakSubtitle": ("Normal", dict(fontSize=10, textColor=colors.HexColor('#666666'), spaceAfter=0.15*cm)),
+    "WeakContent": ("Normal", dict(fontSize=9, textColor=colors.HexColor('#666666'), spaceAfter=0.12*cm)),
+    "DisclaimerText": ("Normal", dict(fontSize=10, textColor=colors.HexColor('#333333'), alignment=TA_JUSTIFY, spaceAfter=0.3*cm)),
+}
+
+# 每个进程按字体缓存一份样式表（所有 section 共享，构建后不得修改）
+_STYLE_REGISTRY: Dict[str, StyleSheet1] = {}
+
+
+def _build_stylesheet(font_name: str) -> StyleSheet1:
     styles = getSampleStyleSheet()
-    font_name = _get_chinese_font_name()
-    
+
     # ✅ 统一设置所有样式的字体名称
     for style_name in styles.byName:
         style = styles[style_name]
         style.fontName = font_name
         style.wordWrap = 'CJK'  # ✅ 中文自动换行
-    
+
+    for name, (parent, params) in _CUSTOM_STYLE_SPECS.items():
+        styles.add(ParagraphStyle(name, parent=styles[parent], fontName=font_name, wordWrap='CJK', **params))
+
+    return styles
+
+
+def _get_styles():
+    """获取支持中文的样式表（含自定义样式，按字体缓存）"""
+    font_name = _get_chinese_font_name()
+    styles = _STYLE_REGISTRY.get(font_name)
+    if styles is None:
+        styles = _STYLE_REGISTRY[font_name] = _build_stylesheet(font_name)
     return styles, font_name
 
 
@@ -168,45 +206,18 @@ def _build_cover_page(report_data: Dict[str, Any]) -> List:
     styles, font_name = _get_styles()
     
     # 顶部品牌名称（小字号）
-    brand_style = ParagraphStyle(
-        'Brand',
-        parent=styles['Normal'],
-        fontName=font_name,
-        fontSize=10,
-        textColor=colors.grey,
-        alignment=TA_CENTER,
-        spaceAfter=0.5*cm,
-        wordWrap='CJK'
-    )
+    brand_style = styles['Brand']
     story.append(Spacer(1, 3*cm))
     story.append(Paragraph("IberComply", brand_style))
     
     # 主标题样式
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontName=font_name,
-        fontSize=26,
-        textColor=colors.HexColor('#1a1a1a'),
-        spaceAfter=0.4*cm,
-        alignment=TA_CENTER,
-        wordWrap='CJK'
-    )
+    title_style = styles['CustomTitle']
     
     # 主标题
     story.append(Paragraph("合规风险暴露评估报告", title_style))
     
     # 副标题（核心说明，一句话）
-    subtitle_style = ParagraphStyle(
-        'Subtitle',
-        parent=styles['Normal'],
-        fontName=font_name,
-        fontSize=11,
-        textColor=colors.HexColor('#666666'),
-        alignment=TA_CENTER,
-        spaceAfter=1.5*cm,
-        wordWrap='CJK'
-    )
+    subtitle_style = styles['Subtitle']
     story.append(Paragraph("本报告评估的是当前经营状态下的合规风险暴露程度，而非违法或处罚认定", subtitle_style))
     
     # 评估对象概况模块
@@ -237,27 +248,9 @@ def _build_cover_page(report_data: Dict[str, Any]) -> List:
     assessment_version = f"v{assessment_date.strftime('%Y.%m.%d')}"
     
     # 评估对象概况模块（居中布局）
-    overview_label_style = ParagraphStyle(
-        'OverviewLabel',
-        parent=styles['Normal'],
-        fontName=font_name,
-        fontSize=11,
-        textColor=colors.HexColor('#333333'),
-        alignment=TA_CENTER,
-        spaceAfter=0.4*cm,
-        wordWrap='CJK'
-    )
+    overview_label_style = styles['OverviewLabel']
     
-    overview_style = ParagraphStyle(
-        'Overview',
-        parent=styles['Normal'],
-        fontName=font_name,
-        fontSize=10,
-        textColor=colors.HexColor('#333333'),
-        alignment=TA_CENTER,
-        spaceAfter=0.18*cm,
-        wordWrap='CJK'
-    )
+    overview_style = styles['Overview']
     
     story.append(Spacer(1, 0.8*cm))
     story.append(Paragraph("<b>评估对象概况</b>", overview_label_style))
@@ -278,28 +271,13 @@ def _build_cover_page(report_data: Dict[str, Any]) -> List:
     
     # ✅ 适用性说明（封面页底部）
     story.append(Spacer(1, 0.3*cm))
-    applicability_style = ParagraphStyle(
-        'ApplicabilityNote',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#9CA3AF'),
-        alignment=TA_CENTER,
-        spaceAfter=0.2*cm,
-    )
+    applicability_style = styles['ApplicabilityNote']
     applicability_text = f"本报告基于 {assessment_date.strftime('%Y年%m月%d日')} 的输入生成。若经营情况发生变化，建议重新评估。"
     story.append(Paragraph(applicability_text, applicability_style))
     
     # 页脚参考说明（简短，不超过一行）
     story.append(Spacer(1, 2.5*cm))
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontName=font_name,
-        fontSize=8,
-        textColor=colors.HexColor('#999999'),
-        alignment=TA_CENTER,
-        wordWrap='CJK'
-    )
+    footer_style = styles['Footer']
     story.append(Paragraph("基于当前输入信息的合规风险评估，仅供参考", footer_style))
     
     return story
@@ -334,16 +312,7 @@ def _build_summary_section(report_data: Dict[str, Any]) -> List:
     story.append(Paragraph(score_text, styles['Normal']))
     
     # 防误读说明（优化为更清晰的表达）
-    score_note_style = ParagraphStyle(
-        'ScoreNote',
-        parent=styles['Normal'],
-        fontName=font_name,
-        fontSize=9,
-        textColor=colors.HexColor('#666666'),
-        alignment=TA_LEFT,
-        leftIndent=0.5*cm,
-        wordWrap='CJK'
-    )
+    score_note_style = styles['ScoreNote']
     score_note = "注：该分数反映的是当前经营状态的「合规暴露度」，不代表违法程度或处罚结论。"
     story.append(Spacer(1, 0.15*cm))
     story.append(Paragraph(score_note, score_note_style))
@@ -370,15 +339,7 @@ def _build_summary_section(report_data: Dict[str, Any]) -> List:
         story.append(Paragraph(confidence_enhanced, styles['Normal']))
         
         # ✅ 补充"人话解释"（增强信任）
-        enhanced_note_style = ParagraphStyle(
-            'EnhancedNote',
-            parent=styles['Normal'],
-            fontName=font_name,
-            fontSize=8,
-            textColor=colors.grey,
-            wordWrap='CJK',
-            fontStyle='italic'
-        )
+        enhanced_note_style = styles['EnhancedNote']
         story.append(Spacer(1, 0.15*cm))
         story.append(Paragraph("在实际检查中，类似情况下通常需要更多材料，才能确认是否存在被低估的风险点。", enhanced_note_style))
         story.append(Spacer(1, 0.3*cm))
@@ -391,16 +352,7 @@ def _build_summary_section(report_data: Dict[str, Any]) -> List:
     
     if top_risks:
         # 在所有风险点之后添加动态放大条件说明（统一提示）
-        warning_note_style = ParagraphStyle(
-            'WarningNote',
-            parent=styles['Normal'],
-            fontName=font_name,
-            fontSize=8,
-            textColor=colors.grey,
-            leftIndent=0.5*cm,
-            wordWrap='CJK',
-            fontStyle='italic'
-        )
+        warning_note_style = styles['WarningNote']
         
         story.append(Paragraph("<b>最需要注意的 3 个风险点：</b>", styles['Heading3']))
         story.append(Spacer(1, 0.15*cm))
@@ -438,15 +390,7 @@ def _build_dont_do_section(report_data: Dict[str, Any]) -> List:
     story.append(Paragraph("你现在最不该做的事", styles['Heading2']))
     story.append(Spacer(1, 0.15*cm))
 
-    note_style = ParagraphStyle(
-        'DontDoNote',
-        parent=styles['Normal'],
-        fontName=font_name,
-        fontSize=9,
-        textColor=colors.HexColor('#666666'),
-        wordWrap='CJK',
-        fontStyle='italic'
-    )
+    note_style = styles['DontDoNote']
     story.append(Paragraph("只提示“不要做什么”，不提供任何规避或操作细节。", note_style))
     story.append(Spacer(1, 0.15*cm))
 
@@ -491,15 +435,7 @@ def _build_actions_section(report_data: Dict[str, Any]) -> List:
     actions = report_data.get("recommended_actions", [])
     if actions:
         # 行动目标说明（放在标题下方）
-        purpose_style = ParagraphStyle(
-            'Purpose',
-            parent=styles['Normal'],
-            fontName=font_name,
-            fontSize=10,
-            textColor=colors.HexColor('#666666'),
-            wordWrap='CJK',
-            spaceAfter=0.4*cm
-        )
+        purpose_style = styles['Purpose']
         story.append(Paragraph("这些动作的目标是：让你在被询问时，5 分钟内能拿出解释材料。", purpose_style))
         
         # 将行动清单按时间层级分类
@@ -547,37 +483,11 @@ def _build_actions_section(report_data: Dict[str, Any]) -> List:
                     short_term_actions = short_term_actions[:-1]
         
         # 样式定义
-        tier_title_style = ParagraphStyle(
-            'TierTitle',
-            parent=styles['Heading2'],
-            fontName=font_name,
-            fontSize=12,
-            textColor=colors.HexColor('#333333'),
-            spaceAfter=0.2*cm,
-            wordWrap='CJK'
-        )
+        tier_title_style = styles['TierTitle']
         
-        tier_subtitle_style = ParagraphStyle(
-            'TierSubtitle',
-            parent=styles['Normal'],
-            fontName=font_name,
-            fontSize=9,
-            textColor=colors.HexColor('#666666'),
-            spaceAfter=0.15*cm,
-            wordWrap='CJK',
-            fontStyle='italic'
-        )
+        tier_subtitle_style = styles['TierSubtitle']
         
-        action_item_style = ParagraphStyle(
-            'ActionItem',
-            parent=styles['Normal'],
-            fontName=font_name,
-            fontSize=10,
-            textColor=colors.HexColor('#333333'),
-            leftIndent=0.3*cm,
-            spaceAfter=0.12*cm,
-            wordWrap='CJK'
-        )
+        action_item_style = styles['ActionItem']
         
         # ① 现在就该做（1小时内）
         if urgent_actions:
@@ -605,14 +515,7 @@ def _build_actions_section(report_data: Dict[str, Any]) -> List:
         
         # 正向闭环提示
         story.append(Spacer(1, 0.2*cm))
-        closing_note_style = ParagraphStyle(
-            'ClosingNote',
-            parent=styles['Normal'],
-            fontName=font_name,
-            fontSize=10,
-            textColor=colors.HexColor('#333333'),
-            wordWrap='CJK'
-        )
+        closing_note_style = styles['ClosingNote']
         story.append(Paragraph("完成以上步骤后，建议进行一次复评，以确认整体风险是否已明显下降。", closing_note_style))
     
     return story
@@ -624,35 +527,11 @@ def _build_risks_section(report_data: Dict[str, Any], skip_title: bool = False)
     styles, font_name = _get_styles()
     
     # 弱化标题样式（较小字号，中性语气）
-    weak_title_style = ParagraphStyle(
-        'WeakTitle',
-        parent=styles['Heading3'],
-        fontName=font_name,
-        fontSize=11,
-        textColor=colors.HexColor('#666666'),
-        spaceAfter=0.2*cm,
-        wordWrap='CJK'
-    )
+    weak_title_style = styles['WeakTitle']
     
-    weak_subtitle_style = ParagraphStyle(
-        'WeakSubtitle',
-        parent=styles['Normal'],
-        fontName=font_name,
-        fontSize=10,
-        textColor=colors.HexColor('#666666'),
-        spaceAfter=0.15*cm,
-        wordWrap='CJK'
-    )
+    weak_subtitle_style = styles['WeakSubtitle']
     
-    weak_content_style = ParagraphStyle(
-        'WeakContent',
-        parent=styles['Normal'],
-        fontName=font_name,
-        fontSize=9,
-        textColor=colors.HexColor('#666666'),
-        spaceAfter=0.12*cm,
-        wordWrap='CJK'
-    )
+    weak_content_style = styles['WeakContent']
     
     if not skip_title:
         story.append(Paragraph("如果长期忽视，可能出现的结果（供参考）", weak_title_style))
@@ -827,16 +706,7 @@ def _build_disclaimer_page(report_data: Dict[str, Any]) -> List:
     story.append(Spacer(1, 0.4*cm))
     
     # 免责声明正文
-    disclaimer_style = ParagraphStyle(
-        'DisclaimerText',
-        parent=styles['Normal'],
-        fontName=font_name,
-        fontSize=10,
-        textColor=colors.HexColor('#333333'),
-        alignment=TA_JUSTIFY,
-        spaceAfter=0.3*cm,
-        wordWrap='CJK'
-    )
+    disclaimer_style = styles['DisclaimerText']
     
     disclaimer_text = (
         "本报告为基于当前输入信息的合规风险暴露评估，仅供参考，不构成法律、税务或财务建议。"
@@ -0,0 +1,130 @@
+"""
+组合风险蒙特卡洛模拟（gestoría 客户组合：下季度风险等级分布）
+
+每个客户只有收入是不确定的：信号 / 组合 / 雇员 / POS 的分数由 risk_batch.score_batch 一次算好（含上限），
+下季度月收入按对数正态抽样：
+
+    income' = income * exp(drift - volatility² / 2 + volatility * Z),  Z ~ N(0, 1)
+
+（drift = 0 时期望收入不变；当前收入为 0 的客户保持 0）。抽样收入按 INCOME_SCORE_BY_STAGE 分档计分
+（与 calc_income_score 相同的 searchsorted 规则），加上固定部分后 clamp 到 0-100。
+分数是 0-100 的整数，按客户做一次 bincount 得到分数直方图，等级概率 / 期望分 / 分位数都从直方图读出。
+客户按块处理（每块不超过 PORTFOLIO_SIM_CHUNK_DRAWS 个抽样），内存与客户数无关。
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ..schemas.assessment import RiskAssessmentRequest
+from .risk_batch import LEVEL_THRESHOLDS, LEVELS, STAGES, BatchScores, score_batch
+from .risk_engine import INCOME_SCORE_BY_STAGE
+
+PORTFOLIO_SIM_CHUNK_DRAWS = int(os.getenv("PORTFOLIO_SIM_CHUNK_DRAWS", str(1 << 21)))
+
+_INCOME_THRESHOLDS = tuple(np.array([t for t, _ in INCOME_SCORE_BY_STAGE[s]], dtype=np.float64) for s in STAGES)
+# 下标 len(table)（超过最大阈值）取最后一档
+_INCOME_POINTS = tuple(
+    np.array([p for _, p in INCOME_SCORE_BY_STAGE[s]] + [INCOME_SCORE_BY_STAGE[s][-1][1]], dtype=np.int64)
+    for s in STAGES
+)
+# 分数（0-100）-> 等级 one-hot [101, L]
+_SCORE_VALUES = np.arange(101)
+_SCORE_LEVEL_ONEHOT = (
+    np.searchsorted(LEVEL_THRESHOLDS, _SCORE_VALUES, side="right")[:, None] == np.arange(len(LEVELS))[None, :]
+).astype(np.float64)
+
+
+def score_income_scenarios(scores: BatchScores, rows: np.ndarray, incomes: np.ndarray) -> np.ndarray:
+    """
+    用抽样收入重新计分：incomes [k, D] 为 rows 对应客户的收入场景，返回 [k, D] 分数
+    （收入以外的模块沿用 scores 中已算好的值）
+    """
+    fixed = (scores.base + scores.signals + scores.combo + scores.employees + scores.pos)[rows]
+    stage_rows = scores.stage_row[rows]
+    income_points = np.empty(incomes.shape, dtype=np.int64)
+    for s in range(len(STAGES)):
+        selected = stage_rows == s
+        if not selected.any():
+            continue
+        band = np.searchsorted(_INCOME_THRESHOLDS[s], incomes[selected], side="right")
+        income_points[selected] = _INCOME_POINTS[s][band]
+    return np.clip(fixed[:, None] + income_points, 0, 100)
+
+
+def simulate_portfolio(
+    requests: Sequence[RiskAssessmentRequest],
+    volatility: Sequence[float],
+    drift: Sequence[float],
+    draws: int,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    对每个客户抽样 draws 个下季度收入场景
+    volatility / drift：每个客户的季度对数收入波动率与漂移（与 requests 一一对应）
+    返回 {"clients": [...], "portfolio": {...}}，clients 顺序与 requests 一致
+    """
+    n = len(requests)
+    scores = score_batch(requests)
+    income = np.fromiter(
+        (0.0 if not request.monthly_income or request.monthly_income < 0 else request.monthly_income
+         for request in requests),
+        dtype=np.float64, count=n,
+    )
+    sigma = np.asarray(volatility, dtype=np.float64)
+    mu = np.asarray(drift, dtype=np.float64) - sigma ** 2 / 2
+    rng = np.random.default_rng(seed)
+
+    histogram = np.zeros((n, 101), dtype=np.int64)
+    chunk = max(1, PORTFOLIO_SIM_CHUNK_DRAWS // max(draws, 1))
+    for start in range(0, n, chunk):
+        rows = np.arange(start, min(start + chunk, n))
+        z = rng.standard_normal((len(rows), draws))
+        incomes = income[rows, None] * np.exp(mu[rows, None] + sigma[rows, None] * z)
+        simulated = score_income_scenarios(scores, rows, incomes)
+        offsets = (np.arange(len(rows)) * 101)[:, None]
+        histogram[rows] = np.bincount((simulated + offsets).ravel(), minlength=len(rows) * 101).reshape(len(rows), 101)
+
+    level_probs = histogram @ _SCORE_LEVEL_ONEHOT / draws
+    expected_score = histogram @ _SCORE_VALUES / draws
+    cumulative = np.cumsum(histogram, axis=1)
+    quantiles = {
+        name: (cumulative < q * draws).sum(axis=1)
+        for name, q in (("score_p05", 0.05), ("score_p50", 0.5), ("score_p95", 0.95))
+    }
+    current_level = scores.level
+    level_rank = np.arange(len(LEVELS))
+    p_up = (level_probs * (level_rank[None, :] > current_level[:, None])).sum(axis=1)
+    p_down = (level_probs * (level_rank[None, :] < current_level[:, None])).sum(axis=1)
+
+    clients: List[Dict[str, Any]] = []
+    score_list = scores.score.tolist()
+    probs_list = level_probs.round(6).tolist()
+    for i in range(n):
+        clients.append({
+            "risk_score": score_list[i],
+            "risk_level": LEVELS[current_level[i]],
+            "expected_score": round(float(expected_score[i]), 3),
+            "score_p05": int(quantiles["score_p05"][i]),
+            "score_p50": int(quantiles["score_p50"][i]),
+            "score_p95": int(quantiles["score_p95"][i]),
+            "level_probabilities": dict(zip(LEVELS, probs_list[i])),
+            "p_level_up": round(float(p_up[i]), 6),
+            "p_level_down": round(float(p_down[i]), 6),
+        })
+
+    # 组合层面：按当前等级聚合的转移矩阵 + 下季度各等级的期望客户数
+    transition: Dict[str, Dict[str, float]] = {}
+    for rank, level in enumerate(LEVELS):
+        selected = current_level == rank
+        if selected.any():
+            transition[level] = dict(zip(LEVELS, level_probs[selected].mean(axis=0).round(6).tolist()))
+    portfolio = {
+        "clients": n,
+        "draws": draws,
+        "current_level_counts": dict(zip(LEVELS, np.bincount(current_level, minlength=len(LEVELS)).tolist())),
+        "expected_level_counts": dict(zip(LEVELS, level_probs.sum(axis=0).round(3).tolist())),
+        "transition": transition,
+    }
+    return {"clients": clients, "portfolio": portfolio}
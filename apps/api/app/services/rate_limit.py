@@ -0,0 +1,416 @@
+"""
+请求限流（令牌桶，内存有界）
+
+原实现为每个 ip:path 保存一个时间戳列表，每次请求用推导式重建列表，且从不删除空闲 key，
+内存随不同 IP / 路径数量无限增长。这里改为：
+- 每个 key 一个令牌桶（N = RATE_LIMIT_MAX_REQUESTS，窗口 = RATE_LIMIT_WINDOW_SECONDS）：
+  默认容量 N、补充速率 N / 窗口，持续速率与原滑动窗口相同（稳定轮询的客户端不受影响），
+  但空闲后的首个窗口内最多可放行约 2N 次。
+  设置 RATE_LIMIT_BURST=B（B < N）时容量 = B、补充速率 = (N - B) / 窗口：任意窗口内严格不超过 N 次，
+  代价是持续速率降为 (N - B) / 窗口。
+- 全局 LRU：OrderedDict 按最近访问排序，超过 RATE_LIMIT_MAX_KEYS 淘汰最久未访问的 key
+- TTL：空闲超过 容量 / 补充速率 秒（默认即一个窗口）的桶必然已补满，与不存在等价，
+  新增 key 时顺带从 LRU 头部清理（均摊 O(1)）
+每次请求 O(1)，内存上限约 RATE_LIMIT_MAX_KEYS 个桶。
+
+后端（RATE_LIMIT_BACKEND）：
+- memory：进程内（默认；多 worker 时每个 worker 各算各的，实际上限会放大）
+- shm：单机多 worker 共享的 mmap 计数表（固定大小，组相联 + 按组加文件锁）
+- sql：存数据库（多节点共享；每次请求一条条件 UPDATE，被拒绝的请求不写库）
+"""
+
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, delete, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from ..database import engine as default_engine
+from ..models import RateLimitBucket
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_WINDOW_SECONDS = int(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "60"))
+RATE_LIMIT_MAX_REQUESTS = int(os.getenv("RATE_LIMIT_MAX_REQUESTS", "120"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST")) if os.getenv("RATE_LIMIT_BURST") else None
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_SHM_PATH = os.getenv(
+    "RATE_LIMIT_SHM_PATH",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "ibercomply_rate_limit"),
+)
+
+def bucket_params(max_requests: int, window_seconds: float, burst: Optional[int] = None):
+    """
+    令牌桶参数 (容量, 每秒补充量)
+    - burst=None（默认）：容量 max_requests、每窗口补充 max_requests，持续速率与原滑动窗口一致，
+      空闲后的首个窗口最多约 2 * max_requests 次
+    - burst=B < max_requests：容量 B、每窗口补充 max_requests - B，任意 window_seconds 内不超过 max_requests 次
+    """
+    if burst is None or burst >= max_requests:
+        return float(max_requests), max_requests / float(window_seconds)
+    burst = max(burst, 1)
+    return float(burst), (max_requests - burst) / float(window_seconds)
+
+
+# 每次新增 key 最多顺带清理的过期 key 数（大于 1 才能让过期清理追上新增速度）
+_EVICT_BATCH = 8
+
+
+class RateLimiter:
+    """
+    限流后端接口
+    blocking=True 的后端（数据库）会做 I/O，中间件放到线程池中调用
+    """
+
+    name = "base"
+    blocking = False
+
+    def allow(self, key: str, now: Optional[float] = None) -> bool:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class TokenBucketLimiter(RateLimiter):
+    """有界令牌桶限流器（进程内，线程安全）"""
+
+    name = "memory"
+
+    def __init__(
+        self,
+        max_requests: int = RATE_LIMIT_MAX_REQUESTS,
+        window_seconds: float = RATE_LIMIT_WINDOW_SECONDS,
+        max_keys: int = RATE_LIMIT_MAX_KEYS,
+        burst: Optional[int] = None,
+    ):
+        self.capacity, self.refill_per_second = bucket_params(max_requests, window_seconds, burst)
+        self.window_seconds = float(window_seconds)
+        # 空闲超过该时长的桶已补满（与不存在等价），可以回收
+        self.idle_seconds = self.capacity / self.refill_per_second
+        self.max_keys = max_keys
+        # key -> [剩余令牌, 上次更新时间]
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    def _evict(self, now: float) -> None:
+        """从 LRU 头部清理已补满的空闲桶；超过容量时淘汰最久未访问的桶（调用方持有锁）"""
+        buckets = self._buckets
+        expire_before = now - self.idle_seconds
+        for _ in range(_EVICT_BATCH):
+            if not buckets:
+                return
+            key = next(iter(buckets))
+            if buckets[key][1] > expire_before:
+                break
+            del buckets[key]
+            self.evicted += 1
+        while len(buckets) >= self.max_keys:
+            buckets.popitem(last=False)
+            self.evicted += 1
+
+    def allow(self, key: str, now: Optional[float] = None) -> bool:
+        """消耗一个令牌；令牌不足返回 False"""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # 只有新增 key 时字典才会增长，此时顺带清理
+                self._evict(now)
+                if self.capacity < 1.0:
+                    self._buckets[key] = [self.capacity, now]
+                    self.rejected += 1
+                    return False
+                self._buckets[key] = [self.capacity - 1.0, now]
+                self.allowed += 1
+                return True
+
+            self._buckets.move_to_end(key)
+            tokens = bucket[0] + (now - bucket[1]) * self.refill_per_second
+            if tokens > self.capacity:
+                tokens = self.capacity
+            bucket[1] = now
+            if tokens >= 1.0:
+                bucket[0] = tokens - 1.0
+                self.allowed += 1
+                return True
+            bucket[0] = tokens
+            self.rejected += 1
+            return False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "keys": len(self._buckets),
+                "max_keys": self.max_keys,
+                "allowed": self.allowed,
+                "rejected": self.rejected,
+                "evicted": self.evicted,
+            }
+
+
+def _key_tag(key: str) -> int:
+    """跨进程稳定的 64 位 key 哈希（内置 hash() 每个进程随机化，不能用）；0 表示空槽"""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+class SharedMemoryLimiter(RateLimiter):
+    """
+    单机多 worker 共享的令牌桶表（mmap 文件，默认放在 /dev/shm）
+
+    布局：16 字节头（magic + 组数） + groups * WAYS 个槽，每槽 (tag u64, tokens f64, ts f64)。
+    文件名带组数（RATE_LIMIT_SHM_PATH.<groups>）：其他 worker 可能正映射着这个文件，已存在的文件从不改变大小，
+    修改 RATE_LIMIT_MAX_KEYS 后重启会使用新文件；同名文件头不匹配时拒绝启动（RuntimeError）。
+    key 按哈希落到一个组（WAYS 个槽，组相联），组内找不到时占用空槽 / 已过期槽，都没有则淘汰组内最久未访问的槽，
+    因此内存固定为 槽数 * 24 字节。每次请求只对所在组的字节区间加 lockf 排他锁（不同组的请求互不阻塞）。
+    allow() 在事件循环中直接调用，加锁用非阻塞模式（LOCK_NB）：组锁的临界区只有几微秒，
+    忙时重试 _LOCK_ATTEMPTS 次仍拿不到（例如持锁的 worker 被挂起）就放行本次请求，记入 lock_busy，
+    不让事件循环等在文件锁上。时间用 time.time()（所有 worker 一致）。
+    stats() 只返回本进程的计数器，不遍历共享表（/metrics 可能被频繁抓取，不能让它做 O(槽数) 的扫描）。
+    """
+
+    name = "shm"
+    WAYS = 8
+    _MAGIC = b"IBRL0001"
+    _HEADER = struct.Struct("<8sQ")
+    _SLOT = struct.Struct("<Qdd")
+    _GROUP = struct.Struct("<" + "Qdd" * WAYS)
+    _LOCK_ATTEMPTS = 16
+
+    def __init__(
+        self,
+        path: str = RATE_LIMIT_SHM_PATH,
+        max_requests: int = RATE_LIMIT_MAX_REQUESTS,
+        window_seconds: float = RATE_LIMIT_WINDOW_SECONDS,
+        max_keys: int = RATE_LIMIT_MAX_KEYS,
+        burst: Optional[int] = None,
+    ):
+        self.capacity, self.refill_per_second = bucket_params(max_requests, window_seconds, burst)
+        self.window_seconds = float(window_seconds)
+        # 空闲超过该时长的桶已补满（与不存在等价），可以回收
+        self.idle_seconds = self.capacity / self.refill_per_second
+        self.groups = max(1, -(-max_keys // self.WAYS))
+        self._group_bytes = self._GROUP.size
+        size = self._HEADER.size + self.groups * self._group_bytes
+        self.path = f"{path}.{self.groups}"
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        # 只初始化新建的文件（对整个文件加锁，避免多个 worker 同时初始化）；已有文件不截断、不改大小
+        expected_header = self._HEADER.pack(self._MAGIC, self.groups)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            file_size = os.fstat(self._fd).st_size
+            header = os.pread(self._fd, self._HEADER.size, 0)
+            if file_size == 0 or (file_size == size and header == bytes(self._HEADER.size)):
+                # 新文件（或上次初始化在写头之前中断）：表全为 0
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, expected_header, 0)
+                header = expected_header
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        if os.fstat(self._fd).st_size != size or header != expected_header:
+            os.close(self._fd)
+            raise RuntimeError(
+                f"限流共享表 {self.path} 与当前配置不一致（文件头或大小不匹配：{file_size} 字节，期望 {size} 字节）："
+                "确认没有 worker 仍在使用后删除该文件，或改用其他 RATE_LIMIT_SHM_PATH"
+            )
+        self._mm = mmap.mmap(self._fd, size)
+        # fcntl 锁按进程生效，同进程内的线程另用线程锁互斥
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.new_keys = 0
+        self.lock_busy = 0
+
+    def _try_lock_group(self, offset: int) -> bool:
+        """非阻塞地锁住一个组；重试 _LOCK_ATTEMPTS 次仍被占用时返回 False"""
+        for _ in range(self._LOCK_ATTEMPTS):
+            try:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, self._group_bytes, offset)
+                return True
+            except (BlockingIOError, PermissionError):
+                time.sleep(0)  # 让出 CPU，持锁方的临界区很短
+        return False
+
+    def allow(self, key: str, now: Optional[float] = None) -> bool:
+        if now is None:
+            now = time.time()
+        tag = _key_tag(key)
+        offset = self._HEADER.size + (tag % self.groups) * self._group_bytes
+        expire_before = now - self.idle_seconds
+
+        with self._lock:
+            if not self._try_lock_group(offset):
+                # 限流不应阻塞事件循环：拿不到锁时放行
+                self.lock_busy += 1
+                self.allowed += 1
+                return True
+            try:
+                group = self._GROUP.unpack_from(self._mm, offset)
+                slot = -1
+                victim, victim_ts = 0, float("inf")
+                for i in range(self.WAYS):
+                    slot_tag, _, slot_ts = group[i * 3:i * 3 + 3]
+                    if slot_tag == tag:
+                        slot = i
+                        break
+                    # 空槽 / 过期槽的 ts 最小，优先作为替换对象
+                    ts = -1.0 if slot_tag == 0 or slot_ts < expire_before else slot_ts
+                    if ts < victim_ts:
+                        victim, victim_ts = i, ts
+
+                if slot >= 0:
+                    tokens = group[slot * 3 + 1] + (now - group[slot * 3 + 2]) * self.refill_per_second
+                    if tokens > self.capacity:
+                        tokens = self.capacity
+                else:
+                    if victim_ts >= 0:
+                        self.evicted += 1
+                    self.new_keys += 1
+                    slot, tokens = victim, self.capacity
+
+                allowed = tokens >= 1.0
+                if allowed:
+                    tokens -= 1.0
+                self._SLOT.pack_into(self._mm, offset + slot * self._SLOT.size, tag, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self._group_bytes, offset)
+
+            if allowed:
+                self.allowed += 1
+            else:
+                self.rejected += 1
+            return allowed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "max_keys": self.groups * self.WAYS,
+            # 以下计数为本进程
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "new_keys": self.new_keys,
+            "evicted": self.evicted,
+            "lock_busy": self.lock_busy,
+        }
+
+
+class SqlRateLimiter(RateLimiter):
+    """
+    数据库令牌桶（rate_limit_buckets 表，多节点共享）
+
+    每次请求一条条件 UPDATE：令牌足够时扣减并返回 rowcount=1；不足时不写库（被拒绝的请求不产生写入）。
+    rowcount=0 且 key 不存在时插入新桶（并发插入冲突时按已存在处理）。
+    每 RATE_LIMIT_WINDOW_SECONDS 顺带删除一次已补满的空闲桶。
+    数据库异常时放行（限流不应导致整站不可用），记入 errors。
+    时间用各节点的 time.time()，节点间时钟需同步。
+    """
+
+    name = "sql"
+    blocking = True
+
+    def __init__(
+        self,
+        engine=None,
+        max_requests: int = RATE_LIMIT_MAX_REQUESTS,
+        window_seconds: float = RATE_LIMIT_WINDOW_SECONDS,
+        burst: Optional[int] = None,
+    ):
+        self._engine = engine or default_engine
+        self._table = RateLimitBucket.__table__
+        self.capacity, self.refill_per_second = bucket_params(max_requests, window_seconds, burst)
+        self.window_seconds = float(window_seconds)
+        # 空闲超过该时长的桶已补满（与不存在等价），可以回收
+        self.idle_seconds = self.capacity / self.refill_per_second
+        self._next_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def _consume(self, conn, key: str, now: float) -> bool:
+        t = self._table
+        refilled = t.c.tokens + (now - t.c.updated_at) * self.refill_per_second
+        current = case((refilled > self.capacity, self.capacity), else_=refilled)
+        result = conn.execute(
+            update(t).where(t.c.key == key, current >= 1.0).values(tokens=current - 1.0, updated_at=now)
+        )
+        if result.rowcount:
+            return True
+        if self.capacity < 1.0:
+            return False
+        # 不存在则建桶（本次请求消耗一个令牌）；已存在说明令牌不足
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(t).values(key=key, tokens=self.capacity - 1.0, updated_at=now))
+            return True
+        except IntegrityError:
+            return False
+
+    def _sweep(self, now: float) -> None:
+        with self._sweep_lock:
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + self.window_seconds
+        with self._engine.begin() as conn:
+            conn.execute(delete(self._table).where(self._table.c.updated_at < now - self.idle_seconds))
+
+    def allow(self, key: str, now: Optional[float] = None) -> bool:
+        if now is None:
+            now = time.time()
+        try:
+            with self._engine.begin() as conn:
+                allowed = self._consume(conn, key, now)
+            if now >= self._next_sweep:
+                self._sweep(now)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("[RATE_LIMIT] sql backend failed, allowing request: %s", e)
+            return True
+        if allowed:
+            self.allowed += 1
+        else:
+            self.rejected += 1
+        return allowed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            # 计数为本进程
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "errors": self.errors,
+        }
+
+
+def create_rate_limiter(backend: Optional[str] = None) -> RateLimiter:
+    """按 RATE_LIMIT_BACKEND 创建限流后端：memory / shm / sql"""
+    backend = (backend or RATE_LIMIT_BACKEND).strip().lower()
+    if backend == "memory":
+        return TokenBucketLimiter(burst=RATE_LIMIT_BURST)
+    if backend == "shm":
+        return SharedMemoryLimiter(burst=RATE_LIMIT_BURST)
+    if backend == "sql":
+        return SqlRateLimiter(burst=RATE_LIMIT_BURST)
+    raise ValueError(f"未知的 RATE_LIMIT_BACKEND: {backend}（可选 memory / shm / sql）")
@@ -0,0 +1,166 @@
+"""
+整改方案规划（反事实：改哪些信号能降到目标等级 / 区间）
+
+stage / 收入 / 雇员 / POS 不变时，分数只随信号 bitmask 变化：先取出该画像下全部 mask 的分数
+（SCORE_TABLE.mask_scores，已建表行业直接切出一行），每个候选方案 = 当前 mask 异或翻转位，
+查一次下标即得新分数（信号上限与组合加成已包含在表中），不重新执行 assess_risk_v3。
+
+- 可整改信号（默认）：当前未勾选的减分项（如 keeps_supplier_invoices、has_prl_insurance）-> 勾选；
+  当前勾选的 no_* 缺失项（如 no_insurance）-> 取消。调用方可指定可翻转的信号及每项成本（默认 1）
+- 按翻转个数从少到多枚举组合；已达标组合的超集不再计入（成本为正，超集不会更便宜）
+- 结果按 (成本, 翻转个数, 新分数) 排序；超出 REMEDIATION_BUDGET_MS 时返回已找到的方案（complete=False）
+"""
+
+import os
+import time
+from itertools import combinations
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from ..schemas.assessment import RiskAssessmentRequest
+from .risk.risk_bands import RISK_BANDS, get_risk_band
+from .risk.rule_plan import IndustryPlan, combo_matches, get_industry_plan
+from .risk_engine import SCORE_TABLE, score_to_level
+
+REMEDIATION_MAX_FLIPS = int(os.getenv("REMEDIATION_MAX_FLIPS", "4"))
+REMEDIATION_BUDGET_MS = float(os.getenv("REMEDIATION_BUDGET_MS", "50"))
+
+LEVEL_ORDER = ("green", "yellow", "orange", "red")
+# 每个等级的最高分（由 score_to_level 推出，不重复维护阈值）
+LEVEL_MAX_SCORE = {level: max(s for s in range(101) if score_to_level(s) == level) for level in LEVEL_ORDER}
+BAND_MAX_SCORE = {band.label: band.max for band in RISK_BANDS}
+
+# 每枚举这么多个组合检查一次时间预算
+_BUDGET_CHECK_EVERY = 256
+
+
+def default_actionable_signals(plan: IndustryPlan, signals: Mapping[str, bool]) -> List[str]:
+    """默认可整改信号：未勾选的减分项、已勾选的 no_* 缺失项"""
+    actionable = []
+    for key, rule in plan.signals.items():
+        checked = bool(signals.get(key))
+        if (rule.points < 0 and not checked) or (key.startswith("no_") and checked):
+            actionable.append(key)
+    return actionable
+
+
+def resolve_target_max_score(
+    current_level: str,
+    target_level: Optional[str] = None,
+    target_band: Optional[str] = None,
+) -> int:
+    """
+    目标换算为分数上限：指定 target_level / target_band 时取两者中更严格的；
+    都未指定时为比当前低一级的等级（当前已是 green 时即 green）
+    """
+    limits = []
+    if target_level:
+        limits.append(LEVEL_MAX_SCORE[target_level])
+    if target_band:
+        limits.append(BAND_MAX_SCORE[target_band])
+    if not limits:
+        rank = LEVEL_ORDER.index(current_level)
+        limits.append(LEVEL_MAX_SCORE[LEVEL_ORDER[max(rank - 1, 0)]])
+    return min(limits)
+
+
+def _score_summary(score: int) -> Dict[str, Any]:
+    return {"risk_score": score, "risk_level": score_to_level(score), "risk_band": get_risk_band(score)["label"]}
+
+
+def plan_remediation(
+    request: RiskAssessmentRequest,
+    target_level: Optional[str] = None,
+    target_band: Optional[str] = None,
+    actionable_signals: Optional[Sequence[str]] = None,
+    costs: Optional[Mapping[str, float]] = None,
+    max_flips: int = REMEDIATION_MAX_FLIPS,
+    max_plans: int = 5,
+    budget_ms: float = REMEDIATION_BUDGET_MS,
+) -> Dict[str, Any]:
+    """
+    搜索使分数降到目标（resolve_target_max_score）的最便宜信号翻转组合
+    返回: {risk_score, risk_level, risk_band, target_max_score, target_met, plans, searched, complete}
+    """
+    started = time.perf_counter()
+    deadline = started + budget_ms / 1000
+    costs = costs or {}
+
+    plan = get_industry_plan(request.industry)
+    signal_mask = plan.encode(request.signals)
+    scores = SCORE_TABLE.mask_scores(
+        plan, request.stage, request.monthly_income, request.employee_count, request.has_pos
+    )
+    current_score = scores[signal_mask]
+    target_max_score = resolve_target_max_score(score_to_level(current_score), target_level, target_band)
+
+    if actionable_signals is None:
+        actionable_signals = default_actionable_signals(plan, request.signals)
+    # 只有该行业允许的信号可以翻转（去重、保持顺序）
+    candidates = [key for key in dict.fromkeys(actionable_signals) if key in plan.signals]
+    bits = [plan.signal_bits[key] for key in candidates]
+    single_deltas = [scores[signal_mask ^ bit] - current_score for bit in bits]
+
+    found: List[Tuple[float, int, int, Tuple[int, ...]]] = []  # (cost, 翻转个数, 新分数, 候选下标)
+    found_masks: List[int] = []
+    searched = 0
+    complete = True
+    target_met = current_score <= target_max_score
+    if not target_met:
+        for size in range(1, min(max_flips, len(candidates)) + 1):
+            for indexes in combinations(range(len(candidates)), size):
+                searched += 1
+                if searched % _BUDGET_CHECK_EVERY == 0 and time.perf_counter() > deadline:
+                    complete = False
+                    break
+                flip_mask = 0
+                for i in indexes:
+                    flip_mask |= bits[i]
+                if any(flip_mask & found_mask == found_mask for found_mask in found_masks):
+                    continue
+                score = scores[signal_mask ^ flip_mask]
+                if score <= target_max_score:
+                    found_masks.append(flip_mask)
+                    cost = sum(costs.get(candidates[i], 1.0) for i in indexes)
+                    found.append((cost, size, score, indexes))
+            if not complete:
+                break
+    found.sort(key=lambda item: item[:3])
+
+    combo_hits_before = [combo_matches(signal_mask, combo.true_mask, combo.false_mask) for combo in plan.combos]
+    plans = []
+    for cost, _, score, indexes in found[:max_plans]:
+        new_mask = signal_mask
+        flips = []
+        for i in indexes:
+            key = candidates[i]
+            new_mask ^= bits[i]
+            checked = bool(signal_mask & bits[i])
+            flips.append({
+                "signal": key,
+                "title": plan.signals[key].title,
+                "from_value": checked,
+                "to_value": not checked,
+                "score_delta": single_deltas[i],
+            })
+        resolved = [
+            combo.finding.code
+            for combo, hit in zip(plan.combos, combo_hits_before)
+            if hit and not combo_matches(new_mask, combo.true_mask, combo.false_mask)
+        ]
+        plans.append({
+            "flips": flips,
+            "cost": cost,
+            "score_delta": score - current_score,
+            "resolved_combos": resolved,
+            **_score_summary(score),
+        })
+
+    return {
+        **_score_summary(current_score),
+        "target_max_score": target_max_score,
+        "target_met": target_met,
+        "plans": plans,
+        "searched": searched,
+        "complete": complete,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
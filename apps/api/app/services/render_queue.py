@@ -0,0 +1,386 @@
+"""
+PDF 预渲染队列（数据库即队列：SQLite / Postgres 均可，无外部 broker）
+
+解锁 / 升级（webhook、/payment/status 兜底解锁、重新评估）后调用 enqueue_render 入队，
+后台 worker 领取任务，在 PDF 进程池中渲染，结果写入 rendered_reports 表（各实例共享）
+并回填本机 PDF 磁盘缓存（report_cache）；用户点击下载时先查本机缓存，未命中再读共享表，
+渲染负载不再跟着支付转化的峰值走。
+
+- 领取：条件 UPDATE（status='queued' -> 'running'），多实例 / 多进程并发领取也只有一个成功
+- 重试：失败后按 RENDER_QUEUE_BACKOFF_SECONDS * 2^(attempts-1) 退避（上限 RENDER_QUEUE_BACKOFF_MAX_SECONDS）
+- 死信：attempts 达到 max_attempts 或不可重试的错误 -> status='dead'，可通过 requeue_job 人工重试
+- 租约：running 超过 RENDER_QUEUE_LEASE_SECONDS 视为 worker 崩溃，重新入队（次数用尽则进死信）
+- 进程池满（PdfPoolSaturated）不消耗重试次数，稍后再领取
+- 保留期：worker 每小时清理一次超过 RENDER_QUEUE_RETENTION_DAYS 的 done 任务、
+  超过 RENDER_QUEUE_DEAD_RETENTION_DAYS 的 dead 任务（PDF 本身在 rendered_reports 中，不受影响）
+
+RENDER_QUEUE_WORKERS=0 时本实例只入队不消费（由其他实例处理，渲染结果经 rendered_reports 共享）；
+PDF_CACHE_DIR 为空时不入队。
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..database import SessionLocal
+from ..models import Assessment, RenderedReport, RenderJob
+from .assessment_store import load_assessment_payload_sync
+from .pdf_pool import PdfPoolSaturated, render_pdf
+from .report_builder import build_report_data
+from .report_cache import PDF_CACHE_DIR, report_digest, store_pdf
+
+logger = logging.getLogger(__name__)
+
+RENDER_QUEUE_WORKERS = int(os.getenv("RENDER_QUEUE_WORKERS", "1"))
+RENDER_QUEUE_POLL_SECONDS = float(os.getenv("RENDER_QUEUE_POLL_SECONDS", "2"))
+RENDER_QUEUE_MAX_ATTEMPTS = int(os.getenv("RENDER_QUEUE_MAX_ATTEMPTS", "5"))
+RENDER_QUEUE_BACKOFF_SECONDS = float(os.getenv("RENDER_QUEUE_BACKOFF_SECONDS", "10"))
+RENDER_QUEUE_BACKOFF_MAX_SECONDS = float(os.getenv("RENDER_QUEUE_BACKOFF_MAX_SECONDS", "600"))
+RENDER_QUEUE_LEASE_SECONDS = float(os.getenv("RENDER_QUEUE_LEASE_SECONDS", "300"))
+RENDER_QUEUE_SATURATED_DELAY_SECONDS = float(os.getenv("RENDER_QUEUE_SATURATED_DELAY_SECONDS", "5"))
+RENDER_QUEUE_RETENTION_DAYS = float(os.getenv("RENDER_QUEUE_RETENTION_DAYS", "7"))
+RENDER_QUEUE_DEAD_RETENTION_DAYS = float(os.getenv("RENDER_QUEUE_DEAD_RETENTION_DAYS", "30"))
+
+_CLEANUP_INTERVAL_SECONDS = 3600
+
+# 对外（轮询接口）展示的状态
+JOB_STATUS_PUBLIC = {"queued": "queued", "running": "running", "done": "ready", "dead": "failed"}
+
+
+class _PermanentJobError(Exception):
+    """不可重试的错误（数据不完整等），直接进入死信"""
+
+
+_wake_event: Optional[asyncio.Event] = None
+_next_cleanup = 0.0  # time.monotonic()
+_wake_loop: Optional[asyncio.AbstractEventLoop] = None
+_stop_event: Optional[asyncio.Event] = None
+_worker_tasks: List[asyncio.Task] = []
+
+
+def _wake_workers() -> None:
+    """入队后唤醒本进程的 worker（可能在线程池中调用）"""
+    if _wake_loop is None or _wake_event is None:
+        return
+    try:
+        _wake_loop.call_soon_threadsafe(_wake_event.set)
+    except RuntimeError:
+        pass  # 事件循环已关闭
+
+
+def enqueue_render(db: Session, assessment_id: str) -> Optional[RenderJob]:
+    """
+    为评估入队一个预渲染任务（调用方已提交解锁状态）
+    已有排队中的任务时复用（立即可领取）；运行中的任务可能拿的是旧数据，因此另起一个。
+    入队失败只记日志，不影响支付 / 解锁流程。
+    """
+    if not PDF_CACHE_DIR or not assessment_id:
+        return None
+    now = datetime.utcnow()
+    try:
+        job = db.query(RenderJob).filter(
+            RenderJob.assessment_id == assessment_id,
+            RenderJob.status == "queued",
+        ).first()
+        if job:
+            job.next_run_at = now
+        else:
+            job = RenderJob(
+                assessment_id=assessment_id,
+                status="queued",
+                attempts=0,
+                max_attempts=RENDER_QUEUE_MAX_ATTEMPTS,
+                next_run_at=now,
+            )
+            db.add(job)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning("[RENDER_QUEUE] enqueue failed: assessment_id=%s error=%s", assessment_id, e)
+        return None
+    logger.info("[RENDER_QUEUE] enqueued: assessment_id=%s job_id=%s", assessment_id, job.id)
+    _wake_workers()
+    return job
+
+
+def _backoff_seconds(attempts: int) -> float:
+    return min(RENDER_QUEUE_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0)), RENDER_QUEUE_BACKOFF_MAX_SECONDS)
+
+
+def _reclaim_expired(db: Session, now: datetime) -> None:
+    """租约过期的 running 任务：次数用尽进死信，否则重新入队"""
+    expired = now - timedelta(seconds=RENDER_QUEUE_LEASE_SECONDS)
+    stale = db.query(RenderJob).filter(RenderJob.status == "running", RenderJob.locked_at < expired)
+    stale.filter(RenderJob.attempts >= RenderJob.max_attempts).update(
+        {"status": "dead", "locked_at": None, "last_error": "lease expired"},
+        synchronize_session=False,
+    )
+    stale.filter(RenderJob.attempts < RenderJob.max_attempts).update(
+        {"status": "queued", "locked_at": None, "next_run_at": now, "last_error": "lease expired"},
+        synchronize_session=False,
+    )
+
+
+def claim_next_job(db: Session) -> Optional[int]:
+    """领取一个到期任务，返回 job id（没有可领取的任务时返回 None）"""
+    now = datetime.utcnow()
+    _reclaim_expired(db, now)
+    db.commit()
+
+    candidates = db.query(RenderJob.id).filter(
+        RenderJob.status == "queued",
+        RenderJob.next_run_at <= now,
+    ).order_by(RenderJob.next_run_at, RenderJob.id).limit(8).all()
+
+    for (job_id,) in candidates:
+        claimed = db.query(RenderJob).filter(
+            RenderJob.id == job_id,
+            RenderJob.status == "queued",
+        ).update(
+            {"status": "running", "locked_at": now, "attempts": RenderJob.attempts + 1},
+            synchronize_session=False,
+        )
+        db.commit()
+        if claimed:
+            return job_id
+    return None
+
+
+def _prepare_job(job_id: int) -> Tuple[Optional[str], Optional[Dict[str, Any]], Optional[str]]:
+    """
+    组装报告数据并计算内容哈希
+    返回 (assessment_id, report_data, digest)；report_data 为 None 表示无需渲染（已缓存 / 已不可下载）
+    """
+    db = SessionLocal()
+    try:
+        job = db.query(RenderJob).filter(RenderJob.id == job_id).first()
+        if job is None:
+            return None, None, None
+        assessment = db.query(Assessment).filter(Assessment.assessment_id == job.assessment_id).first()
+        if assessment is None:
+            raise _PermanentJobError("assessment not found")
+        if (assessment.unlocked_tier or "none").strip().lower() == "none":
+            # 入队后被退款：无需渲染
+            return job.assessment_id, None, None
+        payload = load_assessment_payload_sync(assessment)
+        if not payload or not payload.get("result_data") or not payload.get("decision_summary_data"):
+            raise _PermanentJobError("assessment result data incomplete")
+        try:
+            report_data = build_report_data(assessment, payload)
+        except Exception as e:
+            raise _PermanentJobError(f"build_report_data failed: {e}")
+        digest = report_digest(report_data)
+        if has_rendered_pdf(db, job.assessment_id, digest):
+            return job.assessment_id, None, digest
+        return job.assessment_id, report_data, digest
+    finally:
+        db.close()
+
+
+def _finish_job(job_id: int, assessment_id: Optional[str], digest: Optional[str], pdf_bytes: Optional[bytes]) -> None:
+    """标记完成；有新渲染的 PDF 时与任务状态在同一事务中写入 rendered_reports（覆盖旧版本）"""
+    db = SessionLocal()
+    try:
+        if pdf_bytes is not None:
+            db.merge(RenderedReport(assessment_id=assessment_id, digest=digest, pdf=pdf_bytes))
+        db.query(RenderJob).filter(RenderJob.id == job_id).update(
+            {"status": "done", "digest": digest, "locked_at": None, "last_error": None},
+            synchronize_session=False,
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _fail_job(job_id: int, error: str, permanent: bool = False, consume_attempt: bool = True) -> str:
+    """记录失败：可重试则退避后重新入队，否则进入死信。返回新状态"""
+    db = SessionLocal()
+    try:
+        job = db.query(RenderJob).filter(RenderJob.id == job_id).first()
+        if job is None:
+            return "missing"
+        now = datetime.utcnow()
+        job.last_error = error[:2000]
+        job.locked_at = None
+        if not consume_attempt:
+            job.attempts = max(job.attempts - 1, 0)
+            job.status = "queued"
+            job.next_run_at = now + timedelta(seconds=RENDER_QUEUE_SATURATED_DELAY_SECONDS)
+        elif permanent or job.attempts >= job.max_attempts:
+            job.status = "dead"
+        else:
+            job.status = "queued"
+            job.next_run_at = now + timedelta(seconds=_backoff_seconds(job.attempts))
+        db.commit()
+        return job.status
+    finally:
+        db.close()
+
+
+async def process_job(job_id: int) -> None:
+    """执行一个已领取的任务"""
+    pdf_bytes = None
+    try:
+        assessment_id, report_data, digest = await run_in_threadpool(_prepare_job, job_id)
+        if report_data is not None:
+            pdf_bytes = await render_pdf(report_data)
+            await run_in_threadpool(store_pdf, assessment_id, digest, pdf_bytes)
+    except PdfPoolSaturated:
+        await run_in_threadpool(_fail_job, job_id, "pdf pool saturated", False, False)
+        return
+    except _PermanentJobError as e:
+        status = await run_in_threadpool(_fail_job, job_id, str(e), True)
+        logger.error("[RENDER_QUEUE] job failed: job_id=%s status=%s error=%s", job_id, status, e)
+        return
+    except Exception as e:
+        status = await run_in_threadpool(_fail_job, job_id, f"{type(e).__name__}: {e}")
+        logger.warning("[RENDER_QUEUE] job failed: job_id=%s status=%s error=%s", job_id, status, e)
+        return
+    await run_in_threadpool(_finish_job, job_id, assessment_id, digest, pdf_bytes)
+    logger.info("[RENDER_QUEUE] job done: job_id=%s assessment_id=%s", job_id, assessment_id)
+
+
+def delete_finished_jobs(db: Session, now: Optional[datetime] = None) -> int:
+    """删除超过保留期的 done / dead 任务，返回删除行数"""
+    now = now or datetime.utcnow()
+    deleted = 0
+    for status, days in (("done", RENDER_QUEUE_RETENTION_DAYS), ("dead", RENDER_QUEUE_DEAD_RETENTION_DAYS)):
+        deleted += db.query(RenderJob).filter(
+            RenderJob.status == status,
+            RenderJob.updated_at < now - timedelta(days=days),
+        ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def _cleanup_with_session() -> None:
+    db = SessionLocal()
+    try:
+        deleted = delete_finished_jobs(db)
+    finally:
+        db.close()
+    if deleted:
+        logger.info("[RENDER_QUEUE] deleted %s finished jobs past retention", deleted)
+
+
+def _claim_with_session() -> Optional[int]:
+    db = SessionLocal()
+    try:
+        return claim_next_job(db)
+    finally:
+        db.close()
+
+
+async def _worker_loop(stop: asyncio.Event, wake: asyncio.Event) -> None:
+    global _next_cleanup
+    while not stop.is_set():
+        if time.monotonic() >= _next_cleanup:
+            _next_cleanup = time.monotonic() + _CLEANUP_INTERVAL_SECONDS
+            try:
+                await run_in_threadpool(_cleanup_with_session)
+            except Exception as e:
+                logger.warning("[RENDER_QUEUE] cleanup failed: %s", e)
+        try:
+            job_id = await run_in_threadpool(_claim_with_session)
+        except Exception as e:
+            logger.warning("[RENDER_QUEUE] claim failed: %s", e)
+            job_id = None
+
+        if job_id is not None:
+            await process_job(job_id)
+            continue
+
+        # 没有到期任务：等到入队唤醒或轮询间隔
+        wake.clear()
+        try:
+            await asyncio.wait_for(wake.wait(), RENDER_QUEUE_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_render_workers() -> None:
+    """在当前事件循环中启动后台 worker（应用 startup 时调用）"""
+    global _wake_event, _wake_loop, _stop_event
+    if RENDER_QUEUE_WORKERS <= 0 or not PDF_CACHE_DIR or _worker_tasks:
+        return
+    _wake_loop = asyncio.get_running_loop()
+    _wake_event = asyncio.Event()
+    _stop_event = asyncio.Event()
+    for _ in range(RENDER_QUEUE_WORKERS):
+        _worker_tasks.append(asyncio.create_task(_worker_loop(_stop_event, _wake_event)))
+
+
+async def stop_render_workers() -> None:
+    """停止后台 worker（运行中的任务会被取消，租约过期后由其他 worker 重新领取）"""
+    global _wake_event, _wake_loop, _stop_event
+    if _stop_event is not None:
+        _stop_event.set()
+    for task in _worker_tasks:
+        task.cancel()
+    await asyncio.gather(*_worker_tasks, return_exceptions=True)
+    _worker_tasks.clear()
+    _wake_event = _wake_loop = _stop_event = None
+
+
+def get_latest_job(db: Session, assessment_id: str) -> Optional[RenderJob]:
+    return db.query(RenderJob).filter(
+        RenderJob.assessment_id == assessment_id
+    ).order_by(RenderJob.id.desc()).first()
+
+
+def get_rendered_report_info(db: Session, assessment_id: str) -> Optional[Tuple[str, datetime]]:
+    """共享表中该评估最新 PDF 的 (digest, created_at)（不读取 PDF 内容）；任务记录过了保留期时用于状态查询"""
+    row = db.query(RenderedReport.digest, RenderedReport.created_at).filter(
+        RenderedReport.assessment_id == assessment_id
+    ).first()
+    return (row[0], row[1]) if row else None
+
+
+def has_rendered_pdf(db: Session, assessment_id: str, digest: str) -> bool:
+    """共享表中是否已有该内容哈希的 PDF（不读取 PDF 内容）"""
+    return db.query(RenderedReport.assessment_id).filter(
+        RenderedReport.assessment_id == assessment_id,
+        RenderedReport.digest == digest,
+    ).first() is not None
+
+
+def load_rendered_pdf(db: Session, assessment_id: str, digest: str) -> Optional[bytes]:
+    """从共享表读取预渲染的 PDF（内容哈希不一致时返回 None）"""
+    row = db.query(RenderedReport.pdf).filter(
+        RenderedReport.assessment_id == assessment_id,
+        RenderedReport.digest == digest,
+    ).first()
+    return row[0] if row else None
+
+
+def requeue_job(db: Session, job_id: int) -> Optional[RenderJob]:
+    """人工重试死信任务（重置次数）"""
+    job = db.query(RenderJob).filter(RenderJob.id == job_id).first()
+    if job is None:
+        return None
+    job.status = "queued"
+    job.attempts = 0
+    job.locked_at = None
+    job.next_run_at = datetime.utcnow()
+    db.commit()
+    _wake_workers()
+    return job
+
+
+def render_queue_stats() -> Dict[str, Any]:
+    """各状态任务数（/metrics 使用）"""
+    db = SessionLocal()
+    try:
+        rows = db.query(RenderJob.status, func.count(RenderJob.id)).group_by(RenderJob.status).all()
+    finally:
+        db.close()
+    counts = {status: 0 for status in ("queued", "running", "done", "dead")}
+    counts.update({status: count for status, count in rows})
+    return {"workers": len(_worker_tasks), "jobs": counts}
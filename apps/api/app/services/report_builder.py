@@ -4,13 +4,13 @@ PDF 报告数据组装器
 不关心权限判断（由调用方负责）
 """
 
-from typing import Dict, Any, Literal
+from typing import Dict, Any, Literal, Optional
 from app.models import Assessment
 
 PaywallTier = Literal["none", "basic_15", "expert_39"]
 
 
-def build_report_data(assessment: Assessment) -> Dict[str, Any]:
+def build_report_data(assessment: Assessment, payload: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """
     从数据库读取已保存的评估结果，组装 PDF 报告数据
     
@@ -18,18 +18,20 @@ def build_report_data(assessment: Assessment) -> Dict[str, Any]:
     权限校验必须在调用方完成
     
     Args:
-        assessment: Assessment 模型实例（必须包含 result_data, decision_summary_data, input_data）
+        assessment: Assessment 模型实例
+        payload: 还原后的评估数据（assessment_store.load_assessment_payload：result_data, decision_summary_data, input_data）
     
     Returns:
         报告数据字典，包含所有需要的内容
     """
-    if not assessment.result_data or not assessment.decision_summary_data:
+    payload = payload or {}
+    if not payload.get("result_data") or not payload.get("decision_summary_data"):
         raise ValueError("Assessment 缺少评估结果数据，无法生成 PDF")
     
     # 从数据库读取已保存的数据
-    result_data = assessment.result_data or {}
-    decision_summary_data = assessment.decision_summary_data or {}
-    input_data = assessment.input_data or {}
+    result_data = payload.get("result_data") or {}
+    decision_summary_data = payload.get("decision_summary_data") or {}
+    input_data = payload.get("input_data") or {}
     unlocked_tier = (assessment.unlocked_tier or "none").strip().lower()
     
     # 组装报告数据
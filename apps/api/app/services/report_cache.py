@@ -0,0 +1,177 @@
+"""
+PDF 报告磁盘缓存（内容寻址）
+缓存键 = report_data（由 result_data / decision_summary_data / input_data / unlocked_tier /
+assessment_id / created_at 组装）的规范化 JSON + 模板版本 的 sha256，同时作为 ETag。
+
+存储：<PDF_CACHE_DIR>/<assessment_id>/<digest>.pdf
+- 命中时刷新 mtime，超过 PDF_CACHE_MAX_BYTES 按 mtime 从旧到新淘汰（LRU）
+- 总大小在进程内累计（写入 / 删除时增减），只在超过上限或距上次扫描超过
+  PDF_CACHE_RESCAN_SECONDS 时才遍历整个目录（校正其他进程写入造成的偏差）；
+  淘汰时降到上限的 90%，之后的若干次写入不必再扫描
+- tier 升级 / 退款 / 重新评估时按 assessment_id 整目录删除
+PDF_CACHE_DIR 设为空字符串可关闭缓存。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from . import pdf_report, report_builder
+
+logger = logging.getLogger(__name__)
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ibercomply_pdf_cache"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+PDF_CACHE_RESCAN_SECONDS = float(os.getenv("PDF_CACHE_RESCAN_SECONDS", "300"))
+
+_SAFE_ID = re.compile(r"[^A-Za-z0-9_.-]")
+_lock = threading.Lock()
+# 淘汰后的目标大小（占上限的比例）
+_EVICT_TARGET_RATIO = 0.9
+# 缓存总大小（字节）；None 表示尚未扫描
+_total_bytes: Optional[int] = None
+_last_scan = 0.0
+
+
+def _template_version() -> str:
+    """PDF 模板版本：渲染代码 + 数据组装代码 + 实际使用的字体"""
+    h = hashlib.sha256()
+    for module in (pdf_report, report_builder):
+        h.update(Path(module.__file__).read_bytes())
+    h.update(pdf_report._get_chinese_font_name().encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+TEMPLATE_VERSION = _template_version()
+
+
+def report_digest(report_data: Dict[str, Any]) -> str:
+    """report_data 的内容哈希（用作缓存键与 ETag）"""
+    canonical = json.dumps(
+        report_data, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(f"{TEMPLATE_VERSION}:{canonical}".encode("utf-8")).hexdigest()
+
+
+def _assessment_dir(assessment_id: str) -> Optional[Path]:
+    if not PDF_CACHE_DIR:
+        return None
+    return Path(PDF_CACHE_DIR) / _SAFE_ID.sub("_", assessment_id)
+
+
+def get_cached_pdf(assessment_id: str, digest: str) -> Optional[bytes]:
+    directory = _assessment_dir(assessment_id)
+    if directory is None:
+        return None
+    path = directory / f"{digest}.pdf"
+    try:
+        data = path.read_bytes()
+        os.utime(path)  # LRU：命中即刷新
+        return data
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning("[PDF_CACHE] read failed: %s", e)
+        return None
+
+
+def has_cached_pdf(assessment_id: str, digest: str) -> bool:
+    """只检查缓存文件是否存在（不读内容、不刷新 mtime），供状态轮询使用"""
+    directory = _assessment_dir(assessment_id)
+    return directory is not None and (directory / f"{digest}.pdf").is_file()
+
+
+def store_pdf(assessment_id: str, digest: str, pdf_bytes: bytes) -> None:
+    directory = _assessment_dir(assessment_id)
+    if directory is None:
+        return
+    path = directory / f"{digest}.pdf"
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        # 先写临时文件再原子替换，避免并发下载读到半个文件
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("[PDF_CACHE] write failed: %s", e)
+        return
+    _record_size_change(len(pdf_bytes) - replaced)
+
+
+def invalidate_report_cache(assessment_id: str) -> None:
+    """删除该评估的全部缓存 PDF（tier 变化 / 重新评估时调用；文件操作，异步代码中经 run_in_threadpool 调用）"""
+    directory = _assessment_dir(assessment_id)
+    if directory is None:
+        return
+    removed = 0
+    for path in directory.glob("*.pdf"):  # 单个评估目录，文件数很少
+        try:
+            removed += path.stat().st_size
+        except OSError:
+            continue
+    shutil.rmtree(directory, ignore_errors=True)
+    if removed:
+        _record_size_change(-removed)
+
+
+def _record_size_change(delta: int) -> None:
+    """累计总大小；超过上限或到了重新扫描时间才遍历目录"""
+    global _total_bytes
+    with _lock:
+        if _total_bytes is not None:
+            _total_bytes = max(_total_bytes + delta, 0)
+        needs_scan = (
+            _total_bytes is None
+            or _total_bytes > PDF_CACHE_MAX_BYTES
+            or time.monotonic() - _last_scan > PDF_CACHE_RESCAN_SECONDS
+        )
+    if needs_scan:
+        _evict_if_needed()
+
+
+def _evict_if_needed() -> None:
+    """扫描目录校正总大小；超过上限时按 mtime 从旧到新删除，直到降到上限的 _EVICT_TARGET_RATIO"""
+    global _total_bytes, _last_scan
+    root = Path(PDF_CACHE_DIR)
+    with _lock:
+        _last_scan = time.monotonic()
+        entries = []
+        total = 0
+        for path in root.glob("*/*.pdf"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        _total_bytes = total
+        if total <= PDF_CACHE_MAX_BYTES:
+            return
+        target = PDF_CACHE_MAX_BYTES * _EVICT_TARGET_RATIO
+        entries.sort()
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except FileNotFoundError:
+                continue
+            try:
+                path.parent.rmdir()  # 目录已空时顺带删除
+            except OSError:
+                pass
+        _total_bytes = total
@@ -0,0 +1,186 @@
+"""
+规则编译器
+启动时把 industry_catalog + signals_catalog 编译成每个行业的不可变执行计划，
+请求路径只做查表（不再逐次构造 set / 查 SIGNAL_DEFS / 新建 Finding）
+
+信号编码：每个行业的信号（允许信号 + 组合条件涉及的信号）分配一个 bit 位，
+请求的 signals 编码成一个整数；组合规则编译为 (required_true_mask, required_false_mask)，
+匹配只需两次按位与。
+"""
+
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from ...schemas.assessment import Finding
+from .industry_catalog import INDUSTRY_BASE, INDUSTRY_TAGS
+from .signals_catalog import SIGNAL_DEFS, INDUSTRY_SIGNALS, INDUSTRY_COMBOS
+
+# 计为 critical 的组合规则（仅 severity == "high" 时生效）
+CRITICAL_COMBO_CODES = frozenset([
+    "COMBO_BRAND_SOURCE", "COMBO_DATA_PROTECTION", "COMBO_SUBCONTRACT_PRL",
+    "COMBO_MUNICIPAL_NOISE", "COMBO_CLIENT_DATA", "COMBO_PLATFORM_LABOR",
+    "COMBO_PLATFORM_LABOR_HIGH", "COMBO_CONSTRUCTION_PRL", "COMBO_LOGISTICS_CUSTOMS",
+    "COMBO_PROF_DATA", "COMBO_EWASTE_TRACE", "COMBO_IMPORT_LABEL",
+])
+
+# 未知行业兜底（与 get_industry_base / get_industry_tags 一致）
+DEFAULT_BASE = 10
+DEFAULT_TAGS: Tuple[str, ...] = ("tax",)
+
+
+@dataclass(frozen=True)
+class CompiledSignal:
+    """编译后的信号规则（Finding 预先构造，所有请求共享）"""
+    key: str
+    points: int
+    critical: bool
+    code: str
+    title: str
+    finding: Finding
+
+
+@dataclass(frozen=True)
+class CompiledCombo:
+    """编译后的组合规则"""
+    signal_keys: Tuple[str, ...]
+    true_mask: int  # 必须为 True 的信号
+    false_mask: int  # 必须为 False/未填写的信号
+    points: int
+    critical: bool
+    finding: Finding
+
+
+@dataclass(frozen=True)
+class IndustryPlan:
+    """单个行业的执行计划"""
+    industry_key: str
+    base: int
+    tags: Tuple[str, ...]
+    signals: Mapping[str, CompiledSignal]  # 允许信号索引（未知/未定义信号不在其中）
+    signal_bits: Mapping[str, int]  # 信号 key -> bit 值（允许信号 + 组合条件信号）
+    combos: Tuple[CompiledCombo, ...]
+
+    def encode(self, signals: Mapping[str, bool]) -> int:
+        """把请求的 signals 编码为该行业的 bitmask"""
+        return encode_signals(self.signal_bits, signals)
+
+
+def build_signal_bits(keys: Iterable[str]) -> Mapping[str, int]:
+    """按首次出现顺序为信号分配 bit 位，返回 key -> bit 值"""
+    bits: Dict[str, int] = {}
+    for key in keys:
+        if key not in bits:
+            bits[key] = 1 << len(bits)
+    return MappingProxyType(bits)
+
+
+def encode_signals(signal_bits: Mapping[str, int], signals: Mapping[str, bool]) -> int:
+    """把 signals 编码为 bitmask（只记录为 True 的已知信号）"""
+    mask = 0
+    for key, value in signals.items():
+        if value:
+            mask |= signal_bits.get(key, 0)
+    return mask
+
+
+def compile_condition(signal_bits: Mapping[str, int], condition: Mapping[str, bool]) -> Tuple[int, int]:
+    """把组合条件 {signal: 期望值} 编译为 (required_true_mask, required_false_mask)"""
+    true_mask = 0
+    false_mask = 0
+    for key, expected in condition.items():
+        if expected:
+            true_mask |= signal_bits[key]
+        else:
+            false_mask |= signal_bits[key]
+    return true_mask, false_mask
+
+
+def combo_matches(signal_mask: int, true_mask: int, false_mask: int) -> bool:
+    """组合条件是否满足：required_true 全部为 1，required_false 全部为 0"""
+    return (signal_mask & true_mask) == true_mask and not (signal_mask & false_mask)
+
+
+def _compile_signal(signal_key: str) -> Optional[CompiledSignal]:
+    signal_def = SIGNAL_DEFS.get(signal_key)
+    if not signal_def:
+        return None
+    return CompiledSignal(
+        key=signal_key,
+        points=signal_def.points,
+        critical=signal_def.critical,
+        code=signal_def.code,
+        title=signal_def.title,
+        finding=Finding(
+            code=signal_def.code,
+            title=signal_def.title,
+            detail=signal_def.detail,
+            severity=signal_def.severity,
+            legal_ref=signal_def.legal_ref,
+            pro_only=signal_def.pro_only,
+        ),
+    )
+
+
+def compile_industry_plan(industry_key: str) -> IndustryPlan:
+    """编译单个行业的执行计划"""
+    key = industry_key.lower()
+
+    signals: Dict[str, CompiledSignal] = {}
+    for signal_key in INDUSTRY_SIGNALS.get(key, []):
+        compiled = _compile_signal(signal_key)
+        if compiled:
+            signals[signal_key] = compiled
+
+    combo_defs = INDUSTRY_COMBOS.get(key, [])
+    signal_bits = build_signal_bits(
+        list(signals) + [signal_key for combo in combo_defs for signal_key in combo.condition]
+    )
+
+    combos: List[CompiledCombo] = []
+    for combo in combo_defs:
+        finding = combo.finding
+        true_mask, false_mask = compile_condition(signal_bits, combo.condition)
+        combos.append(CompiledCombo(
+            signal_keys=tuple(combo.condition.keys()),
+            true_mask=true_mask,
+            false_mask=false_mask,
+            points=combo.points,
+            critical=(
+                finding.code.startswith("COMBO")
+                and finding.severity == "high"
+                and finding.code in CRITICAL_COMBO_CODES
+            ),
+            finding=finding,
+        ))
+
+    return IndustryPlan(
+        industry_key=key,
+        base=INDUSTRY_BASE.get(key, DEFAULT_BASE),
+        tags=tuple(INDUSTRY_TAGS.get(key, DEFAULT_TAGS)),
+        signals=MappingProxyType(signals),
+        signal_bits=signal_bits,
+        combos=tuple(combos),
+    )
+
+
+def _compile_all() -> Mapping[str, IndustryPlan]:
+    keys = set(INDUSTRY_BASE) | set(INDUSTRY_TAGS) | set(INDUSTRY_SIGNALS) | set(INDUSTRY_COMBOS)
+    return MappingProxyType({key: compile_industry_plan(key) for key in sorted(keys)})
+
+
+# 模块导入时编译一次
+INDUSTRY_PLANS: Mapping[str, IndustryPlan] = _compile_all()
+_FALLBACK_PLAN = IndustryPlan(
+    industry_key="",
+    base=DEFAULT_BASE,
+    tags=DEFAULT_TAGS,
+    signals=MappingProxyType({}),
+    signal_bits=MappingProxyType({}),
+    combos=(),
+)
+
+
+def get_industry_plan(industry_key: str) -> IndustryPlan:
+    """获取行业执行计划（未知行业返回兜底计划：base=10, tags=["tax"], 无信号/组合）"""
+    return INDUSTRY_PLANS.get(industry_key.lower(), _FALLBACK_PLAN)
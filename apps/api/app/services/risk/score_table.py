@@ -0,0 +1,203 @@
+"""
+行业分数查找表（导入时由 risk_engine 生成一次）
+assess_risk_v3 的分数只取决于：行业、stage、收入分档、是否有雇员、是否有 POS、信号 bitmask。
+每个行业的信号不超过 8 个，整个输入空间可以穷举：
+
+    score[((band_row * 2 + has_employees) * 2 + has_pos) << n_bits | signal_mask]
+
+band_row 为 (stage, 收入分档) 的全局行号。分数以 uint8 存为 bytes；按 mask 预先算好
+带上限的信号分、组合加成与组合命中位（modules / combo_hits 也直接查表）。
+信号位数超过 RISK_SCORE_TABLE_MAX_BITS 的行业不建表，查表返回 None，由调用方走规则引擎。
+"""
+
+import os
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .rule_plan import IndustryPlan
+
+RISK_SCORE_TABLE_MAX_BITS = int(os.getenv("RISK_SCORE_TABLE_MAX_BITS", "12"))
+
+
+def income_band_labels(table: Sequence[Tuple[int, int]]) -> Tuple[str, ...]:
+    """每个分档下标对应的 band label（与 calc_income_score 一致；下标 len(table) 为超过最大阈值）"""
+    labels: List[str] = []
+    prev_threshold = 0
+    for threshold, _ in table:
+        if threshold >= 10**9:
+            labels.append(f"≥€{prev_threshold:.0f}")
+        else:
+            labels.append(f"€{prev_threshold:.0f}–€{threshold - 1:.0f}")
+        prev_threshold = threshold
+    labels.append(f"≥€{prev_threshold:.0f}")
+    return tuple(labels)
+
+
+@dataclass(frozen=True)
+class _StageBands:
+    thresholds: Tuple[float, ...]
+    points: Tuple[int, ...]  # 按分档下标
+    labels: Tuple[str, ...]
+    row_offset: int  # 该 stage 分档下标 0 在全局行号中的位置
+
+
+@dataclass(frozen=True)
+class _IndustryTable:
+    n_bits: int
+    scores: bytes
+    signal_points: Tuple[int, ...]  # [mask]
+    combo_points: Tuple[int, ...]  # [mask]
+    combo_hits: Tuple[Tuple[bool, ...], ...]  # [mask]，与 plan.combos 一一对应
+
+
+ScoreLookup = Tuple[int, Dict[str, int], Tuple[bool, ...], str]
+
+
+def _mask_points(plan: IndustryPlan, signals_cap: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """按 mask 下标的 (带上限的信号分 [M], 组合加成 [M], 组合命中 [C, M])，M = 2^n_bits"""
+    masks = np.arange(1 << len(plan.signal_bits), dtype=np.int64)
+    signal_points = np.zeros(len(masks), dtype=np.int64)
+    for key, rule in plan.signals.items():
+        signal_points += np.where(masks & plan.signal_bits[key], rule.points, 0)
+    signal_points = np.minimum(signal_points, signals_cap)
+    hits = np.array(
+        [((masks & combo.true_mask) == combo.true_mask) & ((masks & combo.false_mask) == 0) for combo in plan.combos],
+        dtype=bool,
+    ).reshape(len(plan.combos), len(masks))
+    combo_points = np.array([combo.points for combo in plan.combos], dtype=np.int64) @ hits
+    return signal_points, combo_points, hits
+
+
+class ScoreTable:
+    def __init__(
+        self,
+        plans: Iterable[IndustryPlan],
+        income_by_stage: Mapping[str, Sequence[Tuple[int, int]]],
+        default_stage: str,
+        signals_cap: int,
+        employee_points: int,
+        pos_points: int,
+        max_bits: int = RISK_SCORE_TABLE_MAX_BITS,
+    ):
+        self._signals_cap = signals_cap
+        self._employee_points = employee_points
+        self._pos_points = pos_points
+        self._stages: Dict[str, _StageBands] = {}
+        band_points: List[int] = []
+        for stage, table in income_by_stage.items():
+            # 分档下标 i = bisect_right(thresholds, income)：i < len 取第 i 档，超过最大阈值取最后一档
+            points = [score for _, score in table] + [table[-1][1]]
+            self._stages[stage] = _StageBands(
+                thresholds=tuple(float(threshold) for threshold, _ in table),
+                points=tuple(points),
+                labels=income_band_labels(table),
+                row_offset=len(band_points),
+            )
+            band_points.extend(points)
+        self._default_stage = self._stages[default_stage]
+
+        row_points = np.array(band_points, dtype=np.int64)
+        flags = np.array([[0, 0], [0, pos_points], [employee_points, 0], [employee_points, pos_points]]).sum(axis=1)
+        self._tables: Dict[str, _IndustryTable] = {}
+        self.fallback_industries: List[str] = []
+        for plan in plans:
+            n_bits = len(plan.signal_bits)
+            if n_bits > max_bits:
+                self.fallback_industries.append(plan.industry_key)
+                continue
+            signal_points, combo_points, hits = _mask_points(plan, signals_cap)
+            # [row, employees*2+pos, mask]
+            scores = (
+                plan.base
+                + row_points[:, None, None]
+                + flags[None, :, None]
+                + (signal_points + combo_points)[None, None, :]
+            )
+            self._tables[plan.industry_key] = _IndustryTable(
+                n_bits=n_bits,
+                scores=np.clip(scores, 0, 100).astype(np.uint8).tobytes(),
+                signal_points=tuple(signal_points.tolist()),
+                combo_points=tuple(combo_points.tolist()),
+                combo_hits=tuple(tuple(column) for column in hits.T.tolist()),
+            )
+        self.lookups = 0
+        self.fallbacks = 0
+
+    def lookup(
+        self,
+        plan: IndustryPlan,
+        stage: str,
+        monthly_income: Optional[float],
+        employee_count: int,
+        has_pos: bool,
+        signal_mask: int,
+    ) -> Optional[ScoreLookup]:
+        """返回 (score, modules, combo_hits, income_band)；行业未建表时返回 None"""
+        table = self._tables.get(plan.industry_key)
+        if table is None:
+            self.fallbacks += 1
+            return None
+        self.lookups += 1
+        bands, band = self._band(stage, monthly_income)
+        has_employees = employee_count > 0
+        index = ((((bands.row_offset + band) * 2 + has_employees) * 2 + bool(has_pos)) << table.n_bits) | signal_mask
+        modules = {
+            "base": plan.base,
+            "signals": table.signal_points[signal_mask],
+            "combo": table.combo_points[signal_mask],
+            "income": bands.points[band],
+            "employees": self._employee_points if has_employees else 0,
+            "pos": self._pos_points if has_pos else 0,
+        }
+        return table.scores[index], modules, table.combo_hits[signal_mask], bands.labels[band]
+
+    def mask_scores(
+        self,
+        plan: IndustryPlan,
+        stage: str,
+        monthly_income: Optional[float],
+        employee_count: int,
+        has_pos: bool,
+    ) -> bytes:
+        """
+        固定 stage / 收入 / 雇员 / POS 时，该行业全部信号 bitmask 的分数（按 mask 下标，长度 2^n_bits）
+        已建表的行业直接切出表中一行；未建表的行业按同一公式现算这一行。
+        """
+        bands, band = self._band(stage, monthly_income)
+        has_employees = employee_count > 0
+        table = self._tables.get(plan.industry_key)
+        if table is not None:
+            start = (((bands.row_offset + band) * 2 + has_employees) * 2 + bool(has_pos)) << table.n_bits
+            return table.scores[start:start + (1 << table.n_bits)]
+        signal_points, combo_points, _ = _mask_points(plan, self._signals_cap)
+        context = (
+            plan.base
+            + bands.points[band]
+            + (self._employee_points if has_employees else 0)
+            + (self._pos_points if has_pos else 0)
+        )
+        return np.clip(context + signal_points + combo_points, 0, 100).astype(np.uint8).tobytes()
+
+    def next_band_income(self, stage: str, monthly_income: Optional[float]) -> Optional[float]:
+        """下一收入分档的起始金额；已在最高档（下一档只剩哨兵阈值 10**9）时返回 None"""
+        bands, band = self._band(stage, monthly_income)
+        if band >= len(bands.thresholds) or bands.thresholds[band] >= 10**9:
+            return None
+        return bands.thresholds[band]
+
+    def _band(self, stage: str, monthly_income: Optional[float]) -> Tuple[_StageBands, int]:
+        bands = self._stages.get((stage or "").upper().strip(), self._default_stage)
+        income = 0.0 if not monthly_income or monthly_income < 0 else float(monthly_income)
+        return bands, bisect_right(bands.thresholds, income)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "industries": len(self._tables),
+            "fallback_industries": len(self.fallback_industries),
+            "entries": sum(len(table.scores) for table in self._tables.values()),
+            "lookups": self.lookups,
+            "fallbacks": self.fallbacks,
+        }
@@ -0,0 +1,267 @@
+"""
+批量风险评估（NumPy 向量化计分内核）
+与 assess_risk_v3 使用同一套编译规则（risk.rule_plan），一次性为 N 条请求计算：
+基础分、带上限的信号分、组合加成、收入分档（searchsorted）、雇员/POS 上限、风险等级。
+findings / meta 仍由 build_v3_result 逐条组装，保证与单条评估结果一致。
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from ..schemas.assessment import Finding, RiskAssessmentRequest
+from .risk.rule_plan import INDUSTRY_PLANS, get_industry_plan
+from .risk.score_table import income_band_labels
+from .risk_engine import (
+    INCOME_SCORE_BY_STAGE,
+    SIGNALS_POINTS_CAP,
+    EMP_POINTS_CAP,
+    POS_POINTS_CAP,
+    build_v3_result,
+)
+
+# 风险等级阈值（与 score_to_level 一致）：[40, 60, 80) -> green/yellow/orange/red
+LEVEL_THRESHOLDS = np.array([40, 60, 80])
+LEVELS = ("green", "yellow", "orange", "red")
+
+STAGES = ("PRE_AUTONOMO", "AUTONOMO", "SL")
+_STAGE_ROWS = {stage: i for i, stage in enumerate(STAGES)}
+_DEFAULT_STAGE_ROW = _STAGE_ROWS["AUTONOMO"]  # 未知阶段按 AUTONOMO 计分
+
+
+@dataclass(frozen=True)
+class _KernelTables:
+    """由行业执行计划展开的稠密矩阵（导入时构建一次）"""
+    industry_index: Dict[str, int]  # 行业 key -> 行；最后一行为未知行业兜底
+    signal_index: Dict[str, int]  # 信号 key -> 列
+    base: np.ndarray  # [I]
+    signal_points: np.ndarray  # [I, S]，未允许的信号为 0
+    combo_industry: np.ndarray  # [C]
+    combo_true: np.ndarray  # [C, S]
+    combo_false: np.ndarray  # [C, S]
+    combo_true_count: np.ndarray  # [C]
+    combo_points: np.ndarray  # [C]
+    combo_offsets: np.ndarray  # [I]，行业组合在 C 维上的起始列
+    income_thresholds: Tuple[np.ndarray, ...]  # 按 STAGES 顺序
+    income_scores: Tuple[np.ndarray, ...]
+    income_labels: Tuple[Tuple[str, ...], ...]
+
+
+def _build_tables() -> _KernelTables:
+    industries = list(INDUSTRY_PLANS)
+    industry_index = {key: i for i, key in enumerate(industries)}
+    fallback_row = len(industries)
+
+    signal_index: Dict[str, int] = {}
+    for plan in INDUSTRY_PLANS.values():
+        for key in plan.signal_bits:
+            signal_index.setdefault(key, len(signal_index))
+
+    n_industries = len(industries) + 1
+    n_signals = len(signal_index)
+    base = np.full(n_industries, get_industry_plan("").base, dtype=np.int64)
+    signal_points = np.zeros((n_industries, n_signals), dtype=np.int64)
+
+    combo_industry: List[int] = []
+    combo_rows_true: List[np.ndarray] = []
+    combo_rows_false: List[np.ndarray] = []
+    combo_points: List[int] = []
+    combo_offsets = np.zeros(n_industries, dtype=np.int64)
+
+    for row, key in enumerate(industries):
+        plan = INDUSTRY_PLANS[key]
+        base[row] = plan.base
+        for signal_key, rule in plan.signals.items():
+            signal_points[row, signal_index[signal_key]] = rule.points
+
+        combo_offsets[row] = len(combo_points)
+        bit_to_col = {bit: signal_index[signal_key] for signal_key, bit in plan.signal_bits.items()}
+        for combo in plan.combos:
+            true_row = np.zeros(n_signals, dtype=np.int64)
+            false_row = np.zeros(n_signals, dtype=np.int64)
+            for bit, col in bit_to_col.items():
+                if combo.true_mask & bit:
+                    true_row[col] = 1
+                if combo.false_mask & bit:
+                    false_row[col] = 1
+            combo_industry.append(row)
+            combo_rows_true.append(true_row)
+            combo_rows_false.append(false_row)
+            combo_points.append(combo.points)
+    combo_offsets[fallback_row] = len(combo_points)
+
+    combo_true = np.array(combo_rows_true, dtype=np.int64).reshape(-1, n_signals)
+    combo_false = np.array(combo_rows_false, dtype=np.int64).reshape(-1, n_signals)
+
+    return _KernelTables(
+        industry_index=industry_index,
+        signal_index=signal_index,
+        base=base,
+        signal_points=signal_points,
+        combo_industry=np.array(combo_industry, dtype=np.int64),
+        combo_true=combo_true,
+        combo_false=combo_false,
+        combo_true_count=combo_true.sum(axis=1),
+        combo_points=np.array(combo_points, dtype=np.int64),
+        combo_offsets=combo_offsets,
+        income_thresholds=tuple(np.array([t for t, _ in INCOME_SCORE_BY_STAGE[s]], dtype=np.float64) for s in STAGES),
+        income_scores=tuple(np.array([p for _, p in INCOME_SCORE_BY_STAGE[s]], dtype=np.int64) for s in STAGES),
+        income_labels=tuple(income_band_labels(INCOME_SCORE_BY_STAGE[s]) for s in STAGES),
+    )
+
+
+_TABLES = _build_tables()
+
+
+@dataclass(frozen=True)
+class BatchScores:
+    """批量计分结果（每个数组长度为 N，顺序与输入一致）"""
+    score: np.ndarray
+    level: np.ndarray  # LEVELS 下标
+    base: np.ndarray
+    signals: np.ndarray
+    combo: np.ndarray
+    income: np.ndarray
+    income_band: List[str]
+    employees: np.ndarray
+    pos: np.ndarray
+    combo_hits: np.ndarray  # [N, C] bool
+    stage_row: np.ndarray  # STAGES 下标（未知阶段按 AUTONOMO）
+
+    def modules(self, i: int) -> Dict[str, int]:
+        return {
+            "base": int(self.base[i]),
+            "signals": int(self.signals[i]),
+            "combo": int(self.combo[i]),
+            "income": int(self.income[i]),
+            "employees": int(self.employees[i]),
+            "pos": int(self.pos[i]),
+        }
+
+
+def score_batch(requests: Sequence[RiskAssessmentRequest]) -> BatchScores:
+    """一次向量化计算 N 条请求的分数与等级"""
+    t = _TABLES
+    n = len(requests)
+    fallback_row = len(t.industry_index)
+
+    industry_index = t.industry_index
+    signal_index = t.signal_index
+    industry_rows = np.fromiter(
+        (industry_index.get(request.industry.lower(), fallback_row) for request in requests),
+        dtype=np.int64, count=n,
+    )
+    stage_rows = np.fromiter(
+        (_STAGE_ROWS.get((request.stage or "").upper().strip(), _DEFAULT_STAGE_ROW) for request in requests),
+        dtype=np.int64, count=n,
+    )
+    income = np.fromiter(
+        (0.0 if not request.monthly_income or request.monthly_income < 0 else request.monthly_income
+         for request in requests),
+        dtype=np.float64, count=n,
+    )
+    employee_count = np.fromiter((request.employee_count for request in requests), dtype=np.int64, count=n)
+    has_pos = np.fromiter((request.has_pos for request in requests), dtype=bool, count=n)
+
+    # 只收集为 True 的已知信号坐标，再一次性写入矩阵
+    hit_rows: List[int] = []
+    hit_cols: List[int] = []
+    for i, request in enumerate(requests):
+        for key, value in request.signals.items():
+            if value:
+                col = signal_index.get(key)
+                if col is not None:
+                    hit_rows.append(i)
+                    hit_cols.append(col)
+    signals = np.zeros((n, len(signal_index)), dtype=np.int64)
+    signals[hit_rows, hit_cols] = 1
+
+    # 基础分
+    base = t.base[industry_rows]
+
+    # 信号分（只计该行业允许的信号），带上限
+    signal_points = np.minimum((signals * t.signal_points[industry_rows]).sum(axis=1), SIGNALS_POINTS_CAP)
+
+    # 组合：required_true 全部命中、required_false 全部未命中，且属于该行业
+    combo_hits = (
+        ((signals @ t.combo_true.T) == t.combo_true_count)
+        & ((signals @ t.combo_false.T) == 0)
+        & (t.combo_industry[None, :] == industry_rows[:, None])
+    )
+    combo_points = combo_hits @ t.combo_points
+
+    # 收入分档：第一个 threshold > income 的档位
+    income_points = np.empty(n, dtype=np.int64)
+    band_index = np.empty(n, dtype=np.int64)
+    for s in range(len(STAGES)):
+        selected = stage_rows == s
+        if not selected.any():
+            continue
+        idx = np.searchsorted(t.income_thresholds[s], income[selected], side="right")
+        band_index[selected] = idx
+        income_points[selected] = t.income_scores[s][np.minimum(idx, len(t.income_scores[s]) - 1)]
+    income_band = [t.income_labels[stage_rows[i]][band_index[i]] for i in range(n)]
+
+    # 雇员 / POS（带上限）
+    employees = np.minimum(np.where(employee_count > 0, 18, 0), EMP_POINTS_CAP)
+    pos = np.minimum(np.where(has_pos, 10, 0), POS_POINTS_CAP)
+
+    score = np.clip(base + signal_points + combo_points + income_points + employees + pos, 0, 100)
+    level = np.searchsorted(LEVEL_THRESHOLDS, score, side="right")
+
+    return BatchScores(
+        score=score,
+        level=level,
+        base=base,
+        signals=signal_points,
+        combo=combo_points,
+        income=income_points,
+        income_band=income_band,
+        employees=employees,
+        pos=pos,
+        combo_hits=combo_hits,
+        stage_row=stage_rows,
+    )
+
+
+def assess_risk_v3_batch(
+    requests: Sequence[RiskAssessmentRequest],
+) -> List[Tuple[int, str, List[Finding], Dict[str, Any]]]:
+    """
+    批量版 assess_risk_v3：向量化计分后逐条组装 findings / meta
+    返回顺序与输入一致，每项与 assess_risk_v3(request) 的结果相同
+    """
+    if not requests:
+        return []
+
+    scores = score_batch(requests)
+    # 逐条组装前一次性转成 Python 列表，避免循环内逐个读取 numpy 标量
+    score = scores.score.tolist()
+    level = scores.level.tolist()
+    module_columns = {
+        "base": scores.base.tolist(),
+        "signals": scores.signals.tolist(),
+        "combo": scores.combo.tolist(),
+        "income": scores.income.tolist(),
+        "employees": scores.employees.tolist(),
+        "pos": scores.pos.tolist(),
+    }
+    combo_hits = scores.combo_hits.tolist()
+    fallback_row = len(_TABLES.industry_index)
+    combo_offsets = _TABLES.combo_offsets.tolist()
+
+    results: List[Tuple[int, str, List[Finding], Dict[str, Any]]] = []
+    for i, request in enumerate(requests):
+        plan = get_industry_plan(request.industry)
+        offset = combo_offsets[_TABLES.industry_index.get(plan.industry_key, fallback_row)]
+        results.append(build_v3_result(
+            request,
+            plan,
+            score[i],
+            LEVELS[level[i]],
+            {name: column[i] for name, column in module_columns.items()},
+            combo_hits[i][offset:offset + len(plan.combos)],
+            scores.income_band[i],
+        ))
+    return results
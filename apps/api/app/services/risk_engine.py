@@ -1,9 +1,11 @@
-from typing import Literal, List, Dict, Optional, Tuple, Any
+from typing import Literal, List, Dict, Optional, Tuple, Any, Sequence
 from dataclasses import dataclass
 from ..schemas.assessment import Finding, RiskAssessmentRequest
 from .risk.industry_catalog import INDUSTRY_BASE, INDUSTRY_TAGS, get_industry_base, get_industry_tags
 from .risk.signals_catalog import SIGNAL_DEFS, INDUSTRY_SIGNALS, INDUSTRY_COMBOS
 from .risk.risk_bands import get_risk_band
+from .risk.rule_plan import IndustryPlan, INDUSTRY_PLANS, get_industry_plan, build_signal_bits, encode_signals, compile_condition, combo_matches
+from .risk.score_table import ScoreTable
 
 
 @dataclass
@@ -1003,9 +1005,17 @@ INDUSTRY_PROFILES: Dict[str, IndustryProfile] = {
 }
 
 
-def check_combo_condition(combo: ComboRule, signals: Dict[str, bool]) -> bool:
-    """检查组合条件是否满足"""
-    return all(signals.get(key, False) == value for key, value in combo.condition.items())
+def _compile_v2_combos(profile: IndustryProfile) -> Tuple[Dict[str, int], List[Tuple[int, int, ComboRule]]]:
+    """把 IndustryProfile 的组合规则编译为 bitmask：(signal_bits, [(true_mask, false_mask, combo)])"""
+    signal_bits = build_signal_bits(
+        list(profile.signal_rules) + [key for combo in profile.combo_rules for key in combo.condition]
+    )
+    return signal_bits, [(*compile_condition(signal_bits, combo.condition), combo) for combo in profile.combo_rules]
+
+
+V2_COMBO_MASKS: Dict[str, Tuple[Dict[str, int], List[Tuple[int, int, ComboRule]]]] = {
+    key: _compile_v2_combos(profile) for key, profile in INDUSTRY_PROFILES.items()
+}
 
 
 # 模块化 points 上限（避免全红）
@@ -1035,6 +1045,7 @@ def assess_risk_v2(request: RiskAssessmentRequest) -> Tuple[int, str, List[Findi
     # 获取行业画像
     industry_key = request.industry.lower()
     profile = INDUSTRY_PROFILES.get(industry_key, INDUSTRY_PROFILES["other"])
+    combo_bits, combo_masks = V2_COMBO_MASKS.get(industry_key, V2_COMBO_MASKS["other"])
     
     # 基础分
     score += profile.base
@@ -1057,8 +1068,9 @@ def assess_risk_v2(request: RiskAssessmentRequest) -> Tuple[int, str, List[Findi
     # 组合加成（A3）
     matched_triggers: List[str] = []
     combo_points = 0
-    for combo in profile.combo_rules:
-        if check_combo_condition(combo, request.signals):
+    signal_mask = encode_signals(combo_bits, request.signals)
+    for true_mask, false_mask, combo in combo_masks:
+        if combo_matches(signal_mask, true_mask, false_mask):
             combo_points += combo.points
             findings.append(combo.finding)
             matched_triggers.append(combo.finding.code)
@@ -1191,15 +1203,75 @@ def assess_risk_v2(request: RiskAssessmentRequest) -> Tuple[int, str, List[Findi
     return score, level, findings, meta
 
 
-def check_combo_condition_v3(combo_condition: Dict[str, bool], signals: Dict[str, bool]) -> bool:
-    """检查组合条件是否满足（v3 版本，用于 signals_catalog）"""
-    return all(signals.get(key, False) == value for key, value in combo_condition.items())
+# 收入 finding 阈值（按 stage）：(HIGH 阈值, MEDIUM 阈值)，其余 stage 按 AUTONOMO
+INCOME_FINDING_THRESHOLDS: Dict[str, Tuple[int, int]] = {
+    "PRE_AUTONOMO": (5000, 2000),  # PRE：>=5000 才算 HIGH（对应 14分以上）
+    "AUTONOMO": (3000, 1500),  # AUTONOMO：>=3000 算 HIGH（对应 18分以上）
+    "SL": (7000, 3000),  # SL：>=7000 算 HIGH（对应 24分以上）
+}
+
+# 静态 finding（文案不随请求变化，预先构造并共享）
+POS_TRACEABLE_FINDING = Finding(
+    code="POS_TRACEABLE",
+    title="刷卡流水可追溯性更高",
+    detail="刷卡流水更容易被对账与追溯，建议确保收款与申报/账目长期一致。",
+    severity="medium",
+    pro_only=False
+)
+
+STAGE_FINDINGS: Dict[str, Finding] = {
+    "PRE_AUTONOMO": Finding(
+        code="STAGE_PRE",
+        title="当前阶段：尚未登记经营结构",
+        detail="本阶段风险通常来自：收入形成但票据/对账/申报体系尚未建立。",
+        severity="info",
+        pro_only=False
+    ),
+    "AUTONOMO": Finding(
+        code="STAGE_AUTONOMO",
+        title="当前阶段：已登记为 Autónomo",
+        detail="本阶段风险通常来自：申报一致性、票据链、用工材料与许可项。",
+        severity="info",
+        pro_only=False
+    ),
+    "SL": Finding(
+        code="STAGE_SL",
+        title="当前阶段：已使用 SL 公司结构",
+        detail="本阶段风险通常来自：公司治理、税务申报、雇员合规与合同/数据处理流程。",
+        severity="info",
+        pro_only=False
+    ),
+}
+
+
+def score_to_level(score: int) -> str:
+    """分数 -> 风险等级"""
+    if score >= 80:
+        return "red"
+    if score >= 60:
+        return "orange"
+    if score >= 40:
+        return "yellow"
+    return "green"
+
+
+# 分数查找表：(行业, stage, 收入分档, 有无雇员, 有无 POS, 信号 bitmask) -> score / modules / 组合命中
+# 导入时由执行计划穷举生成（get_industry_plan("") 为未知行业兜底计划）
+SCORE_TABLE = ScoreTable(
+    list(INDUSTRY_PLANS.values()) + [get_industry_plan("")],
+    INCOME_SCORE_BY_STAGE,
+    default_stage="AUTONOMO",
+    signals_cap=SIGNALS_POINTS_CAP,
+    employee_points=min(18, EMP_POINTS_CAP),
+    pos_points=min(10, POS_POINTS_CAP),
+)
 
 
 def assess_risk_v3(request: RiskAssessmentRequest) -> Tuple[int, str, List[Finding], Dict[str, Any]]:
     """
     Risk Engine v3 - 配置驱动版本
     基于 industry_catalog 和 signals_catalog 配置计算风险
+    （配置在启动时由 risk.rule_plan 编译为行业执行计划，这里只做查表）
     
     核心原则：
     - 只输出风险事实，不输出行动建议
@@ -1209,243 +1281,164 @@ def assess_risk_v3(request: RiskAssessmentRequest) -> Tuple[int, str, List[Findi
     返回: (score, level, findings, meta)
     meta 包含：industry_key, base_score, signals_points, matched_triggers, critical_count, tags, modules
     """
-    score = 0
+    # 获取行业 key 和编译好的执行计划
+    industry_key = request.industry.lower()
+    plan = get_industry_plan(industry_key)
+    signal_mask = plan.encode(request.signals)
+
+    # 查表（一次下标计算）；信号位数超限未建表的行业按规则计算
+    scored = SCORE_TABLE.lookup(
+        plan, request.stage, request.monthly_income, request.employee_count, request.has_pos, signal_mask
+    )
+    if scored is None:
+        scored = score_v3_rules(request, plan, signal_mask)
+    score, modules, combo_hits, income_band = scored
+    return build_v3_result(request, plan, score, score_to_level(score), modules, combo_hits, income_band)
+
+
+def score_v3_rules(
+    request: RiskAssessmentRequest,
+    plan: IndustryPlan,
+    signal_mask: int,
+) -> Tuple[int, Dict[str, int], List[bool], str]:
+    """
+    按规则计算 v3 分数（SCORE_TABLE 未覆盖时使用，也是查表结果的对照基准）
+    返回: (score, modules, combo_hits, income_band)
+    """
+    # Signals 触发规则（后端兜底：只处理该行业允许的信号，未知信号忽略），带权重上限
+    signals_points = 0
+    for signal_key, is_triggered in request.signals.items():
+        if is_triggered and signal_key in plan.signals:
+            signals_points += plan.signals[signal_key].points
+    signals_points = min(signals_points, SIGNALS_POINTS_CAP)
+    
+    # 组合加成（signals 编码为 bitmask，每条组合两次按位与）
+    combo_hits = [combo_matches(signal_mask, combo.true_mask, combo.false_mask) for combo in plan.combos]
+    combo_points = sum(combo.points for combo, hit in zip(plan.combos, combo_hits) if hit)
+    
+    # 收入风险评估（使用 stage-aware 分档）
+    income_points, income_band = calc_income_score(request.stage, request.monthly_income)
+    
+    # 雇员 / POS（模块化，带 cap）
+    emp_points = min(18 if request.employee_count > 0 else 0, EMP_POINTS_CAP)
+    pos_points = min(10 if request.has_pos else 0, POS_POINTS_CAP)
+    
+    # 最终得分（clamp 到 0-100）
+    score = plan.base + signals_points + combo_points + income_points + emp_points + pos_points
+    score = max(0, min(score, 100))
+    
+    modules = {
+        "base": plan.base,
+        "signals": signals_points,
+        "combo": combo_points,
+        "income": income_points,
+        "employees": emp_points,
+        "pos": pos_points
+    }
+    return score, modules, combo_hits, income_band
+
+
+def build_v3_result(
+    request: RiskAssessmentRequest,
+    plan: IndustryPlan,
+    score: int,
+    level: str,
+    modules: Dict[str, int],
+    combo_hits: Sequence[bool],
+    income_band: str,
+) -> Tuple[int, str, List[Finding], Dict[str, Any]]:
+    """
+    根据已算好的分数组装 findings 与 meta（单条评估与批量评估共用）
+    modules: base/signals/combo/income/employees/pos 各模块得分
+    combo_hits: 与 plan.combos 一一对应的命中结果
+    """
     findings: List[Finding] = []
     critical_count = 0
     matched_triggers: List[str] = []
     finding_sources: Dict[str, Dict[str, List[str]]] = {}
-    
-    # 获取行业 key
+    breakdown_signals: List[Dict[str, Any]] = []
     industry_key = request.industry.lower()
     
-    # 从配置获取基础分和标签
-    base = get_industry_base(industry_key)
-    tags = get_industry_tags(industry_key)
-    score += base
-    
-    # 获取该行业允许的信号列表（后端兜底：未知信号会被忽略）
-    allowed_signals = set(INDUSTRY_SIGNALS.get(industry_key, []))
-    
-    # Signals 触发规则（从配置动态生成）
-    signals_points = 0
+    # 信号 findings
     for signal_key, is_triggered in request.signals.items():
-        # 后端兜底：只处理该行业允许的信号，未知信号忽略
-        if not is_triggered or signal_key not in allowed_signals:
+        if not is_triggered:
             continue
-        
-        # 从配置获取信号定义
-        signal_def = SIGNAL_DEFS.get(signal_key)
-        if not signal_def:
+        rule = plan.signals.get(signal_key)
+        if rule is None:
             continue
         
-        signals_points += signal_def.points
-        
-        # 动态生成 Finding
-        findings.append(Finding(
-            code=signal_def.code,
-            title=signal_def.title,
-            detail=signal_def.detail,
-            severity=signal_def.severity,
-            legal_ref=signal_def.legal_ref,
-            pro_only=signal_def.pro_only
-        ))
-        finding_sources.setdefault(signal_def.code, {}).setdefault("signal_keys", []).append(signal_key)
+        findings.append(rule.finding)
+        finding_sources.setdefault(rule.code, {}).setdefault("signal_keys", []).append(signal_key)
+        breakdown_signals.append({
+            "code": rule.code,
+            "score": rule.points,
+            "reason": rule.title
+        })
         
-        if signal_def.critical:
+        if rule.critical:
             critical_count += 1
     
-    # Signals 权重上限
-    signals_points = min(signals_points, SIGNALS_POINTS_CAP)
-    score += signals_points
-    
-    # 组合加成（从配置获取）
-    combo_points = 0
-    combos = INDUSTRY_COMBOS.get(industry_key, [])
-    for combo in combos:
-        if check_combo_condition_v3(combo.condition, request.signals):
-            combo_points += combo.points
-            findings.append(combo.finding)
-            matched_triggers.append(combo.finding.code)
-            finding_sources.setdefault(combo.finding.code, {}).setdefault("combo_signals", []).extend(list(combo.condition.keys()))
-            
-            # 检查是否是 critical combo
-            if combo.finding.code.startswith("COMBO") and combo.finding.severity == "high":
-                critical_combo_codes = ["COMBO_BRAND_SOURCE", "COMBO_DATA_PROTECTION", "COMBO_SUBCONTRACT_PRL", 
-                                       "COMBO_MUNICIPAL_NOISE", "COMBO_CLIENT_DATA", "COMBO_PLATFORM_LABOR",
-                                       "COMBO_PLATFORM_LABOR_HIGH", "COMBO_CONSTRUCTION_PRL", "COMBO_LOGISTICS_CUSTOMS",
-                                       "COMBO_PROF_DATA", "COMBO_EWASTE_TRACE", "COMBO_IMPORT_LABEL"]
-                if combo.finding.code in critical_combo_codes:
-                    critical_count += 1
-    
-    score += combo_points
-    
-    # 收入风险评估（使用 stage-aware 分档）
-    income_points, income_band = calc_income_score(request.stage, request.monthly_income)
+    # 组合 findings
+    for combo, hit in zip(plan.combos, combo_hits):
+        if not hit:
+            continue
+        findings.append(combo.finding)
+        matched_triggers.append(combo.finding.code)
+        finding_sources.setdefault(combo.finding.code, {}).setdefault("combo_signals", []).extend(combo.signal_keys)
+        if combo.critical:
+            critical_count += 1
     
     # 根据 stage 和收入金额生成 finding（阈值按 stage 变化）
     income = request.monthly_income or 0
     stage_upper = (request.stage or "").upper().strip()
+    high_threshold, medium_threshold = INCOME_FINDING_THRESHOLDS.get(stage_upper, INCOME_FINDING_THRESHOLDS["AUTONOMO"])
     
-    if stage_upper == "PRE_AUTONOMO":
-        # PRE：>=5000 才算 HIGH（对应 14分以上）
-        if income >= 5000:
-            findings.append(Finding(
-                code="INC_HIGH",
-                title="收入规模偏高",
-                detail=f"月收入约 €{income:.0f}，需要更强的票据与对账体系来解释收入来源。",
-                severity="high",
-                pro_only=False
-            ))
-            finding_sources.setdefault("INC_HIGH", {}).setdefault("signal_keys", []).append("income_high")
-        elif income >= 2000:
-            findings.append(Finding(
-                code="INC_MEDIUM",
-                title="收入规模上升",
-                detail=f"月收入约 €{income:.0f}，建议建立固定记账与收款对账流程。",
-                severity="medium",
-                pro_only=False
-            ))
-            finding_sources.setdefault("INC_MEDIUM", {}).setdefault("signal_keys", []).append("income_medium")
-        elif income > 0:
-            findings.append(Finding(
-                code="INC_LOW",
-                title="收入规模较低",
-                detail=f"月收入约 €{income:.0f}，建议保持基础记录习惯。",
-                severity="low",
-                pro_only=False
-            ))
-            finding_sources.setdefault("INC_LOW", {}).setdefault("signal_keys", []).append("income_low")
-    elif stage_upper == "SL":
-        # SL：>=7000 算 HIGH（对应 24分以上）
-        if income >= 7000:
-            findings.append(Finding(
-                code="INC_HIGH",
-                title="收入规模偏高",
-                detail=f"月收入约 €{income:.0f}，需要更强的票据与对账体系来解释收入来源。",
-                severity="high",
-                pro_only=False
-            ))
-            finding_sources.setdefault("INC_HIGH", {}).setdefault("signal_keys", []).append("income_high")
-        elif income >= 3000:
-            findings.append(Finding(
-                code="INC_MEDIUM",
-                title="收入规模上升",
-                detail=f"月收入约 €{income:.0f}，建议建立固定记账与收款对账流程。",
-                severity="medium",
-                pro_only=False
-            ))
-            finding_sources.setdefault("INC_MEDIUM", {}).setdefault("signal_keys", []).append("income_medium")
-        elif income > 0:
-            findings.append(Finding(
-                code="INC_LOW",
-                title="收入规模较低",
-                detail=f"月收入约 €{income:.0f}，建议保持基础记录习惯。",
-                severity="low",
-                pro_only=False
-            ))
-            finding_sources.setdefault("INC_LOW", {}).setdefault("signal_keys", []).append("income_low")
-    else:
-        # AUTONOMO：>=3000 算 HIGH（对应 18分以上）
-        if income >= 3000:
-            findings.append(Finding(
-                code="INC_HIGH",
-                title="收入规模偏高",
-                detail=f"月收入约 €{income:.0f}，需要更强的票据与对账体系来解释收入来源。",
-                severity="high",
-                pro_only=False
-            ))
-            finding_sources.setdefault("INC_HIGH", {}).setdefault("signal_keys", []).append("income_high")
-        elif income >= 1500:
-            findings.append(Finding(
-                code="INC_MEDIUM",
-                title="收入规模上升",
-                detail=f"月收入约 €{income:.0f}，建议建立固定记账与收款对账流程。",
-                severity="medium",
-                pro_only=False
-            ))
-            finding_sources.setdefault("INC_MEDIUM", {}).setdefault("signal_keys", []).append("income_medium")
-        elif income > 0:
-            findings.append(Finding(
-                code="INC_LOW",
-                title="收入规模较低",
-                detail=f"月收入约 €{income:.0f}，建议保持基础记录习惯。",
-                severity="low",
-                pro_only=False
-            ))
-            finding_sources.setdefault("INC_LOW", {}).setdefault("signal_keys", []).append("income_low")
-    
-    score += income_points
-    
-    # 雇员风险评估（模块化，带 cap，中性描述）
-    emp_points = 0
-    if request.employee_count > 0:
-        emp_points = 18
+    if income >= high_threshold:
         findings.append(Finding(
-            code="EMP_PRESENT",
-            title="存在用工合规点",
-            detail=f"您填写了 {request.employee_count} 名员工/帮工，用工通常涉及合同、社保、工时与PRL等材料准备。",
-            severity="high" if request.employee_count >= 3 else "medium",
+            code="INC_HIGH",
+            title="收入规模偏高",
+            detail=f"月收入约 €{income:.0f}，需要更强的票据与对账体系来解释收入来源。",
+            severity="high",
             pro_only=False
         ))
-        finding_sources.setdefault("EMP_PRESENT", {}).setdefault("signal_keys", []).append("employees")
-    
-    emp_points = min(emp_points, EMP_POINTS_CAP)
-    score += emp_points
-    
-    # POS 风险评估（模块化，带 cap，中性描述）
-    pos_points = 0
-    if request.has_pos:
-        pos_points = 10
+        finding_sources.setdefault("INC_HIGH", {}).setdefault("signal_keys", []).append("income_high")
+    elif income >= medium_threshold:
         findings.append(Finding(
-            code="POS_TRACEABLE",
-            title="刷卡流水可追溯性更高",
-            detail="刷卡流水更容易被对账与追溯，建议确保收款与申报/账目长期一致。",
+            code="INC_MEDIUM",
+            title="收入规模上升",
+            detail=f"月收入约 €{income:.0f}，建议建立固定记账与收款对账流程。",
             severity="medium",
             pro_only=False
         ))
-        finding_sources.setdefault("POS_TRACEABLE", {}).setdefault("signal_keys", []).append("pos_used")
-    
-    pos_points = min(pos_points, POS_POINTS_CAP)
-    score += pos_points
-    
-    # Stage-based 阶段提示 finding（解释性，不包含行动建议）
-    if request.stage == "PRE_AUTONOMO":
+        finding_sources.setdefault("INC_MEDIUM", {}).setdefault("signal_keys", []).append("income_medium")
+    elif income > 0:
         findings.append(Finding(
-            code="STAGE_PRE",
-            title="当前阶段：尚未登记经营结构",
-            detail="本阶段风险通常来自：收入形成但票据/对账/申报体系尚未建立。",
-            severity="info",
+            code="INC_LOW",
+            title="收入规模较低",
+            detail=f"月收入约 €{income:.0f}，建议保持基础记录习惯。",
+            severity="low",
             pro_only=False
         ))
-    elif request.stage == "AUTONOMO":
-        findings.append(Finding(
-            code="STAGE_AUTONOMO",
-            title="当前阶段：已登记为 Autónomo",
-            detail="本阶段风险通常来自：申报一致性、票据链、用工材料与许可项。",
-            severity="info",
-            pro_only=False
-        ))
-    else:  # stage == "SL"
+        finding_sources.setdefault("INC_LOW", {}).setdefault("signal_keys", []).append("income_low")
+    
+    # 雇员 finding
+    if request.employee_count > 0:
         findings.append(Finding(
-            code="STAGE_SL",
-            title="当前阶段：已使用 SL 公司结构",
-            detail="本阶段风险通常来自：公司治理、税务申报、雇员合规与合同/数据处理流程。",
-            severity="info",
+            code="EMP_PRESENT",
+            title="存在用工合规点",
+            detail=f"您填写了 {request.employee_count} 名员工/帮工，用工通常涉及合同、社保、工时与PRL等材料准备。",
+            severity="high" if request.employee_count >= 3 else "medium",
             pro_only=False
         ))
+        finding_sources.setdefault("EMP_PRESENT", {}).setdefault("signal_keys", []).append("employees")
     
-    # 最终得分（clamp 到 0-100）
-    score = max(0, min(score, 100))
+    # POS finding
+    if request.has_pos:
+        findings.append(POS_TRACEABLE_FINDING)
+        finding_sources.setdefault("POS_TRACEABLE", {}).setdefault("signal_keys", []).append("pos_used")
     
-    # 确定风险等级
-    if score >= 80:
-        level = "red"
-    elif score >= 60:
-        level = "orange"
-    elif score >= 40:
-        level = "yellow"
-    else:
-        level = "green"
+    # Stage-based 阶段提示 finding（解释性，不包含行动建议）
+    findings.append(STAGE_FINDINGS.get(request.stage, STAGE_FINDINGS["SL"]))
     
     # 获取风险区间（所有用户可见）
     risk_band = get_risk_band(score)
@@ -1453,58 +1446,39 @@ def assess_risk_v3(request: RiskAssessmentRequest) -> Tuple[int, str, List[Findi
     # 构建分数构成（用于专家包，但先在这里计算结构）
     score_breakdown = {
         "industry_base": {
-            "score": base,
+            "score": plan.base,
             "reason": f"{industry_key} 行业通常被视为持续经营活动"
         },
-        "signals": [],  # 将在 expert_pack 中填充
+        "signals": breakdown_signals,  # 触发的信号详情（用于专家包）
         "income": {
-            "score": income_points,
+            "score": modules["income"],
             "band": income_band,
             "stage": request.stage,
             "reason": f"月收入约 €{request.monthly_income:.0f}，属于{income_band}区间"
         },
         "employee": {
-            "score": emp_points,
+            "score": modules["employees"],
             "reason": f"{request.employee_count} 名员工" if request.employee_count > 0 else "无员工"
         },
         "pos": {
-            "score": pos_points,
+            "score": modules["pos"],
             "reason": "使用 POS 系统" if request.has_pos else "未使用 POS"
         },
         "deductions": []  # 扣分项（如果有）
     }
     
-    # 填充 signals 详情（仅用于专家包）
-    for signal_key, is_triggered in request.signals.items():
-        if not is_triggered or signal_key not in allowed_signals:
-            continue
-        signal_def = SIGNAL_DEFS.get(signal_key)
-        if signal_def:
-            score_breakdown["signals"].append({
-                "code": signal_def.code,
-                "score": signal_def.points,
-                "reason": signal_def.title
-            })
-    
     # 返回增强的 meta 信息（包含 industry_key, risk_band, score_breakdown）
     meta = {
         "industry_key": industry_key,  # ✅ 新增：行业 key
-        "base_score": base,  # ✅ 新增：基础分
+        "base_score": plan.base,  # ✅ 新增：基础分
         "critical_count": critical_count,
-        "tags": tags,
+        "tags": list(plan.tags),
         "matched_triggers": matched_triggers,  # ✅ 确保包含所有匹配的触发器
         "finding_sources": finding_sources,
         "risk_score": score,
         "risk_band": risk_band,  # ✅ 新增：风险区间（所有用户可见）
         "score_breakdown": score_breakdown,  # ✅ 新增：分数构成（用于专家包）
-        "modules": {
-            "base": base,
-            "signals": signals_points,
-            "combo": combo_points,
-            "income": income_points,
-            "employees": emp_points,
-            "pos": pos_points
-        }
+        "modules": dict(modules),
     }
     
     return score, level, findings, meta
@@ -0,0 +1,62 @@
+"""
+分数敏感度（€39 专家包：每个信号的边际影响）
+固定 stage / 收入 / 雇员 / POS，取出该画像下全部信号 bitmask 的分数（SCORE_TABLE.mask_scores），
+翻转某个信号的分数 = 当前 mask 异或该信号位后查一次下标（已含 SIGNALS_POINTS_CAP 与组合加成）；
+收入跨入下一分档同理，取下一档的那一行。不重新执行 assess_risk_v3。
+"""
+
+from typing import Any, Dict, Optional
+
+from ..schemas.assessment import RiskAssessmentRequest
+from .remediation import LEVEL_ORDER
+from .risk.rule_plan import get_industry_plan
+from .risk_engine import SCORE_TABLE, calc_income_score, score_to_level
+
+_LEVEL_RANK = {level: rank for rank, level in enumerate(LEVEL_ORDER)}
+
+
+def _delta(current: int, score: int) -> Dict[str, Any]:
+    level = score_to_level(score)
+    return {
+        "score_delta": score - current,
+        "level_delta": _LEVEL_RANK[level] - _LEVEL_RANK[score_to_level(current)],
+        "risk_level": level,
+    }
+
+
+def score_sensitivity(request: RiskAssessmentRequest) -> Dict[str, Any]:
+    """
+    返回 {"signals": [...], "income": {...} | None}
+    signals：该行业每个允许信号翻转（勾选 <-> 取消）后的分数 / 等级变化
+    income：月收入达到下一分档起点时的分数 / 等级变化（已在最高档时为 None）
+    """
+    plan = get_industry_plan(request.industry)
+    signal_mask = plan.encode(request.signals)
+    scores = SCORE_TABLE.mask_scores(
+        plan, request.stage, request.monthly_income, request.employee_count, request.has_pos
+    )
+    current = scores[signal_mask]
+
+    signals = []
+    for key, rule in plan.signals.items():
+        bit = plan.signal_bits[key]
+        signals.append({
+            "signal": key,
+            "code": rule.code,
+            "checked": bool(signal_mask & bit),
+            **_delta(current, scores[signal_mask ^ bit]),
+        })
+
+    income: Optional[Dict[str, Any]] = None
+    next_income = SCORE_TABLE.next_band_income(request.stage, request.monthly_income)
+    if next_income is not None:
+        next_scores = SCORE_TABLE.mask_scores(
+            plan, request.stage, next_income, request.employee_count, request.has_pos
+        )
+        income = {
+            "next_band": calc_income_score(request.stage, next_income)[1],
+            "next_band_min": int(next_income),
+            **_delta(current, next_scores[signal_mask]),
+        }
+
+    return {"signals": signals, "income": income}
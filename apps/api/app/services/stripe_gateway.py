@@ -0,0 +1,265 @@
+"""
+Stripe 异步网关
+- 直接调用 Stripe REST API（httpx.AsyncClient，连接池 + keep-alive），不在线程池里跑同步 SDK
+- 每次调用有显式超时（连接 / 读取），可按调用覆盖
+- 有限次重试 + 指数退避（full jitter）：网络错误、超时、409/429/5xx，尊重 Stripe-Should-Retry；
+  POST 带 Idempotency-Key，重试不会重复创建
+- 熔断：连续失败达到阈值后在一段时间内直接失败（StripeUnavailableError），之后放行一次试探请求
+- 响应转换为 StripeObject，调用方用法与 SDK 返回值一致（session.url、event.get("type")、sessions.data）
+- 路径中的对象 id 先校验格式（cs_... / evt_...）再做 URL 转义：session_id 来自用户参数，
+  不能借 "../"、"?" 拼出其他带密钥签名的请求
+
+STRIPE_API_BASE 可指向本地假服务（python -m scripts.fake_stripe）或 stripe-mock
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, Optional, Pattern
+from urllib.parse import quote
+
+import httpx
+import stripe
+from stripe.api_requestor import _api_encode
+from stripe.util import convert_to_stripe_object
+
+logger = logging.getLogger(__name__)
+
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE", "https://api.stripe.com").rstrip("/")
+STRIPE_CONNECT_TIMEOUT_SECONDS = float(os.getenv("STRIPE_CONNECT_TIMEOUT_SECONDS", "3"))
+STRIPE_READ_TIMEOUT_SECONDS = float(os.getenv("STRIPE_READ_TIMEOUT_SECONDS", "10"))
+STRIPE_MAX_RETRIES = int(os.getenv("STRIPE_MAX_RETRIES", "2"))
+STRIPE_RETRY_BACKOFF_SECONDS = float(os.getenv("STRIPE_RETRY_BACKOFF_SECONDS", "0.25"))
+STRIPE_RETRY_BACKOFF_MAX_SECONDS = float(os.getenv("STRIPE_RETRY_BACKOFF_MAX_SECONDS", "2"))
+STRIPE_MAX_CONNECTIONS = int(os.getenv("STRIPE_MAX_CONNECTIONS", "20"))
+STRIPE_BREAKER_FAILURES = int(os.getenv("STRIPE_BREAKER_FAILURES", "5"))
+STRIPE_BREAKER_RESET_SECONDS = float(os.getenv("STRIPE_BREAKER_RESET_SECONDS", "30"))
+
+_RETRY_STATUS = {409, 429, 500, 502, 503, 504}
+_CHECKOUT_SESSION_ID = re.compile(r"cs_[A-Za-z0-9_]+")
+_EVENT_ID = re.compile(r"evt_[A-Za-z0-9_]+")
+
+
+class StripeGatewayError(Exception):
+    """Stripe 请求失败（status 为 HTTP 状态码，网络错误 / 超时时为 None）"""
+
+    def __init__(self, message: str, status: Optional[int] = None, code: Optional[str] = None):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+class StripeUnavailableError(StripeGatewayError):
+    """熔断打开，未发出请求"""
+
+
+class InvalidStripeIdError(StripeGatewayError):
+    """对象 id 格式不合法，未发出请求"""
+
+
+def is_checkout_session_id(value: Optional[str]) -> bool:
+    return bool(value) and _CHECKOUT_SESSION_ID.fullmatch(value) is not None
+
+
+def is_event_id(value: Optional[str]) -> bool:
+    return bool(value) and _EVENT_ID.fullmatch(value) is not None
+
+
+def _object_path(prefix: str, object_id: str, pattern: Pattern[str]) -> str:
+    if not object_id or pattern.fullmatch(object_id) is None:
+        raise InvalidStripeIdError(f"Invalid Stripe id: {object_id!r}", status=400, code="invalid_id")
+    return f"{prefix}/{quote(object_id, safe='')}"
+
+
+class CircuitBreaker:
+    """连续失败计数熔断器（closed -> open -> half_open -> closed）；只在事件循环中使用"""
+
+    def __init__(self, failure_threshold: int = STRIPE_BREAKER_FAILURES, reset_seconds: float = STRIPE_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.opens = 0
+        self.rejections = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self.trial_in_flight:
+            # 半开：只放行一个试探请求
+            self.trial_in_flight = True
+            return
+        self.rejections += 1
+        raise StripeUnavailableError("Stripe circuit breaker is open")
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.trial_in_flight or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self.trial_in_flight:
+                self.opens += 1
+            self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+
+
+class StripeGateway:
+    def __init__(self, api_base: str = STRIPE_API_BASE, max_retries: int = STRIPE_MAX_RETRIES):
+        self.api_base = api_base
+        self.max_retries = max_retries
+        self.breaker = CircuitBreaker()
+        self._client: Optional[httpx.AsyncClient] = None
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.api_base,
+                timeout=httpx.Timeout(STRIPE_READ_TIMEOUT_SECONDS, connect=STRIPE_CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(max_connections=STRIPE_MAX_CONNECTIONS, max_keepalive_connections=STRIPE_MAX_CONNECTIONS),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Authorization": f"Bearer {stripe.api_key or ''}"}
+        if stripe.api_version:
+            headers["Stripe-Version"] = stripe.api_version
+        return headers
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        # full jitter：[0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(STRIPE_RETRY_BACKOFF_MAX_SECONDS, STRIPE_RETRY_BACKOFF_SECONDS * (2 ** attempt)))
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """发起请求并返回 StripeObject；timeout 覆盖本次调用的读取超时（秒）"""
+        self.breaker.before_call()
+        self.calls += 1
+        headers = self._headers()
+        encoded = list(_api_encode(params or {}))
+        if method == "POST":
+            headers["Idempotency-Key"] = str(uuid.uuid4())
+        request_timeout = (
+            httpx.Timeout(timeout, connect=min(timeout, STRIPE_CONNECT_TIMEOUT_SECONDS)) if timeout is not None else None
+        )
+        kwargs: Dict[str, Any] = {"headers": headers}
+        if request_timeout is not None:
+            kwargs["timeout"] = request_timeout
+        if method == "GET":
+            kwargs["params"] = encoded
+        else:
+            kwargs["data"] = dict(encoded)
+
+        client = self._get_client()
+        attempt = 0
+        while True:
+            error: StripeGatewayError
+            should_retry = False
+            try:
+                response = await client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                # 连接失败 / 超时 / 连接被重置
+                error = StripeGatewayError(f"Stripe request failed: {type(e).__name__}: {e}")
+                should_retry = True
+            else:
+                if response.status_code < 400:
+                    self.breaker.record_success()
+                    return convert_to_stripe_object(response.json(), stripe.api_key, stripe.api_version)
+                error = self._error_from_response(response)
+                hint = response.headers.get("Stripe-Should-Retry")
+                should_retry = hint == "true" if hint in ("true", "false") else response.status_code in _RETRY_STATUS
+
+            # 4xx（除 409/429）是请求本身的问题，不计入熔断
+            if error.status is None or error.status >= 500 or error.status == 429:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+
+            if not should_retry or attempt >= self.max_retries or self.breaker.state == "open":
+                self.failures += 1
+                logger.warning("[STRIPE] %s %s failed after %s attempt(s): %s", method, path, attempt + 1, error)
+                raise error
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+            self.retries += 1
+
+    @staticmethod
+    def _error_from_response(response: httpx.Response) -> StripeGatewayError:
+        message = f"Stripe HTTP {response.status_code}"
+        code = None
+        try:
+            body = response.json().get("error") or {}
+            message = body.get("message") or message
+            code = body.get("code")
+        except ValueError:
+            pass
+        return StripeGatewayError(message, status=response.status_code, code=code)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "api_base": self.api_base,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "breaker_state": self.breaker.state,
+            "breaker_opens": self.breaker.opens,
+            "breaker_rejections": self.breaker.rejections,
+        }
+
+
+_gateway = StripeGateway()
+
+
+async def create_checkout_session(timeout: Optional[float] = None, **params: Any) -> Any:
+    return await _gateway.request("POST", "/v1/checkout/sessions", params, timeout=timeout)
+
+
+async def retrieve_checkout_session(session_id: str, timeout: Optional[float] = None) -> Any:
+    path = _object_path("/v1/checkout/sessions", session_id, _CHECKOUT_SESSION_ID)
+    return await _gateway.request("GET", path, timeout=timeout)
+
+
+async def list_checkout_sessions(timeout: Optional[float] = None, **params: Any) -> Any:
+    return await _gateway.request("GET", "/v1/checkout/sessions", params, timeout=timeout)
+
+
+async def retrieve_event(event_id: str, timeout: Optional[float] = None) -> Any:
+    return await _gateway.request("GET", _object_path("/v1/events", event_id, _EVENT_ID), timeout=timeout)
+
+
+async def close_stripe_gateway() -> None:
+    await _gateway.close()
+
+
+def stripe_gateway_stats() -> Dict[str, Any]:
+    return _gateway.stats()
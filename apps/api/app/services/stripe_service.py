@@ -1,10 +1,15 @@
 import os
+import time
+import asyncio
 import stripe
 import logging
-from typing import Optional, Literal
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Literal, Tuple
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import PaymentSession
+from app.services import stripe_gateway
 from fastapi import HTTPException
 
 # 初始化 Stripe
@@ -14,6 +19,113 @@ logger = logging.getLogger(__name__)
 # Tier 类型定义
 TierType = Literal["basic_15", "expert_39"]
 
+# Stripe Checkout Session 查询缓存：未支付会话在 TTL 内不重复请求 Stripe（成功页会反复轮询 /payment/status）
+STRIPE_SESSION_CACHE_TTL_SECONDS = float(os.getenv("STRIPE_SESSION_CACHE_TTL_SECONDS", "5"))
+STRIPE_SESSION_CACHE_MAXSIZE = int(os.getenv("STRIPE_SESSION_CACHE_MAXSIZE", "10000"))
+
+
+class StripeSessionCache:
+    """
+    按 session_id 缓存 Checkout Session 查询结果（LRU + TTL，进程内）
+    同一 session_id 的并发查询共享一个进行中的请求（single-flight）；查询失败不缓存
+    只在事件循环中使用，无需加锁
+    """
+
+    def __init__(self, ttl_seconds: float = STRIPE_SESSION_CACHE_TTL_SECONDS, maxsize: int = STRIPE_SESSION_CACHE_MAXSIZE):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, "asyncio.Future"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.errors = 0
+        self.short_circuits = 0
+
+    async def retrieve(self, session_id: str) -> Any:
+        now = time.monotonic()
+        entry = self._entries.get(session_id)
+        if entry is not None and entry[0] > now:
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[1]
+
+        task = self._inflight.get(session_id)
+        if task is None:
+            self.misses += 1
+            # 独立 task：发起请求的调用方被取消（客户端断开）时，其他等待者仍能拿到结果
+            task = asyncio.ensure_future(self._fetch(session_id))
+            self._inflight[session_id] = task
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    async def _fetch(self, session_id: str) -> Any:
+        try:
+            stripe_session = await stripe_gateway.retrieve_checkout_session(session_id)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self._inflight.pop(session_id, None)
+        self._entries[session_id] = (time.monotonic() + self.ttl_seconds, stripe_session)
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return stripe_session
+
+    def invalidate(self, session_id: str) -> None:
+        self._entries.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.shared + self.short_circuits
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "short_circuits": self.short_circuits,
+            "errors": self.errors,
+            "remote_call_rate": round(self.misses / lookups, 4) if lookups else None,
+        }
+
+
+_session_cache = StripeSessionCache()
+
+
+def stripe_session_cache_stats() -> Dict[str, Any]:
+    return _session_cache.stats()
+
+
+def invalidate_stripe_session_cache(session_id: str) -> None:
+    """丢弃缓存的 Stripe 会话状态（webhook 收到会话状态变化时调用）"""
+    _session_cache.invalidate(session_id)
+
+
+def _stripe_id(value: Any) -> Optional[str]:
+    """Stripe 字段可能是 id 字符串，也可能是展开后的对象"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        return value
+    return value.get("id")
+
+
+def apply_stripe_ids(payment_session: PaymentSession, stripe_session: Any) -> None:
+    """从 Checkout Session 补齐 payment_intent / charge / customer id（已有的不覆盖）"""
+    payment_intent = stripe_session.get("payment_intent")
+    charge = payment_intent.get("latest_charge") if payment_intent and not isinstance(payment_intent, str) else None
+    ids = {
+        "payment_intent_id": _stripe_id(payment_intent),
+        "charge_id": _stripe_id(charge),
+        "customer_id": _stripe_id(stripe_session.get("customer")),
+    }
+    for field, value in ids.items():
+        if value and not getattr(payment_session, field):
+            setattr(payment_session, field, value)
+
 
 def normalize_tier(t: str) -> str:
     """✅ B1: 标准化 tier（basic → basic_15，expert → expert_39）"""
@@ -25,18 +137,19 @@ def normalize_tier(t: str) -> str:
     return "basic_15"  # 兜底
 
 
-def create_checkout_session(
+async def create_checkout_session(
     tier: str,  # 接受字符串，内部 normalize
     assessment_id: str,  # 评估结果唯一标识（必需）
     user_id: str,  # 用户 ID（必需）
     price_id: Optional[str] = None,
     success_url: Optional[str] = None,
     cancel_url: Optional[str] = None,
-    db: Optional[Session] = None,
+    db: Optional[AsyncSession] = None,
     decision_code: Optional[str] = None  # ✅ 新增：决策代码（用于 metadata）
 ) -> dict:
     """
-    创建 Stripe Checkout Session 并保存到数据库
+    创建 Stripe Checkout Session 并保存到数据库（传了 db 时）
+    通过 stripe_gateway 异步调用 Stripe（返回值中的 tier / amount 用于建 PaymentSession）
     """
     # ✅ B1: 先 normalize tier
     tier = normalize_tier(tier)
@@ -120,7 +233,7 @@ def create_checkout_session(
         
         logger.info("[CHECKOUT] creating checkout session")
         
-        session = stripe.checkout.Session.create(
+        session = await stripe_gateway.create_checkout_session(
             payment_method_types=["card"],
             line_items=line_items,
             mode="payment",
@@ -142,31 +255,46 @@ def create_checkout_session(
                 currency="eur"
             )
             db.add(payment_session)
-            db.commit()
-            db.refresh(payment_session)
+            await db.commit()
+            await db.refresh(payment_session)
         
         return {
             "checkout_url": session.url,
-            "session_id": session.id
+            "session_id": session.id,
+            "tier": tier,
+            "amount": amount,
         }
     except Exception as e:
         raise Exception(f"Failed to create checkout session: {str(e)}")
 
 
-def verify_payment_session(session_id: str, db: Session) -> Optional[PaymentSession]:
+async def verify_payment_session(session_id: str, db: AsyncSession) -> Optional[PaymentSession]:
     """
     验证支付会话状态
     如果已支付，返回 PaymentSession 对象，否则返回 None
     
     ✅ 关键修复：只要 Stripe Session paid，就把 metadata 写回 DB（assessment_id、user_id、tier）
+    Stripe 查询走 stripe_gateway（异步、超时、重试、熔断）
+    DB 中已 paid 且有 assessment_id 的会话直接返回，不请求 Stripe；
+    其余会话的 Stripe 状态按 STRIPE_SESSION_CACHE_TTL_SECONDS 缓存，并发轮询共享一次查询
     """
-    payment_session = db.query(PaymentSession).filter(
-        PaymentSession.session_id == session_id
-    ).first()
+    # session_id 来自用户参数：格式不对的不查库、不请求 Stripe
+    if not stripe_gateway.is_checkout_session_id(session_id):
+        logger.warning("[verify_payment_session] invalid session_id rejected")
+        return None
+
+    payment_session = await db.scalar(
+        select(PaymentSession).where(PaymentSession.session_id == session_id)
+    )
+
+    # ✅ 已支付且 metadata 已回写：DB 即权威状态（退款由 webhook 改写 status）
+    if payment_session and payment_session.status == "paid" and payment_session.assessment_id:
+        _session_cache.short_circuits += 1
+        return payment_session
 
     # ✅ 先从 Stripe 拿权威状态
     try:
-        stripe_session = stripe.checkout.Session.retrieve(session_id)
+        stripe_session = await _session_cache.retrieve(session_id)
     except Exception as e:
         logger.warning("[verify_payment_session] Stripe retrieve error: %s", e)
         return payment_session  # 如果 Stripe 查询失败，返回数据库记录（如果有）
@@ -202,6 +330,7 @@ def verify_payment_session(session_id: str, db: Session) -> Optional[PaymentSess
         if meta_tier:
             payment_session.tier = meta_tier
             logger.info("[verify_payment_session] updated tier")
+        apply_stripe_ids(payment_session, stripe_session)
 
     else:
         # ✅ 如果数据库中没有，创建一个新记录，必须包含 assessment_id
@@ -214,11 +343,12 @@ def verify_payment_session(session_id: str, db: Session) -> Optional[PaymentSess
             currency=stripe_session.currency,
             paid_at=datetime.utcnow()
         )
+        apply_stripe_ids(payment_session, stripe_session)
         db.add(payment_session)
         logger.info("[verify_payment_session] created PaymentSession")
 
-    db.commit()
-    db.refresh(payment_session)
+    await db.commit()
+    await db.refresh(payment_session)
     
     logger.info("[verify_payment_session] payment session ready")
     
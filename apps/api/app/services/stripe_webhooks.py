@@ -0,0 +1,203 @@
+"""
+Stripe Webhook 事件处理（由 webhook_inbox 的后台 worker 调用）
+去重 / 状态记录 / 重试由收件箱负责，这里只做业务：
+- checkout.session.completed：校验金额与币种，记录支付，升级 Assessment 解锁层级
+- charge.refunded / charge.refund.updated：按 payment_intent 找到 Checkout Session，撤销解锁
+  （本地 payment_sessions.payment_intent_id / charge_id 索引查询；映射缺失时才调用 Stripe 列表接口）
+
+处理函数可重复执行（只升不降 / 退款幂等），收件箱重试不会产生副作用。
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.models import Assessment, PaymentSession
+from app.services import stripe_gateway
+from app.services.decision_templates import normalize_tier
+from app.services.render_queue import enqueue_render
+from app.services.report_cache import invalidate_report_cache
+from app.services.stripe_service import apply_stripe_ids, invalidate_stripe_session_cache
+
+logger = logging.getLogger(__name__)
+
+EXPECTED_AMOUNTS = {
+    "basic_15": 1500,
+    "expert_39": 3900,
+}
+
+_TIER_RANK = {"none": 0, "basic_15": 1, "expert_39": 2}
+
+
+class PermanentEventError(Exception):
+    """事件数据无效（缺字段、金额不符等），重试无意义，直接标记 failed"""
+
+
+def _tier_rank(t: str) -> int:
+    return _TIER_RANK.get(normalize_tier(t), 0)
+
+
+def _event_object(event: Dict[str, Any]) -> Dict[str, Any]:
+    return (event.get("data") or {}).get("object") or {}
+
+
+def _charge_id(obj: Dict[str, Any]) -> Optional[str]:
+    """charge.refunded 的对象是 charge；charge.refund.updated 的对象是 refund（charge 字段）"""
+    if obj.get("object") == "refund":
+        return obj.get("charge")
+    return obj.get("id")
+
+
+async def handle_checkout_completed(db: AsyncSession, event: Dict[str, Any], session_id: Optional[str]) -> str:
+    session = _event_object(event)
+    session_id = session_id or session.get("id")
+    if not session_id:
+        raise PermanentEventError("Missing session id")
+
+    metadata = session.get("metadata") or {}
+    logger.info("[WEBHOOK] checkout.session.completed: session_id=%s", session_id)
+    # 轮询缓存里可能还是未支付的快照
+    invalidate_stripe_session_cache(session_id)
+
+    assessment_id = metadata.get("assessment_id")
+    tier_raw = metadata.get("tier", "basic_15")
+    tier = normalize_tier(tier_raw)
+    user_id = metadata.get("user_id", "")
+
+    if not assessment_id or not user_id:
+        raise PermanentEventError("Missing assessment_id or user_id in metadata")
+    if session.get("payment_status") != "paid":
+        raise PermanentEventError("Payment not completed")
+
+    amount_total = session.get("amount_total")
+    currency = (session.get("currency") or "").lower()
+    expected_amount = EXPECTED_AMOUNTS.get(tier)
+    if amount_total is None or expected_amount is None:
+        raise PermanentEventError("Invalid payment amount or tier")
+    if currency != "eur":
+        raise PermanentEventError(f"Invalid currency: {currency}")
+    if int(amount_total) != int(expected_amount):
+        raise PermanentEventError(f"Amount mismatch: {amount_total} != {expected_amount}")
+
+    logger.info("[WEBHOOK] tier normalized: %s -> %s", tier_raw, tier)
+
+    payment_session = await db.scalar(select(PaymentSession).where(PaymentSession.session_id == session_id))
+    if payment_session:
+        payment_session.status = "paid"
+        payment_session.paid_at = datetime.utcnow()
+    else:
+        payment_session = PaymentSession(
+            session_id=session_id,
+            assessment_id=assessment_id,
+            tier=tier,
+            status="paid",
+            amount=session.get("amount_total", 0),
+            currency=session.get("currency", "eur"),
+            paid_at=datetime.utcnow()
+        )
+        db.add(payment_session)
+    # 记录 payment_intent / customer：之后的退款事件据此本地查到 session
+    apply_stripe_ids(payment_session, session)
+
+    assessment = await db.scalar(select(Assessment).where(Assessment.assessment_id == assessment_id))
+    upgraded = False
+    if assessment:
+        old_tier = normalize_tier(assessment.unlocked_tier or "none")
+        if _tier_rank(tier) > _tier_rank(old_tier):
+            assessment.unlocked_tier = tier
+            assessment.unlocked_at = datetime.utcnow()
+            assessment.stripe_session_id = session_id
+            if user_id and not assessment.user_id:
+                assessment.user_id = user_id
+            upgraded = True
+            logger.info("[WEBHOOK] assessment upgraded: old=%s new=%s session_id=%s", old_tier, tier, session_id)
+        else:
+            logger.warning("[WEBHOOK] tier not upgraded: old=%s new=%s", old_tier, tier)
+    else:
+        logger.info("[WEBHOOK] assessment not found, creating new record")
+        db.add(Assessment(
+            assessment_id=assessment_id,
+            user_id=user_id,
+            unlocked_tier=tier,
+            unlocked_at=datetime.utcnow(),
+            stripe_session_id=session_id
+        ))
+    await db.commit()
+
+    if upgraded:
+        await run_in_threadpool(invalidate_report_cache, assessment_id)
+        await db.run_sync(enqueue_render, assessment_id)
+    return "success"
+
+
+async def resolve_refund_session(db: AsyncSession, event: Dict[str, Any]) -> Optional[str]:
+    """
+    退款事件只带 payment_intent / charge：查出对应的 Checkout Session（作为顺序键）
+    先查本地索引（payment_intent_id，其次 charge_id），映射缺失（旧数据 / checkout 事件还没处理）时再调用 Stripe
+    """
+    charge = _event_object(event)
+    payment_intent = charge.get("payment_intent")
+    if not payment_intent:
+        return None
+    session_id = await db.scalar(
+        select(PaymentSession.session_id).where(PaymentSession.payment_intent_id == payment_intent).limit(1)
+    )
+    charge_id = _charge_id(charge)
+    if session_id is None and charge_id:
+        session_id = await db.scalar(
+            select(PaymentSession.session_id).where(PaymentSession.charge_id == charge_id).limit(1)
+        )
+    if session_id is not None:
+        return session_id
+    logger.info("[WEBHOOK] payment_intent not mapped locally, falling back to Stripe session list")
+    sessions = await stripe_gateway.list_checkout_sessions(payment_intent=payment_intent, limit=1)
+    return sessions.data[0].id if sessions.data else None
+
+
+async def handle_refund(db: AsyncSession, event: Dict[str, Any], session_id: Optional[str]) -> str:
+    charge = _event_object(event)
+    if not charge.get("payment_intent"):
+        return "ignored"
+    if not session_id:
+        raise PermanentEventError("No checkout session found for payment_intent")
+
+    payment_session = await db.scalar(select(PaymentSession).where(PaymentSession.session_id == session_id))
+    if payment_session:
+        payment_session.status = "refunded"
+        # 经 Stripe 列表解析到的旧数据：回填映射
+        payment_session.payment_intent_id = payment_session.payment_intent_id or charge["payment_intent"]
+        payment_session.charge_id = payment_session.charge_id or _charge_id(charge)
+        payment_session.customer_id = payment_session.customer_id or charge.get("customer")
+
+    assessment = await db.scalar(select(Assessment).where(Assessment.stripe_session_id == session_id))
+    if assessment:
+        assessment.unlocked_tier = "none"
+        assessment.unlocked_at = None
+    await db.commit()
+
+    if assessment:
+        await run_in_threadpool(invalidate_report_cache, assessment.assessment_id)
+    return "success"
+
+
+EventHandler = Callable[[AsyncSession, Dict[str, Any], Optional[str]], Awaitable[str]]
+SessionResolver = Callable[[AsyncSession, Dict[str, Any]], Awaitable[Optional[str]]]
+
+# event_type -> (处理函数, 顺序键解析函数)；解析函数为 None 时顺序键在入库时取 data.object.id
+EVENT_HANDLERS: Dict[str, Tuple[EventHandler, Optional[SessionResolver]]] = {
+    "checkout.session.completed": (handle_checkout_completed, None),
+    "charge.refunded": (handle_refund, resolve_refund_session),
+    "charge.refund.updated": (handle_refund, resolve_refund_session),
+}
+
+
+def event_session_id(event: Dict[str, Any]) -> Optional[str]:
+    """入库时即可确定的顺序键（checkout 事件的 session_id）"""
+    handler = EVENT_HANDLERS.get(event.get("type"))
+    if handler is None or handler[1] is not None:
+        return None
+    return _event_object(event).get("id")
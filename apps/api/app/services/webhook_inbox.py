@@ -0,0 +1,326 @@
+"""
+Stripe Webhook 收件箱（webhook_events 表即队列）
+
+webhook 接口验签后只做一次 INSERT（status='queued'，payload=事件原文）就返回 200，
+业务处理（多次提交、退款时的 Stripe 查询）由后台 worker 完成，Stripe 不会因为响应慢而重发。
+
+- 去重：event_id 唯一；Stripe 重发已 failed 的事件会重新入队
+- 顺序：同一 session_id 的事件按入库顺序处理，前面还有 queued / processing 的事件时后面的不领取；
+  退款事件的 session_id 在处理时解析（Stripe 查询），解析后若前面有未完成事件则延后，不消耗重试次数
+- 并发：WEBHOOK_INBOX_WORKERS 个 worker，条件 UPDATE 领取（queued -> processing），多实例只有一个成功
+- 重试：失败后按 WEBHOOK_INBOX_BACKOFF_SECONDS * 2^(attempts-1) 退避（上限 WEBHOOK_INBOX_BACKOFF_MAX_SECONDS），
+  次数用尽或数据无效 -> status='failed'，可通过 /api/v1/stripe/webhook/retry/{event_id} 人工重试
+- 租约：processing 超过 WEBHOOK_INBOX_LEASE_SECONDS 视为 worker 崩溃，重新入队；
+  回收每个进程每 WEBHOOK_INBOX_LEASE_SECONDS 做一次（不在每次领取时执行，空收件箱的轮询不产生写入）
+
+WEBHOOK_INBOX_WORKERS=0 时本实例只入库不消费（由其他实例处理）。
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import sentry_sdk
+from sqlalchemy import exists, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from ..database import AsyncSessionLocal
+from ..models import WebhookEvent
+from .stripe_webhooks import EVENT_HANDLERS, PermanentEventError, event_session_id
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_INBOX_WORKERS = int(os.getenv("WEBHOOK_INBOX_WORKERS", "2"))
+WEBHOOK_INBOX_POLL_SECONDS = float(os.getenv("WEBHOOK_INBOX_POLL_SECONDS", "2"))
+WEBHOOK_INBOX_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_INBOX_MAX_ATTEMPTS", "8"))
+WEBHOOK_INBOX_BACKOFF_SECONDS = float(os.getenv("WEBHOOK_INBOX_BACKOFF_SECONDS", "5"))
+WEBHOOK_INBOX_BACKOFF_MAX_SECONDS = float(os.getenv("WEBHOOK_INBOX_BACKOFF_MAX_SECONDS", "900"))
+WEBHOOK_INBOX_LEASE_SECONDS = float(os.getenv("WEBHOOK_INBOX_LEASE_SECONDS", "120"))
+WEBHOOK_INBOX_DEFER_SECONDS = float(os.getenv("WEBHOOK_INBOX_DEFER_SECONDS", "1"))
+
+# 会阻塞同一 session_id 后续事件的状态
+_ACTIVE_STATUSES = ("queued", "processing")
+
+
+class _DeferEvent(Exception):
+    """同一 session_id 前面还有未完成的事件，稍后再处理"""
+
+
+_wake_event: Optional[asyncio.Event] = None
+_next_reclaim = 0.0  # time.monotonic()
+_stop_event: Optional[asyncio.Event] = None
+_worker_tasks: List[asyncio.Task] = []
+
+
+def _wake_workers() -> None:
+    if _wake_event is not None:
+        _wake_event.set()
+
+
+def _event_payload(event: Any) -> Dict[str, Any]:
+    """stripe.Event（StripeObject）转普通 dict 以便存 JSON"""
+    if hasattr(event, "to_dict_recursive"):
+        return event.to_dict_recursive()
+    return dict(event)
+
+
+def _requeue(row: WebhookEvent, now: datetime) -> None:
+    row.status = "queued"
+    row.attempts = 0
+    row.error = None
+    row.locked_at = None
+    row.next_run_at = now
+
+
+async def ingest_event(db: AsyncSession, event: Any) -> str:
+    """
+    验签后的事件写入收件箱，返回 queued / duplicate / ignored / already_processed
+    （调用方已确认 event 有 id）
+    """
+    event_type = event.get("type")
+    if event_type not in EVENT_HANDLERS:
+        return "ignored"
+    event_id = event.get("id")
+    now = datetime.utcnow()
+
+    existing = await db.scalar(select(WebhookEvent).where(WebhookEvent.event_id == event_id))
+    if existing:
+        if existing.status == "processed":
+            return "already_processed"
+        if existing.status != "failed":
+            return "duplicate"
+        # Stripe 重发（或人工重试）已失败的事件：用最新 payload 重新入队
+        existing.payload = _event_payload(event)
+        _requeue(existing, now)
+        await db.commit()
+        _wake_workers()
+        return "queued"
+
+    db.add(WebhookEvent(
+        event_id=event_id,
+        event_type=event_type,
+        session_id=event_session_id(event),
+        status="queued",
+        payload=_event_payload(event),
+        attempts=0,
+        next_run_at=now,
+    ))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 并发重发：另一个请求已写入
+        await db.rollback()
+        return "duplicate"
+    _wake_workers()
+    return "queued"
+
+
+async def requeue_event(db: AsyncSession, event_id: str) -> Optional[str]:
+    """人工重试：已存在的事件重新入队（重置次数），返回新状态；不存在返回 None"""
+    row = await db.scalar(select(WebhookEvent).where(WebhookEvent.event_id == event_id))
+    if row is None:
+        return None
+    if row.status == "processed":
+        return "already_processed"
+    if row.status == "processing":
+        return "processing"
+    _requeue(row, datetime.utcnow())
+    await db.commit()
+    _wake_workers()
+    return "queued"
+
+
+def _backoff_seconds(attempts: int) -> float:
+    return min(WEBHOOK_INBOX_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0)), WEBHOOK_INBOX_BACKOFF_MAX_SECONDS)
+
+
+async def _reclaim_expired(db: AsyncSession, now: datetime) -> None:
+    """租约过期的 processing 事件：次数用尽标记 failed，否则重新入队（locked_at 为空的是旧版本同步处理中断的记录）"""
+    expired = or_(WebhookEvent.locked_at < now - timedelta(seconds=WEBHOOK_INBOX_LEASE_SECONDS), WebhookEvent.locked_at.is_(None))
+    await db.execute(
+        update(WebhookEvent)
+        .where(WebhookEvent.status == "processing", expired, WebhookEvent.attempts >= WEBHOOK_INBOX_MAX_ATTEMPTS)
+        .values(status="failed", locked_at=None, error="lease expired")
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(WebhookEvent)
+        .where(WebhookEvent.status == "processing", expired, WebhookEvent.attempts < WEBHOOK_INBOX_MAX_ATTEMPTS)
+        .values(status="queued", locked_at=None, next_run_at=now, error="lease expired")
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _has_active_predecessor(row_id, session_id):
+    earlier = aliased(WebhookEvent)
+    return exists().where(
+        earlier.session_id == session_id,
+        earlier.id < row_id,
+        earlier.status.in_(_ACTIVE_STATUSES),
+    )
+
+
+async def claim_next_event(db: AsyncSession) -> Optional[int]:
+    """领取一个到期且同一 session_id 前面没有未完成事件的事件，返回行 id"""
+    global _next_reclaim
+    now = datetime.utcnow()
+    if time.monotonic() >= _next_reclaim:
+        _next_reclaim = time.monotonic() + WEBHOOK_INBOX_LEASE_SECONDS
+        await _reclaim_expired(db, now)
+        await db.commit()
+
+    candidates = (await db.execute(
+        select(WebhookEvent.id)
+        .where(
+            WebhookEvent.status == "queued",
+            or_(WebhookEvent.next_run_at.is_(None), WebhookEvent.next_run_at <= now),
+            ~_has_active_predecessor(WebhookEvent.id, WebhookEvent.session_id),
+        )
+        .order_by(WebhookEvent.id)
+        .limit(8)
+    )).scalars().all()
+
+    for row_id in candidates:
+        result = await db.execute(
+            update(WebhookEvent)
+            .where(WebhookEvent.id == row_id, WebhookEvent.status == "queued")
+            .values(status="processing", locked_at=now, attempts=WebhookEvent.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        if result.rowcount:
+            return row_id
+    return None
+
+
+async def _fail_event(db: AsyncSession, row_id: int, error: str, permanent: bool = False) -> str:
+    """记录失败：可重试则退避后重新入队，否则标记 failed。返回新状态"""
+    row = await db.get(WebhookEvent, row_id, populate_existing=True)
+    if row is None:
+        return "missing"
+    row.error = error[:2000]
+    row.locked_at = None
+    if permanent or row.attempts >= WEBHOOK_INBOX_MAX_ATTEMPTS:
+        row.status = "failed"
+    else:
+        row.status = "queued"
+        row.next_run_at = datetime.utcnow() + timedelta(seconds=_backoff_seconds(row.attempts))
+    await db.commit()
+    return row.status
+
+
+async def process_event(row_id: int) -> Optional[str]:
+    """处理一个已领取的事件，返回处理结果（success / ignored）或失败后的状态"""
+    async with AsyncSessionLocal() as db:
+        row = await db.get(WebhookEvent, row_id)
+        if row is None:
+            return None
+        event_id = row.event_id
+        try:
+            handler, resolver = EVENT_HANDLERS.get(row.event_type, (None, None))
+            if handler is None:
+                raise PermanentEventError(f"Unsupported event type: {row.event_type}")
+            if row.payload is None:
+                raise PermanentEventError("Event payload missing")
+            if row.session_id is None and resolver is not None:
+                row.session_id = await resolver(db, row.payload)
+                if row.session_id and await db.scalar(select(_has_active_predecessor(row.id, row.session_id))):
+                    raise _DeferEvent()
+                await db.commit()
+            result = await handler(db, row.payload, row.session_id)
+        except _DeferEvent:
+            # 保留解析出的 session_id，退还本次次数
+            row.status = "queued"
+            row.attempts = max(row.attempts - 1, 0)
+            row.locked_at = None
+            row.next_run_at = datetime.utcnow() + timedelta(seconds=WEBHOOK_INBOX_DEFER_SECONDS)
+            await db.commit()
+            logger.info("[WEBHOOK_INBOX] event deferred behind earlier events: event_id=%s session_id=%s", event_id, row.session_id)
+            return "deferred"
+        except PermanentEventError as e:
+            await db.rollback()
+            status = await _fail_event(db, row_id, str(e), permanent=True)
+            logger.error("[WEBHOOK_INBOX] event failed: event_id=%s error=%s", event_id, e)
+            sentry_sdk.capture_message(f"Stripe webhook failed: {e}", level="error")
+            return status
+        except Exception as e:
+            await db.rollback()
+            status = await _fail_event(db, row_id, f"{type(e).__name__}: {e}")
+            logger.warning("[WEBHOOK_INBOX] event failed: event_id=%s status=%s error=%s", event_id, status, e)
+            if status == "failed":
+                sentry_sdk.capture_exception(e)
+            return status
+
+        row.status = "processed"
+        row.processed_at = datetime.utcnow()
+        row.locked_at = None
+        row.error = None
+        await db.commit()
+        logger.info("[WEBHOOK_INBOX] event processed: event_id=%s result=%s", event_id, result)
+        return result
+
+
+async def _claim() -> Optional[int]:
+    async with AsyncSessionLocal() as db:
+        return await claim_next_event(db)
+
+
+async def _worker_loop(stop: asyncio.Event, wake: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            row_id = await _claim()
+        except Exception as e:
+            logger.warning("[WEBHOOK_INBOX] claim failed: %s", e)
+            row_id = None
+
+        if row_id is not None:
+            await process_event(row_id)
+            # 处理完可能解除了同一 session_id 后续事件的阻塞
+            wake.set()
+            continue
+
+        # 没有可领取的事件：等到入库唤醒或轮询间隔
+        wake.clear()
+        try:
+            await asyncio.wait_for(wake.wait(), WEBHOOK_INBOX_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_webhook_workers() -> None:
+    """在当前事件循环中启动后台 worker（应用 startup 时调用）"""
+    global _wake_event, _stop_event
+    if WEBHOOK_INBOX_WORKERS <= 0 or _worker_tasks:
+        return
+    _wake_event = asyncio.Event()
+    _stop_event = asyncio.Event()
+    for _ in range(WEBHOOK_INBOX_WORKERS):
+        _worker_tasks.append(asyncio.create_task(_worker_loop(_stop_event, _wake_event)))
+
+
+async def stop_webhook_workers() -> None:
+    """停止后台 worker（处理中的事件会被取消，租约过期后重新领取；处理函数幂等）"""
+    global _wake_event, _stop_event
+    if _stop_event is not None:
+        _stop_event.set()
+    for task in _worker_tasks:
+        task.cancel()
+    await asyncio.gather(*_worker_tasks, return_exceptions=True)
+    _worker_tasks.clear()
+    _wake_event = _stop_event = None
+
+
+async def webhook_inbox_stats() -> Dict[str, Any]:
+    """各状态事件数（/metrics 使用）"""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(WebhookEvent.status, func.count(WebhookEvent.id)).group_by(WebhookEvent.status)
+        )).all()
+    counts = {status: 0 for status in ("queued", "processing", "processed", "failed")}
+    counts.update({status: count for status, count in rows})
+    return {"workers": len(_worker_tasks), "events": counts}
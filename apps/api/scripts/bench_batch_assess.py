@@ -0,0 +1,64 @@
+"""
+批量评估基准：逐条 assess_risk_v3 vs assess_risk_v3_batch（NumPy 内核）
+
+用法（在 apps/api 目录下）：
+    python -m scripts.bench_batch_assess --n 500 --repeat 5
+"""
+
+import argparse
+import random
+import time
+
+from app.schemas.assessment import RiskAssessmentRequest
+from app.services.risk.signals_catalog import INDUSTRY_SIGNALS
+from app.services.risk_engine import assess_risk_v3
+from app.services.risk_batch import assess_risk_v3_batch, score_batch
+
+
+def _random_requests(n: int, seed: int = 42):
+    rnd = random.Random(seed)
+    industries = sorted(INDUSTRY_SIGNALS)
+    requests = []
+    for _ in range(n):
+        industry = rnd.choice(industries)
+        signals = {key: rnd.random() < 0.5 for key in INDUSTRY_SIGNALS[industry]}
+        requests.append(RiskAssessmentRequest(
+            stage=rnd.choice(["PRE_AUTONOMO", "AUTONOMO", "SL"]),
+            industry=industry,
+            monthly_income=rnd.uniform(0, 12000),
+            employee_count=rnd.choice([0, 0, 1, 3]),
+            has_pos=rnd.random() < 0.5,
+            signals=signals,
+        ))
+    return requests
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    requests = _random_requests(args.n)
+
+    loop = _best_of(lambda: [assess_risk_v3(r) for r in requests], args.repeat)
+    kernel = _best_of(lambda: score_batch(requests), args.repeat)
+    batch = _best_of(lambda: assess_risk_v3_batch(requests), args.repeat)
+
+    print(f"n={args.n}")
+    print(f"per-request loop (score + findings): {loop * 1000:8.2f} ms")
+    print(f"batch kernel (score only):           {kernel * 1000:8.2f} ms")
+    print(f"batch (score + findings):            {batch * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
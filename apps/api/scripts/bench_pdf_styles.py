@@ -0,0 +1,90 @@
+"""
+PDF 样式缓存基准：每个 section 重建样式表（旧行为） vs 进程级样式缓存
+
+统计每份 PDF 的耗时、新建的 ParagraphStyle 数量与 tracemalloc 峰值。
+旧行为通过在每次 _get_styles() 前清空缓存来模拟（每次都会重建全部自定义样式，比旧代码略高估）。
+
+用法（在 apps/api 目录下）：
+    python -m scripts.bench_pdf_styles --repeat 20
+"""
+
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from unittest import mock
+
+from reportlab.lib.styles import ParagraphStyle
+
+from app.services import pdf_report
+
+REPORT_DATA = {
+    "assessment_id": "bench",
+    "unlocked_tier": "expert_39",
+    "risk_score": 62,
+    "risk_level": "orange",
+    "risk_band": {"label": "关注区", "range": "60–79", "explanation": "多项经营信号叠加"},
+    "decision_summary": {
+        "title": "建议补齐材料链条",
+        "conclusion": "当前风险信号较强，建议尽快规范票据与对账。",
+        "confidence_level": "medium",
+        "confidence_reason": "基于当前输入信号组合。",
+        "next_review_window": "30天",
+    },
+    "top_risks": [
+        {"code": "SIG_A", "title": "现金收款占比高", "detail": "现金流水难以对账", "severity": "high"},
+        {"code": "SIG_B", "title": "POS 流水可追溯", "detail": "需与申报一致", "severity": "medium"},
+    ],
+    "dont_do": ["不要伪造凭证", "不要进行异常资金操作"],
+    "risk_explain": {"label": "阶段 C", "one_liner": "触发点临近", "stage_note": "建议补齐材料", "main_drivers": ["收入规模上升"], "risk_stage": "C"},
+    "reasons": ["收入与收款可追溯性上升", "行业检查密度较高"],
+    "recommended_actions": [f"行动 {i}" for i in range(8)],
+    "risk_if_ignore": ["补税与罚款风险", "沟通成本上升"],
+    "input": {"stage": "AUTONOMO", "industry": "bazar", "monthly_income": 4200, "employee_count": 1, "has_pos": True},
+    "created_at": datetime(2026, 1, 1, tzinfo=timezone.utc).isoformat(),
+}
+
+
+def _measure(repeat: int):
+    created = {"n": 0}
+    original_init = ParagraphStyle.__init__
+
+    def counting_init(self, *args, **kwargs):
+        created["n"] += 1
+        original_init(self, *args, **kwargs)
+
+    pdf_report.generate_pdf(REPORT_DATA)  # 预热（字体、缓存）
+    with mock.patch.object(ParagraphStyle, "__init__", counting_init):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            pdf_report.generate_pdf(REPORT_DATA)
+        elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    pdf_report.generate_pdf(REPORT_DATA)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, created["n"] / repeat, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    cached_get_styles = pdf_report._get_styles
+
+    def uncached_get_styles():
+        pdf_report._STYLE_REGISTRY.clear()
+        return cached_get_styles()
+
+    with mock.patch.object(pdf_report, "_get_styles", uncached_get_styles):
+        old = _measure(args.repeat)
+    new = _measure(args.repeat)
+
+    for label, (elapsed, styles, peak) in (("per-section rebuild", old), ("style registry", new)):
+        print(f"{label:20s} {elapsed * 1000:7.2f} ms/pdf  {styles:6.1f} ParagraphStyle/pdf  peak {peak / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+组合风险模拟基准：N 个客户 × D 个收入场景（services.portfolio_sim，不经过数据库）
+
+用法（在 apps/api 目录下）：
+    python -m scripts.bench_portfolio_sim --clients 1000 --draws 10000 --volatility 0.3
+"""
+
+import argparse
+import time
+
+from app.services.portfolio_sim import simulate_portfolio
+
+from .bench_batch_assess import _random_requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--draws", type=int, default=10000)
+    parser.add_argument("--volatility", type=float, default=0.3)
+    parser.add_argument("--drift", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    requests = _random_requests(args.clients)
+    started = time.perf_counter()
+    result = simulate_portfolio(
+        requests,
+        [args.volatility] * args.clients,
+        [args.drift] * args.clients,
+        args.draws,
+        args.seed,
+    )
+    elapsed = time.perf_counter() - started
+
+    portfolio = result["portfolio"]
+    print(f"clients={args.clients} draws={args.draws}: {elapsed:.2f}s")
+    print(f"current:  {portfolio['current_level_counts']}")
+    print(f"expected: {portfolio['expected_level_counts']}")
+    for level, row in portfolio["transition"].items():
+        print(f"  {level:>6} -> {row}")
+
+
+if __name__ == "__main__":
+    main()
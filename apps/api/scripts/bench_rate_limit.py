@@ -0,0 +1,95 @@
+"""
+限流器基准：旧实现（dict + 时间戳列表） vs 有界令牌桶
+
+两个场景：
+- 大量客户端：N 个不同 ip:path 轮流访问 --rounds 轮
+- 热点客户端：--hot 个客户端在一个窗口内各发 200 次请求（超过 120 次上限）
+耗时与内存分两遍测（tracemalloc 会放大分配开销），内存取 tracemalloc 峰值。
+
+用法（在 apps/api 目录下）：
+    python -m scripts.bench_rate_limit --clients 100000 --rounds 3
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from app.services.rate_limit import TokenBucketLimiter
+
+WINDOW_SECONDS = 60
+MAX_REQUESTS = 120
+
+
+class ListBucketLimiter:
+    """旧实现：main.py 中的 _rate_bucket"""
+
+    def __init__(self):
+        self._rate_bucket = {}
+
+    def allow(self, key, now):
+        timestamps = self._rate_bucket.get(key, [])
+        timestamps = [t for t in timestamps if now - t < WINDOW_SECONDS]
+        if len(timestamps) >= MAX_REQUESTS:
+            return False
+        timestamps.append(now)
+        self._rate_bucket[key] = timestamps
+        return True
+
+    def size(self):
+        return len(self._rate_bucket)
+
+
+def _drive(limiter, stream, step):
+    now = 0.0
+    for key in stream:
+        now += step
+        limiter.allow(key, now)
+
+
+def _measure(factory, size_fn, stream, step):
+    limiter = factory()
+    start = time.perf_counter()
+    _drive(limiter, stream, step)
+    us = (time.perf_counter() - start) / len(stream) * 1e6
+    size = size_fn(limiter)
+
+    limiter = factory()
+    tracemalloc.start()
+    _drive(limiter, stream, step)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return us, size, peak
+
+
+def _report(title, stream, step, max_keys):
+    print(title)
+    candidates = (
+        ("dict + timestamp lists", ListBucketLimiter, lambda l: l.size()),
+        ("bounded token bucket", lambda: TokenBucketLimiter(MAX_REQUESTS, WINDOW_SECONDS, max_keys=max_keys),
+         lambda l: l.stats()["keys"]),
+    )
+    for label, factory, size_fn in candidates:
+        us, size, peak = _measure(factory, size_fn, stream, step)
+        print(f"  {label:24s} {us:6.2f} us/req  keys {size:7d}  peak {peak / 1024 / 1024:7.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--hot", type=int, default=1_000)
+    parser.add_argument("--max-keys", type=int, default=100_000)
+    args = parser.parse_args()
+
+    keys = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}:/api/v1/compliance/assess" for i in range(args.clients)]
+    # 10k req/s：N 个客户端 x rounds 轮
+    _report(f"{args.clients} distinct clients x {args.rounds} rounds", keys * args.rounds, 0.0001, args.max_keys)
+
+    hot_keys = keys[:args.hot]
+    stream = [key for _ in range(200) for key in hot_keys]
+    # 全部请求落在 30 秒内（同一窗口）
+    _report(f"{args.hot} hot clients x 200 requests in 30s", stream, 30.0 / len(stream), args.max_keys)
+
+
+if __name__ == "__main__":
+    main()
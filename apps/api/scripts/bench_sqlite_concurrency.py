@@ -0,0 +1,121 @@
+"""
+SQLite 并发写基准：默认引擎（rollback journal、synchronous=FULL） vs db_config（WAL + PRAGMA + 连接池）
+
+每个线程重复执行一个“webhook 式”事务：读 Assessment -> 更新 -> 插入 WebhookEvent -> 提交，
+同时另有线程持续读（模拟 /payment/status 轮询），统计吞吐与 "database is locked" 错误数。
+--long-read 秒数 > 0 时再加一个长时间持有读事务的连接（如慢查询 / 大结果集导出）：
+rollback journal 模式下它会挡住所有写提交，超过 busy timeout 后报 "database is locked"；WAL 下读写互不阻塞。
+
+用法（在 apps/api 目录下）：
+    python -m scripts.bench_sqlite_concurrency --writers 8 --readers 4 --seconds 5
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.db_config import configure_engine, engine_kwargs
+from app.models import Assessment, WebhookEvent
+
+
+def _make_engine(url: str, tuned: bool):
+    if tuned:
+        return configure_engine(f"bench-{uuid.uuid4().hex[:6]}", create_engine(url, **engine_kwargs(url)), url)
+    # 原 database.py 的配置
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def _run(tuned: bool, writers: int, readers: int, seconds: float, long_read: float):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    url = f"sqlite:///{path}"
+    engine = _make_engine(url, tuned)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    with Session() as db:
+        db.add_all([Assessment(assessment_id=f"a{i}", unlocked_tier="none") for i in range(100)])
+        db.commit()
+
+    stop = time.monotonic() + seconds
+    counts = {"writes": 0, "reads": 0, "locked": 0}
+    lock = threading.Lock()
+
+    def writer(n):
+        i = 0
+        while time.monotonic() < stop:
+            i += 1
+            db = Session()
+            try:
+                a = db.query(Assessment).filter(Assessment.assessment_id == f"a{(n * 7 + i) % 100}").first()
+                a.unlocked_tier = "basic_15" if a.unlocked_tier != "basic_15" else "expert_39"
+                db.add(WebhookEvent(event_id=f"evt_{n}_{i}", event_type="checkout.session.completed", status="processed"))
+                db.commit()
+                key = "writes"
+            except OperationalError as e:
+                db.rollback()
+                key = "locked" if "locked" in str(e) else "writes"
+            finally:
+                db.close()
+            with lock:
+                counts[key] += 1
+
+    def reader(n):
+        i = 0
+        while time.monotonic() < stop:
+            i += 1
+            db = Session()
+            try:
+                db.query(Assessment).filter(Assessment.assessment_id == f"a{(n + i) % 100}").first()
+                db.query(WebhookEvent).count()
+                key = "reads"
+            except OperationalError:
+                key = "locked"
+            finally:
+                db.close()
+            with lock:
+                counts[key] += 1
+
+    def long_reader():
+        with engine.connect() as conn:
+            conn.exec_driver_sql("BEGIN")
+            conn.exec_driver_sql("SELECT COUNT(*) FROM assessments").fetchall()
+            time.sleep(long_read)
+            conn.exec_driver_sql("COMMIT")
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    if long_read > 0:
+        threads.append(threading.Thread(target=long_reader))
+    threads += [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.dispose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--long-read", type=float, default=0)
+    args = parser.parse_args()
+
+    for label, tuned in (("default engine", False), ("db_config (WAL)", True)):
+        c = _run(tuned, args.writers, args.readers, args.seconds, args.long_read)
+        print(
+            f"{label:16s} writes/s {c['writes'] / args.seconds:8.1f}  reads/s {c['reads'] / args.seconds:8.1f}  "
+            f"locked errors {c['locked']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+分数查找表校验 + 基准：SCORE_TABLE.lookup vs score_v3_rules（规则计算）
+
+穷举每个行业（含未知行业兜底计划）的全部信号 bitmask × stage × 收入边界值 × 有无雇员 × 有无 POS，
+逐条比较 score / modules / combo_hits / income_band，然后对随机请求计时。
+
+用法（在 apps/api 目录下）：
+    python -m scripts.check_score_table --n 2000 --repeat 5
+"""
+
+import argparse
+import time
+
+from app.schemas.assessment import RiskAssessmentRequest
+from app.services.risk.rule_plan import INDUSTRY_PLANS, get_industry_plan
+from app.services.risk_engine import INCOME_SCORE_BY_STAGE, SCORE_TABLE, score_v3_rules
+
+from .bench_batch_assess import _best_of, _random_requests
+
+
+def _boundary_incomes():
+    incomes = {-5.0, 0.0, 0.5, 10.0**10}
+    for table in INCOME_SCORE_BY_STAGE.values():
+        for threshold, _ in table:
+            incomes.update({threshold - 1.0, float(threshold), threshold + 0.5})
+    return [None] + sorted(incomes)
+
+
+def check_exhaustive() -> int:
+    """返回比较条数；不一致时抛出 AssertionError"""
+    plans = list(INDUSTRY_PLANS.values()) + [get_industry_plan("")]
+    stages = list(INCOME_SCORE_BY_STAGE) + ["UNKNOWN"]
+    incomes = _boundary_incomes()
+    checked = 0
+    for plan in plans:
+        keys = list(plan.signal_bits)
+        for mask in range(1 << len(keys)):
+            signals = {key: bool(mask & plan.signal_bits[key]) for key in keys}
+            signals["__unknown_signal__"] = True
+            for stage in stages:
+                for income in incomes:
+                    for employee_count in (0, 3):
+                        for has_pos in (False, True):
+                            # 跳过校验：覆盖 Literal 之外的 stage 与 None 收入
+                            request = RiskAssessmentRequest.model_construct(
+                                stage=stage, industry=plan.industry_key, monthly_income=income,
+                                employee_count=employee_count, has_pos=has_pos, signals=signals,
+                            )
+                            signal_mask = plan.encode(signals)
+                            expected = score_v3_rules(request, plan, signal_mask)
+                            actual = SCORE_TABLE.lookup(plan, stage, income, employee_count, has_pos, signal_mask)
+                            assert actual is not None, plan.industry_key
+                            score, modules, combo_hits, income_band = actual
+                            assert (score, modules, list(combo_hits), income_band) == expected, (
+                                plan.industry_key, stage, income, employee_count, has_pos, mask, actual, expected,
+                            )
+                            checked += 1
+    return checked
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    checked = check_exhaustive()
+    print(f"exhaustive check: {checked} cases identical in {time.perf_counter() - started:.1f}s")
+    print(f"table: {SCORE_TABLE.stats()}")
+
+    requests = _random_requests(args.n)
+    prepared = []
+    for request in requests:
+        plan = get_industry_plan(request.industry)
+        prepared.append((request, plan, plan.encode(request.signals)))
+    rules = _best_of(lambda: [score_v3_rules(r, p, m) for r, p, m in prepared], args.repeat)
+    table = _best_of(
+        lambda: [
+            SCORE_TABLE.lookup(p, r.stage, r.monthly_income, r.employee_count, r.has_pos, m) for r, p, m in prepared
+        ],
+        args.repeat,
+    )
+    print(f"n={args.n}")
+    print(f"rules (score only): {rules * 1e6 / args.n:8.2f} us/request")
+    print(f"table (score only): {table * 1e6 / args.n:8.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+本地假 Stripe 服务（只实现 stripe_gateway 用到的接口），用于联调 / 压测 / 故障演练
+
+实现的接口：
+- POST /v1/checkout/sessions                 创建会话（payment_status=unpaid）
+- GET  /v1/checkout/sessions/{id}            查询会话
+- GET  /v1/checkout/sessions?payment_intent= 按 payment_intent 列出会话
+- GET  /v1/events/{id}                       查询事件
+测试辅助：
+- POST /_fake/sessions/{id}/pay              标记已支付，生成 payment_intent 与 checkout.session.completed 事件
+- POST /_fake/faults?latency=0.5&fail_next=3&status=503   注入延迟 / 接下来 N 次请求失败
+
+用法（在 apps/api 目录下）：
+    python -m scripts.fake_stripe --port 12111 --latency 0.05
+    STRIPE_API_BASE=http://127.0.0.1:12111 uvicorn app.main:app
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qsl
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def _decode_form(pairs: List[Tuple[str, str]]) -> Dict[str, Any]:
+    """Stripe 表单编码（a[b][0][c]=v）还原为嵌套 dict / list"""
+    root: Dict[str, Any] = {}
+    for key, value in pairs:
+        parts = key.replace("]", "").split("[")
+        node: Any = root
+        for i, part in enumerate(parts):
+            last = i == len(parts) - 1
+            nxt: Any = value if last else ([] if parts[i + 1].isdigit() else {})
+            if isinstance(node, list):
+                index = int(part)
+                while len(node) <= index:
+                    node.append(None)
+                if node[index] is None or last:
+                    node[index] = nxt
+                node = node[index]
+            else:
+                if part not in node or last:
+                    node[part] = nxt
+                node = node[part]
+    return root
+
+
+def _error(status: int, message: str, code: str = "resource_missing") -> JSONResponse:
+    return JSONResponse({"error": {"type": "invalid_request_error", "code": code, "message": message}}, status_code=status)
+
+
+def create_fake_stripe_app(latency: float = 0.0) -> FastAPI:
+    app = FastAPI(title="fake-stripe")
+    sessions: Dict[str, Dict[str, Any]] = {}
+    events: Dict[str, Dict[str, Any]] = {}
+    faults = {"latency": latency, "fail_next": 0, "status": 503}
+    stats = {"requests": 0, "injected_failures": 0}
+    app.state.sessions = sessions
+    app.state.events = events
+    app.state.stats = stats
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        if request.url.path.startswith("/_fake"):
+            return await call_next(request)
+        stats["requests"] += 1
+        if faults["latency"]:
+            await asyncio.sleep(faults["latency"])
+        if faults["fail_next"] > 0:
+            faults["fail_next"] -= 1
+            stats["injected_failures"] += 1
+            return JSONResponse({"error": {"type": "api_error", "message": "injected failure"}}, status_code=faults["status"])
+        return await call_next(request)
+
+    @app.post("/v1/checkout/sessions")
+    async def create_session(request: Request):
+        params = _decode_form(parse_qsl((await request.body()).decode(), keep_blank_values=True))
+        session_id = f"cs_test_{uuid.uuid4().hex}"
+        amount = 0
+        for item in params.get("line_items") or []:
+            unit_amount = ((item or {}).get("price_data") or {}).get("unit_amount")
+            amount += int(unit_amount or 0) * int((item or {}).get("quantity") or 1)
+        session = {
+            "id": session_id,
+            "object": "checkout.session",
+            "url": f"https://checkout.stripe.com/c/pay/{session_id}",
+            "mode": params.get("mode", "payment"),
+            "payment_status": "unpaid",
+            "status": "open",
+            "payment_intent": None,
+            "customer": None,
+            "amount_total": amount,
+            "currency": "eur",
+            "metadata": params.get("metadata") or {},
+            "success_url": params.get("success_url"),
+            "cancel_url": params.get("cancel_url"),
+            "created": int(time.time()),
+        }
+        sessions[session_id] = session
+        return session
+
+    @app.get("/v1/checkout/sessions/{session_id}")
+    async def retrieve_session(session_id: str):
+        session = sessions.get(session_id)
+        if session is None:
+            return _error(404, f"No such checkout.session: '{session_id}'")
+        return session
+
+    @app.get("/v1/checkout/sessions")
+    async def list_sessions(payment_intent: str = "", limit: int = 10):
+        stats["list_sessions"] = stats.get("list_sessions", 0) + 1
+        data = [s for s in sessions.values() if not payment_intent or s["payment_intent"] == payment_intent]
+        return {"object": "list", "url": "/v1/checkout/sessions", "has_more": len(data) > limit, "data": data[:limit]}
+
+    @app.get("/v1/events/{event_id}")
+    async def retrieve_event(event_id: str):
+        event = events.get(event_id)
+        if event is None:
+            return _error(404, f"No such event: '{event_id}'")
+        return event
+
+    @app.post("/_fake/sessions/{session_id}/pay")
+    async def pay(session_id: str):
+        session = sessions.get(session_id)
+        if session is None:
+            return _error(404, f"No such checkout.session: '{session_id}'")
+        session.update(
+            payment_status="paid",
+            status="complete",
+            payment_intent=f"pi_test_{uuid.uuid4().hex[:24]}",
+            customer=session.get("customer") or f"cus_test_{uuid.uuid4().hex[:14]}",
+        )
+        event_id = f"evt_test_{uuid.uuid4().hex[:24]}"
+        events[event_id] = {
+            "id": event_id,
+            "object": "event",
+            "type": "checkout.session.completed",
+            "created": int(time.time()),
+            "data": {"object": dict(session)},
+        }
+        return {"session": session, "event_id": event_id}
+
+    @app.post("/_fake/faults")
+    async def set_faults(latency: float = 0.0, fail_next: int = 0, status: int = 503):
+        faults.update(latency=latency, fail_next=fail_next, status=status)
+        return {"faults": faults, "stats": stats}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12111)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的固定延迟（秒）")
+    args = parser.parse_args()
+    uvicorn.run(create_fake_stripe_app(latency=args.latency), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+评估数据迁移：旧 JSON 列（result_data / decision_summary_data / input_data）-> 压缩的 Assessment.payload
+
+- 补齐 payload 列与 payload_fragments 表（与启动时相同的 create_all + add_missing_columns）
+- 分批编码未迁移的记录，写入 payload 并清空旧 JSON 列（只更新 payload 仍为空的行，可与线上服务同时运行、可重复执行）
+- --train-dict：用最近的 payload 训练 zlib 预置字典，并用新字典重新压缩全部记录（引用不变，只换压缩层）
+
+迁移前后读取结果一致：旧记录在迁移前走旧 JSON 列，迁移后走 payload（assessment_store.load_assessment_payload）。
+SQLite 上清空旧列后执行 VACUUM 才会缩小数据库文件（--vacuum）。
+
+用法（在 apps/api 目录下）：
+    python -m scripts.migrate_assessment_payloads --batch-size 500
+    python -m scripts.migrate_assessment_payloads --train-dict --samples 200 --vacuum
+"""
+
+import argparse
+import time
+
+from sqlalchemy import bindparam, func, null, select, update
+
+from app.database import Base, SessionLocal, engine, init_db
+from app.migrations import add_missing_columns
+from app.models import Assessment, PayloadFragment
+from app.services.assessment_store import (
+    encode_assessment_payloads_sync,
+    recompress_payload,
+    train_payload_dictionary,
+)
+
+_table = Assessment.__table__
+
+
+def _storage_bytes() -> int:
+    """评估数据占用字节数（含片段表）"""
+    columns = [
+        _table.c.payload, _table.c.result_data, _table.c.decision_summary_data, _table.c.input_data,
+        PayloadFragment.__table__.c.data,
+    ]
+    with engine.connect() as conn:
+        return sum(conn.scalar(select(func.coalesce(func.sum(func.length(column)), 0))) for column in columns)
+
+
+def migrate_legacy_rows(batch_size: int) -> int:
+    """编码所有未迁移的记录，返回迁移条数"""
+    # 旧 JSON 列置为 SQL NULL（赋值 None 会存成 JSON 'null'）
+    legacy = (_table.c.result_data.isnot(None)) | (_table.c.decision_summary_data.isnot(None)) | (_table.c.input_data.isnot(None))
+    statement = (
+        update(_table)
+        .where(_table.c.id == bindparam("row_id"), _table.c.payload.is_(None))
+        .values(payload=bindparam("new_payload"), result_data=null(), decision_summary_data=null(), input_data=null())
+    )
+    migrated = 0
+    last_id = 0
+    while True:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(Assessment.id, Assessment.result_data, Assessment.decision_summary_data, Assessment.input_data)
+                .where(Assessment.id > last_id, Assessment.payload.is_(None), legacy)
+                .order_by(Assessment.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return migrated
+            blobs = encode_assessment_payloads_sync([
+                {"result_data": row.result_data, "decision_summary_data": row.decision_summary_data, "input_data": row.input_data}
+                for row in rows
+            ])
+            db.execute(statement, [{"row_id": row.id, "new_payload": blob} for row, blob in zip(rows, blobs)])
+            db.commit()
+        migrated += len(rows)
+        last_id = rows[-1].id
+        print(f"  migrated {migrated} rows (last id {last_id})")
+
+
+def train_and_recompress(samples: int, batch_size: int) -> int:
+    """训练新字典并重新压缩全部 payload，返回重新压缩的条数"""
+    with SessionLocal() as db:
+        blobs = db.scalars(
+            select(Assessment.payload).where(Assessment.payload.isnot(None)).order_by(Assessment.id.desc()).limit(samples)
+        ).all()
+    if not blobs:
+        print("  no payloads to train on")
+        return 0
+    with engine.begin() as conn:
+        zdict_id = train_payload_dictionary(conn, list(reversed(blobs)))
+    print(f"  trained zdict id={zdict_id} from {len(blobs)} payloads")
+
+    # 只替换未被并发改写的 payload（比较旧值）
+    statement = (
+        update(_table)
+        .where(_table.c.id == bindparam("row_id"), _table.c.payload == bindparam("old_payload"))
+        .values(payload=bindparam("new_payload"))
+    )
+    recompressed = 0
+    last_id = 0
+    while True:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(Assessment.id, Assessment.payload)
+                .where(Assessment.id > last_id, Assessment.payload.isnot(None))
+                .order_by(Assessment.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return recompressed
+            params = [{"row_id": row.id, "old_payload": row.payload, "new_payload": recompress_payload(row.payload)} for row in rows]
+            db.execute(statement, params)
+            db.commit()
+        recompressed += len(rows)
+        last_id = rows[-1].id
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--train-dict", action="store_true", help="训练 zlib 预置字典并重新压缩全部记录")
+    parser.add_argument("--samples", type=int, default=200, help="训练字典使用的最近 payload 条数")
+    parser.add_argument("--vacuum", action="store_true", help="SQLite：迁移后 VACUUM 回收空间")
+    args = parser.parse_args()
+
+    init_db()
+    add_missing_columns(engine, Base.metadata)
+
+    before = _storage_bytes()
+    started = time.perf_counter()
+    print("migrating legacy JSON columns ...")
+    migrated = migrate_legacy_rows(args.batch_size)
+    print(f"migrated {migrated} rows")
+    if args.train_dict:
+        print("training zlib dictionary ...")
+        print(f"recompressed {train_and_recompress(args.samples, args.batch_size)} rows")
+    if args.vacuum and engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+    after = _storage_bytes()
+    print(f"assessment data: {before} -> {after} bytes in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""
+测试环境：独立的临时 SQLite 数据库，关闭 PDF 磁盘缓存 / 后台 worker（不在测试期间轮询数据库）
+环境变量必须在导入 app 之前设置（各模块在导入时读取配置）
+
+运行（在 apps/api 目录下，需额外安装 pytest）：
+    python -m pytest -q
+"""
+
+import os
+import tempfile
+
+_TMP_DIR = tempfile.mkdtemp(prefix="ibercomply_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}"
+os.environ["PDF_CACHE_DIR"] = ""
+os.environ["PDF_POOL_WORKERS"] = "0"
+os.environ["RATE_LIMIT_BACKEND"] = "memory"
+os.environ["RATE_LIMIT_MAX_REQUESTS"] = "100000"
+os.environ["RENDER_QUEUE_WORKERS"] = "0"
+os.environ["WEBHOOK_INBOX_WORKERS"] = "0"
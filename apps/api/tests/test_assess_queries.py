@@ -0,0 +1,107 @@
+"""
+/assess 的 SQL 语句数与 Stripe 调用次数
+单一工作单元：Assessment 按 assessment_id 只加载一次，upsert 复用同一行；每个请求最多验证一次支付。
+语句在异步引擎上用 before_cursor_execute 统计（/assess 只走 async_engine）。
+"""
+
+import re
+import uuid
+from unittest import mock
+
+import pytest
+import stripe
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import app.models as _models  # noqa: F401  注册全部模型，startup 时建表
+from app.database import async_engine
+from app.main import app as asgi_app
+from app.services import stripe_gateway
+
+ASSESS_URL = "/api/v1/compliance/assess"
+_STATEMENT_TABLE = re.compile(r"\s*(SELECT|DELETE|INSERT|UPDATE)\b(?:.*?\b(?:FROM|INTO)\b)?\s*(\w+)", re.S)
+PROFILE = {"stage": "AUTONOMO", "industry": "bazar", "monthly_income": 4200, "employee_count": 1, "has_pos": True}
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(asgi_app) as c:
+        # 预热：首次编码会写入新的文案片段（payload_fragments），之后同一画像不再写
+        assert c.post(ASSESS_URL, json=PROFILE).status_code == 200
+        yield c
+
+
+@pytest.fixture
+def statements():
+    """本测试期间异步引擎执行的语句，简化为 "SELECT assessments" 这样的 (操作, 表)"""
+    executed = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        match = _STATEMENT_TABLE.match(statement)
+        executed.append(f"{match.group(1)} {match.group(2)}" if match else statement.split()[0])
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _record)
+    yield executed
+    event.remove(async_engine.sync_engine, "before_cursor_execute", _record)
+
+
+def _paid_checkout_session(session_id, assessment_id):
+    return stripe.checkout.Session.construct_from(
+        {
+            "id": session_id,
+            "metadata": {"assessment_id": assessment_id, "user_id": "u1", "tier": "expert"},
+            "payment_status": "paid",
+            "amount_total": 3900,
+            "currency": "eur",
+            "payment_intent": "pi_test",
+            "customer": None,
+        },
+        "sk_test",
+    )
+
+
+def test_new_assessment_single_insert(client, statements):
+    response = client.post(ASSESS_URL, json=PROFILE)
+
+    assert response.status_code == 200
+    # 新 id 不可能已有记录：不查询，直接插入
+    assert statements == ["INSERT assessments"]
+
+
+def test_existing_assessment_loads_once(client, statements):
+    assessment_id = client.post(ASSESS_URL, json=PROFILE).json()["id"]
+    statements.clear()
+
+    response = client.post(ASSESS_URL, params={"assessment_id": assessment_id}, json=PROFILE)
+
+    assert response.status_code == 200
+    assert response.json()["id"] == assessment_id
+    assert statements == ["SELECT assessments", "UPDATE assessments"]
+
+
+def test_session_id_verifies_stripe_once(client, statements):
+    assessment_id = client.post(ASSESS_URL, json=PROFILE).json()["id"]
+    session_id = f"cs_test_{uuid.uuid4().hex}"
+    statements.clear()
+
+    retrieve = mock.AsyncMock(return_value=_paid_checkout_session(session_id, assessment_id))
+    with mock.patch.object(stripe_gateway, "retrieve_checkout_session", retrieve):
+        response = client.post(ASSESS_URL, params={"session_id": session_id}, json=PROFILE)
+        assert response.status_code == 200
+        # assessment_id 从支付会话取得
+        assert response.json()["id"] == assessment_id
+        retrieve.assert_awaited_once_with(session_id)
+        assert statements == [
+            "SELECT payment_sessions",
+            "INSERT payment_sessions",
+            "SELECT payment_sessions",  # commit 后 refresh
+            "SELECT assessments",
+            "UPDATE assessments",
+        ]
+
+        # 同一会话再次评估：DB 中已 paid，不再请求 Stripe
+        statements.clear()
+        response = client.post(ASSESS_URL, params={"session_id": session_id}, json=PROFILE)
+        assert response.status_code == 200
+        retrieve.assert_awaited_once_with(session_id)
+        assert statements == ["SELECT payment_sessions", "SELECT assessments", "UPDATE assessments"]
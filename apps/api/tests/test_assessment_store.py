@@ -0,0 +1,124 @@
+"""
+assessment_store 编码 / 解码往返：模板文案转为片段引用，用户字符串（含以 "\\x01" 开头的）原样还原，
+带 zdict 的 payload 在进程缓存清空后按头部字典 id 从片段表加载解码。
+"""
+
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+import app.models as _models  # noqa: F401  注册全部模型
+from app.database import SessionLocal, engine, init_db
+from app.models import Assessment, PayloadFragment
+from app.services import assessment_store as store
+
+USER_STRINGS = ["\x01weird", "\x01\x01x", "\x0112", "\x01", "月收入约 €5183", ""]
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    """每个测试使用空的进程内片段缓存（模拟新进程），结束后恢复"""
+    init_db()
+    monkeypatch.setattr(store, "_cache", store._FragmentCache())
+
+
+def _template_samples():
+    return sorted(store.template_strings())[:3]
+
+
+def _payload():
+    templates = _template_samples()
+    return {
+        "result_data": {
+            "risk_score": 62,
+            "findings": [{"title": templates[0], "detail": USER_STRINGS[0]}, {"title": templates[1]}],
+            "meta": {"tags": USER_STRINGS, "ratio": 0.5, "flag": True, "missing": None},
+        },
+        "decision_summary_data": {"conclusion": templates[2], "notes": [templates[0], "\x01" + templates[1]]},
+        "input_data": {"industry": "\x0112", "monthly_income": 5183, "employee_count": 2},
+    }
+
+
+def _fragment_count():
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(PayloadFragment))
+
+
+def _compact_document(blob):
+    return json.loads(store._compact_json(blob))
+
+
+def test_round_trip_restores_user_strings_with_ref_prefix():
+    payload = _payload()
+    blob = store.encode_assessment_payloads_sync([payload])[0]
+
+    assert store.decode_assessment_payload_sync(blob) == payload
+    # 清空缓存后从片段表加载引用
+    store._cache = store._FragmentCache()
+    loads = store._stats["fragment_loads"]
+    assert store.decode_assessment_payload_sync(blob) == payload
+    assert store._stats["fragment_loads"] > loads
+
+
+def test_only_template_strings_are_interned():
+    payload = _payload()
+    blob = store.encode_assessment_payloads_sync([payload])[0]
+    document = _compact_document(blob)
+    templates = _template_samples()
+
+    assert document["result_data"]["findings"][1]["title"] == f"\x01{store._cache.ids[templates[1]]}"
+    assert document["decision_summary_data"]["conclusion"] == f"\x01{store._cache.ids[templates[2]]}"
+    # 以 "\x01" 开头的用户字符串转义后留在压缩数据里，不入片段表
+    assert document["result_data"]["findings"][0]["detail"] == "\x01\x01weird"
+    assert document["input_data"]["industry"] == "\x01\x0112"
+    assert document["decision_summary_data"]["notes"][1] == "\x01\x01" + templates[1]
+    assert document["result_data"]["meta"]["tags"][-2] == "月收入约 €5183"
+    for value in USER_STRINGS:
+        assert value not in store._cache.ids
+
+    # 再次编码：用户字符串不同也不写新片段
+    before = _fragment_count()
+    other = _payload()
+    other["input_data"]["industry"] = "自由填写的行业 A"
+    store.encode_assessment_payloads_sync([other])
+    assert _fragment_count() == before
+
+
+def test_zdict_payload_round_trip_after_cache_reset():
+    payloads = [_payload() for _ in range(3)]
+    for index, payload in enumerate(payloads):
+        payload["input_data"]["monthly_income"] = 4000 + index
+    samples = store.encode_assessment_payloads_sync(payloads)
+
+    with engine.begin() as conn:
+        zdict_id = store.train_payload_dictionary(conn, samples)
+    assert zdict_id
+
+    blob = store.encode_assessment_payloads_sync([payloads[0]])[0]
+    assert store._HEADER.unpack_from(blob) == (store.PAYLOAD_FORMAT_VERSION, zdict_id)
+    assert len(blob) < len(samples[0])
+    recompressed = store.recompress_payload(samples[2])
+    assert store._HEADER.unpack_from(recompressed)[1] == zdict_id
+
+    # 新进程：字典与字符串片段都从片段表加载；旧的无字典 payload 同样可解码
+    store._cache = store._FragmentCache()
+    assert store.decode_assessment_payload_sync(blob) == payloads[0]
+    assert store.decode_assessment_payloads_sync([samples[1], blob, recompressed]) == [payloads[1], payloads[0], payloads[2]]
+
+
+def test_batch_load_keeps_order_and_reads_legacy_columns():
+    payloads = [_payload() for _ in range(2)]
+    payloads[1]["input_data"]["industry"] = "\x01\x01x"
+    blobs = store.encode_assessment_payloads_sync(payloads)
+    legacy = {"result_data": {"risk_score": 10}, "decision_summary_data": None, "input_data": {"industry": "\x01x"}}
+    assessments = [
+        Assessment(payload=blobs[1]),
+        Assessment(**legacy),
+        Assessment(),
+        Assessment(payload=blobs[0]),
+    ]
+
+    store._cache = store._FragmentCache()
+    assert store.load_assessment_payloads_sync(assessments) == [payloads[1], legacy, None, payloads[0]]
+    assert store.load_assessment_payload_sync(assessments[0]) == payloads[1]
@@ -0,0 +1,74 @@
+"""
+stripe_gateway 路径中的对象 id：格式校验 + URL 转义
+session_id 来自用户参数，非法 id 不能拼出其他 Stripe 接口 / 查询参数（请求带密钥签名）。
+"""
+
+import asyncio
+from unittest import mock
+
+import httpx
+import pytest
+
+from app.services import stripe_gateway
+from app.services.stripe_service import verify_payment_session
+
+BAD_IDS = [
+    "",
+    "../../customers/cus_x",
+    "cs_x/../../customers/cus_x",
+    "cs_x?expand[]=customer",
+    "cs_x#frag",
+    "cs_x%2F..",
+    "cs_x\n",
+    "evt_x",
+    "cus_x",
+]
+
+
+@pytest.fixture
+def requests_sent():
+    """替换网关的 httpx 客户端，记录发出的请求（不访问网络）"""
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        return httpx.Response(200, json={"id": request.url.path.rsplit("/", 1)[-1], "object": "checkout.session"})
+
+    gateway = stripe_gateway._gateway
+    original = gateway._client
+    gateway._client = httpx.AsyncClient(base_url=gateway.api_base, transport=httpx.MockTransport(handler))
+    yield sent
+    asyncio.run(gateway._client.aclose())
+    gateway._client = original
+
+
+def test_valid_ids_are_requested_as_single_path_segment(requests_sent):
+    session = asyncio.run(stripe_gateway.retrieve_checkout_session("cs_test_a1B2"))
+    event = asyncio.run(stripe_gateway.retrieve_event("evt_test_9"))
+
+    assert session.id == "cs_test_a1B2" and event.id == "evt_test_9"
+    assert [(r.url.raw_path, r.url.query) for r in requests_sent] == [
+        (b"/v1/checkout/sessions/cs_test_a1B2", b""),
+        (b"/v1/events/evt_test_9", b""),
+    ]
+
+
+@pytest.mark.parametrize("session_id", BAD_IDS)
+def test_invalid_session_id_is_rejected_before_request(requests_sent, session_id):
+    with pytest.raises(stripe_gateway.InvalidStripeIdError):
+        asyncio.run(stripe_gateway.retrieve_checkout_session(session_id))
+    assert requests_sent == []
+
+
+@pytest.mark.parametrize("event_id", ["../../customers/cus_x", "evt_x?limit=100", "cs_test_1", ""])
+def test_invalid_event_id_is_rejected_before_request(requests_sent, event_id):
+    with pytest.raises(stripe_gateway.InvalidStripeIdError):
+        asyncio.run(stripe_gateway.retrieve_event(event_id))
+    assert requests_sent == []
+
+
+def test_verify_payment_session_ignores_malformed_id(requests_sent):
+    db = mock.AsyncMock()
+    assert asyncio.run(verify_payment_session("../../customers/cus_x", db)) is None
+    db.scalar.assert_not_awaited()
+    assert requests_sent == []
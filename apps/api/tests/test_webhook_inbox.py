@@ -0,0 +1,160 @@
+"""
+webhook 收件箱：同一 session_id 按入库顺序领取、退款排在同一会话的 checkout 之后时延后、
+失败退避与 failed 状态、空收件箱轮询不产生写入。
+直接调用 ingest_event / claim_next_event / process_event（conftest 已关闭后台 worker）。
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, event
+
+import app.models as _models  # noqa: F401  注册全部模型
+from app.database import AsyncSessionLocal, SessionLocal, async_engine, init_db
+from app.models import PaymentSession, WebhookEvent
+from app.services import webhook_inbox
+from app.services.stripe_webhooks import PermanentEventError
+
+
+def _run(coro):
+    async def _main():
+        try:
+            return await coro
+        finally:
+            # 每个测试一个事件循环：连接不跨循环复用
+            await async_engine.dispose()
+    return asyncio.run(_main())
+
+
+def _checkout(event_id, session_id):
+    return {"id": event_id, "type": "checkout.session.completed", "data": {"object": {"id": session_id}}}
+
+
+def _refund(event_id, payment_intent):
+    return {"id": event_id, "type": "charge.refunded", "data": {"object": {"id": "ch_1", "payment_intent": payment_intent}}}
+
+
+async def _ingest(*events):
+    async with AsyncSessionLocal() as db:
+        return [await webhook_inbox.ingest_event(db, e) for e in events]
+
+
+def _row(event_id):
+    with SessionLocal() as db:
+        return db.query(WebhookEvent).filter(WebhookEvent.event_id == event_id).one()
+
+
+def _row_id(event_id):
+    return _row(event_id).id
+
+
+def _set(event_id, **values):
+    with SessionLocal() as db:
+        db.query(WebhookEvent).filter(WebhookEvent.event_id == event_id).update(values)
+        db.commit()
+
+
+@pytest.fixture(autouse=True)
+def inbox(monkeypatch):
+    init_db()
+    with SessionLocal() as db:
+        db.execute(delete(WebhookEvent))
+        db.execute(delete(PaymentSession))
+        db.commit()
+    monkeypatch.setattr(webhook_inbox, "_next_reclaim", 0.0)
+
+
+def test_events_for_same_session_are_claimed_in_order():
+    assert _run(_ingest(_checkout("evt_a1", "cs_A"), _checkout("evt_a2", "cs_A"), _checkout("evt_b1", "cs_B"))) == [
+        "queued", "queued", "queued",
+    ]
+
+    assert _run(webhook_inbox._claim()) == _row_id("evt_a1")
+    # evt_a2 排在处理中的 evt_a1 后面，先领取其他会话的事件
+    assert _run(webhook_inbox._claim()) == _row_id("evt_b1")
+    assert _run(webhook_inbox._claim()) is None
+
+    _set("evt_a1", status="processed", locked_at=None)
+    assert _run(webhook_inbox._claim()) == _row_id("evt_a2")
+
+
+def test_refund_behind_checkout_for_same_session_is_deferred():
+    with SessionLocal() as db:
+        db.add(PaymentSession(session_id="cs_R", tier="basic_15", status="paid", payment_intent_id="pi_R"))
+        db.commit()
+    _run(_ingest(_checkout("evt_c", "cs_R"), _refund("evt_r", "pi_R")))
+    # 退款入库时还不知道 session_id，不会被入库时的顺序条件挡住
+    assert _row("evt_r").session_id is None
+
+    assert _run(webhook_inbox._claim()) == _row_id("evt_c")
+    refund_id = _run(webhook_inbox._claim())
+    assert refund_id == _row_id("evt_r")
+
+    assert _run(webhook_inbox.process_event(refund_id)) == "deferred"
+    row = _row("evt_r")
+    assert (row.status, row.session_id, row.attempts, row.locked_at) == ("queued", "cs_R", 0, None)
+    assert row.next_run_at > datetime.utcnow()
+
+    # 延后到期后仍排在处理中的 checkout 后面
+    _set("evt_r", next_run_at=datetime.utcnow() - timedelta(seconds=1))
+    assert _run(webhook_inbox._claim()) is None
+    _set("evt_c", status="processed", locked_at=None)
+    assert _run(webhook_inbox._claim()) == refund_id
+
+
+def test_failures_back_off_then_fail(monkeypatch):
+    async def failing(db, payload, session_id):
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(webhook_inbox.EVENT_HANDLERS, "checkout.session.completed", (failing, None))
+    monkeypatch.setattr(webhook_inbox, "WEBHOOK_INBOX_MAX_ATTEMPTS", 2)
+    _run(_ingest(_checkout("evt_f", "cs_F")))
+
+    row_id = _run(webhook_inbox._claim())
+    before = datetime.utcnow()
+    assert _run(webhook_inbox.process_event(row_id)) == "queued"
+    row = _row("evt_f")
+    assert row.attempts == 1 and row.locked_at is None and "boom" in row.error
+    delay = (row.next_run_at - before).total_seconds()
+    assert webhook_inbox.WEBHOOK_INBOX_BACKOFF_SECONDS - 1 <= delay <= webhook_inbox.WEBHOOK_INBOX_BACKOFF_SECONDS + 1
+    # 退避期间不领取
+    assert _run(webhook_inbox._claim()) is None
+
+    _set("evt_f", next_run_at=datetime.utcnow() - timedelta(seconds=1))
+    assert _run(webhook_inbox._claim()) == row_id
+    assert _run(webhook_inbox.process_event(row_id)) == "failed"
+    assert _row("evt_f").attempts == 2
+    assert _run(webhook_inbox._claim()) is None
+
+
+def test_permanent_error_fails_without_retry(monkeypatch):
+    async def invalid(db, payload, session_id):
+        raise PermanentEventError("amount mismatch")
+
+    monkeypatch.setitem(webhook_inbox.EVENT_HANDLERS, "checkout.session.completed", (invalid, None))
+    _run(_ingest(_checkout("evt_p", "cs_P")))
+    assert _run(webhook_inbox.process_event(_run(webhook_inbox._claim()))) == "failed"
+    row = _row("evt_p")
+    assert (row.status, row.attempts, row.error) == ("failed", 1, "amount mismatch")
+    # Stripe 重发已失败的事件会重新入队
+    assert _run(_ingest(_checkout("evt_p", "cs_P"))) == ["queued"]
+
+
+def test_polling_an_empty_inbox_does_not_write():
+    writes = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith("SELECT"):
+            writes.append(statement.split()[0])
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        assert _run(webhook_inbox._claim()) is None  # 首次领取顺带回收过期租约
+        reclaim_writes = len(writes)
+        for _ in range(3):
+            assert _run(webhook_inbox._claim()) is None
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", _record)
+    assert reclaim_writes == 2
+    assert len(writes) == reclaim_writes